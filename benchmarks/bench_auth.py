@@ -0,0 +1,90 @@
+"""
+Benchmark: authentication overhead of a JWT-authenticated API request.
+
+Authenticates the same access token (issued by CustomTokenObtainPairSerializer) with
+simplejwt's JWTAuthentication, which loads the User row every request, and with
+moviereviews_hub.authentication.ClaimsJWTAuthentication, which trusts the signed claims
+and only checks the cached token version. Reports time and queries per request.
+
+Runs against the database from settings.py (or DATABASE_URL). The benchmark user is
+created inside a transaction that is rolled back at the end.
+
+Usage:
+    python benchmarks/bench_auth.py [--requests 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "movieclub_backend.settings")
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from moviereviews_hub.authentication import ClaimsJWTAuthentication
+from moviereviews_hub.serializers import CustomTokenObtainPairSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+def run(authenticator, header, requests):
+    factory = APIRequestFactory()
+
+    def authenticate():
+        request = Request(factory.get("/api/reviews/", HTTP_AUTHORIZATION=header))
+        user, _token = authenticator.authenticate(request)
+        assert user.username == "bench-trevor"
+
+    authenticate()  # warm up (token version cache, connection)
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(requests):
+            authenticate()
+        elapsed = time.perf_counter() - start
+    return elapsed / requests, len(queries) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"database: {connection.vendor}")
+    print()
+
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user("bench-trevor", password="bench-password")
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            header = f"Bearer {token}"
+
+            results = [
+                ("JWTAuthentication (User row)", run(JWTAuthentication(), header, args.requests)),
+                ("ClaimsJWTAuthentication", run(ClaimsJWTAuthentication(), header, args.requests)),
+            ]
+            raise Rollback
+    except Rollback:
+        pass
+
+    baseline = results[0][1][0]
+    for name, (per_request, queries) in results:
+        print(
+            f"{name:32s} {per_request * 1e6:8.1f} us/request   {queries:.2f} queries/request"
+            f"   ({baseline / per_request:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: what connection setup costs each request under concurrent load.
+
+Runs the same workload once per DB_POOL_MODE, each in its own process so the
+settings are loaded fresh:
+    fresh      - CONN_MAX_AGE=0, no pool: a new Postgres connection for every request (the old local setup)
+    persistent - CONN_MAX_AGE + CONN_HEALTH_CHECKS
+    native     - psycopg 3 connection pool
+
+Each simulated request fires Django's request_started/request_finished signals
+around a small query, exactly like a real view, so connection handling matches production.
+Needs the Postgres from settings.py (or DATABASE_URL) to be reachable.
+
+Usage:
+    python benchmarks/bench_db_connections.py [--threads 16] [--requests 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_workload(threads, requests_per_thread):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "movieclub_backend.settings")
+
+    import django
+
+    django.setup()
+
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            run_requests()
+        except Exception as e:
+            with lock:
+                errors.append(e)
+
+    def run_requests():
+        local = []
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            request_finished.send(sender=None)
+            local.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        raise errors[0]
+
+    latencies.sort()
+    print(json.dumps({
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per thread.")
+    parser.add_argument("--workload", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workload:
+        run_workload(args.threads, args.requests)
+        return
+
+    modes = [
+        ("fresh", {"DB_POOL_MODE": "persistent", "DB_CONN_MAX_AGE": "0"}),
+        ("persistent", {"DB_POOL_MODE": "persistent"}),
+        ("native", {"DB_POOL_MODE": "native", "DB_POOL_MAX_SIZE": str(args.threads)}),
+    ]
+
+    print(f"{args.threads} threads x {args.requests} requests")
+    print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, env in modes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--workload", "--threads", str(args.threads), "--requests", str(args.requests)],
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            print(f"{name:<12}failed: {out.stderr.strip().splitlines()[-1] if out.stderr else out.returncode}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<12}{r['throughput']:>10.0f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
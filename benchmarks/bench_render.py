@@ -0,0 +1,141 @@
+"""
+Benchmark: JSON rendering and bytes on the wire for the big list payloads.
+
+Compares DRF's JSONRenderer with movieclub_backend.renderers.FastJSONRenderer on
+synthetic payloads shaped like /api/couple_reviews/<slug>/ and
+/api/tv/couple/shows/<slug>/, then shows the response size uncompressed, gzipped
+and (if brotli is installed) brotli-compressed with the CompressionMiddleware settings.
+
+Usage:
+    python benchmarks/bench_render.py [--movies 2000] [--shows 150] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "movieclub_backend.settings")
+
+import django
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+
+from movieclub_backend.middleware import brotli, compress
+from movieclub_backend.renderers import FastJSONRenderer, orjson
+
+
+def couple_page_payload(num_movies):
+    return {"results": [
+        {
+            "title": f"Movie {i}",
+            "director": [f"Director {i % 300}"],
+            "actors": [f"Actor {(i * 7 + k) % 5000}" for k in range(10)],
+            "genres": ["Drama", "Thriller"] if i % 2 else ["Comedy"],
+            "reviews": {
+                "Trevor": {"rating": 7.5, "review": "Solid, a little long in the middle. " * 3},
+                "Taylor": {"rating": 8.0, "review": "Loved the soundtrack."},
+            } if i % 3 else {},
+            "movie_id": i,
+            "summary": "A sweeping story about people doing things in places. " * 4,
+            "release_yr": 1980 + i % 45,
+            "runtime": 90 + i % 60,
+            "poster_url": f"https://image.tmdb.org/t/p/w500/poster{i}.jpg",
+        }
+        for i in range(num_movies)
+    ]}
+
+
+def tv_page_payload(num_shows):
+    return {"results": [
+        {
+            "id": s,
+            "TvMazeAPIid": 1000 + s,
+            "title": f"Show {s}",
+            "slug": f"show-{s}-{1000 + s}",
+            "summary": "<p>Serialized drama with a big cast.</p>" * 3,
+            "genres": ["Drama", "Crime"],
+            "image_url": f"https://static.tvmaze.com/uploads/images/original_untouched/{s}.jpg",
+            "premiered": "2015-04-01",
+            "creators": ["Someone Famous"],
+            "status": "Ended",
+            "reviews": {"Trevor": {"id": s, "rating": 9.0, "review": "Great"}},
+            "num_seasons": 4,
+            "seasons": [
+                {
+                    "id": s * 10 + n,
+                    "show": s,
+                    "season_number": n + 1,
+                    "TvMazeAPI_season_id": 50000 + s * 10 + n,
+                    "summary": "",
+                    "season_release_year": 2015 + n,
+                    "season_episode_cnt": 10,
+                    "reviews": {},
+                    "episodes": [
+                        {
+                            "id": s * 1000 + n * 100 + e,
+                            "season_number": s * 10 + n,
+                            "episode_number": e + 1,
+                            "TvMazeAPI_episode_id": 900000 + s * 1000 + n * 100 + e,
+                            "episode_title": f"Episode {e + 1}",
+                            "air_date": "2015-04-08",
+                            "episode_runtime": 60,
+                            "summary": "<p>Things happen.</p>",
+                            "reviews": {},
+                        }
+                        for e in range(10)
+                    ],
+                }
+                for n in range(4)
+            ],
+        }
+        for s in range(num_shows)
+    ]}
+
+
+def time_render(renderer, payload, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = renderer.render(payload)
+        best = min(best, time.perf_counter() - start)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--shows", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if orjson else 'no (FastJSONRenderer falls back to stdlib json)'}")
+    print(f"brotli: {'yes' if brotli else 'no'}")
+    print()
+
+    payloads = [
+        (f"couple_reviews ({args.movies} movies)", couple_page_payload(args.movies)),
+        (f"tv couple shows ({args.shows} shows)", tv_page_payload(args.shows)),
+    ]
+
+    for name, payload in payloads:
+        before_s, before_body = time_render(JSONRenderer(), payload, args.repeat)
+        after_s, after_body = time_render(FastJSONRenderer(), payload, args.repeat)
+        assert before_body == after_body, "renderers disagree"
+
+        print(name)
+        print(f"  render  JSONRenderer      {before_s * 1000:8.2f} ms")
+        print(f"  render  FastJSONRenderer  {after_s * 1000:8.2f} ms   ({before_s / after_s:.1f}x)")
+        print(f"  bytes   identity          {len(after_body):10,d}")
+        gz = compress(after_body, "gzip")
+        print(f"  bytes   gzip              {len(gz):10,d}   ({len(gz) / len(after_body):.1%})")
+        if brotli is not None:
+            br = compress(after_body, "br")
+            print(f"  bytes   br                {len(br):10,d}   ({len(br) / len(after_body):.1%})")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Stand-in for the TMDB and TVMaze APIs, for load-testing imports and sync runs without
+touching the real services.
+
+Serves, on one port:
+    /tmdb/3/movie/{id}               /tmdb/3/movie/{id}/credits        /tmdb/3/movie/changes
+    /tvmaze/shows/{id}               /tvmaze/shows/{id}/seasons
+    /tvmaze/seasons/{id}/episodes    /tvmaze/updates/shows
+
+Responses are replayed from recorded fixtures (FIXTURES/<tmdb|tvmaze>/<path>.json, e.g.
+fixtures/upstream/tmdb/movie/603.json). Paths with no fixture get a made-up payload in the
+same shape, derived from the id, so any id can be imported. With --record, missing fixtures
+are fetched from the real API once and saved (TMDB calls need the api_key the app sends).
+
+Latency and failures can be injected:
+    --latency-ms 80 --jitter-ms 40     every response waits 80-120 ms
+    --error-rate 0.05                  5% of responses are one of --error-status (429s get Retry-After)
+    --hang-rate 0.01                   1% wait --hang-seconds first, to trip client timeouts
+
+Point the app at it with:
+    TMDB_API_BASE=http://127.0.0.1:8765/tmdb/3 TVMAZE_API_BASE=http://127.0.0.1:8765/tvmaze
+
+Usage:
+    python benchmarks/fake_upstream.py [--port 8765] [--latency-ms 0] [--error-rate 0] [--record]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "upstream")
+
+REAL_BASES = {
+    "tmdb": "https://api.themoviedb.org/3",
+    "tvmaze": "https://api.tvmaze.com",
+}
+
+# Made-up shows have 1-5 seasons of this many episodes
+EPISODES_PER_SEASON = 10
+
+# How many ids the made-up /movie/changes and /updates/shows feeds report as changed
+CHANGED_IDS = 100
+
+
+#-------------------------------------------------------
+# Made-up payloads, in the shape the parsers in tmdb.py / tvmaze.py read
+#-------------------------------------------------------
+def tmdb_movie(movie_id, query):
+    return {
+        "id": movie_id,
+        "title": f"Movie {movie_id}",
+        "original_title": f"Movie {movie_id}",
+        "overview": f"Synthetic movie {movie_id}.",
+        "genres": [{"id": 18, "name": "Drama"}, {"id": 35 + movie_id % 3, "name": ["Comedy", "Thriller", "Horror"][movie_id % 3]}],
+        "release_date": f"{1970 + movie_id % 55}-06-01",
+        "runtime": 85 + movie_id % 60,
+        "poster_path": f"/synthetic-{movie_id}.jpg",
+    }
+
+
+def tmdb_credits(movie_id, query):
+    return {
+        "id": movie_id,
+        "cast": [{"name": f"Actor {movie_id}-{n}", "order": n} for n in range(15)],
+        "crew": [
+            {"job": "Director", "name": f"Director {movie_id % 97}"},
+            {"job": "Writer", "name": f"Writer {movie_id % 89}"},
+        ],
+    }
+
+
+def tmdb_changes(query):
+    return {
+        "results": [{"id": movie_id, "adult": False} for movie_id in range(1, CHANGED_IDS + 1)],
+        "page": int(query.get("page", ["1"])[0]),
+        "total_pages": 1,
+        "total_results": CHANGED_IDS,
+    }
+
+
+def tvmaze_show(show_id, query):
+    return {
+        "id": show_id,
+        "name": f"Show {show_id}",
+        "summary": f"<p>Synthetic show {show_id}.</p>",
+        "genres": ["Drama", "Comedy"][: 1 + show_id % 2],
+        "premiered": f"{2000 + show_id % 25}-09-01",
+        "status": "Ended" if show_id % 3 == 0 else "Running",
+        "image": {
+            "medium": f"https://static.tvmaze.com/synthetic/{show_id}-medium.jpg",
+            "original": f"https://static.tvmaze.com/synthetic/{show_id}.jpg",
+        },
+        "_embedded": {"crew": [{"type": "Creator", "person": {"name": f"Creator {show_id % 53}"}}]},
+    }
+
+
+def tvmaze_seasons(show_id, query):
+    return [
+        {
+            "id": show_id * 100 + number,
+            "number": number,
+            "summary": f"Season {number} of show {show_id}.",
+            "premiereDate": f"{2000 + show_id % 25 + number}-09-01",
+            "episodeOrder": EPISODES_PER_SEASON,
+        }
+        for number in range(1, 2 + show_id % 5)
+    ]
+
+
+def tvmaze_episodes(season_id, query):
+    # Running shows' newest season airs weekly around today, so the calendar has something in it
+    show_id, number = divmod(season_id, 100)
+    if show_id % 3 and number == 1 + show_id % 5:
+        first = date.today() - timedelta(weeks=EPISODES_PER_SEASON // 2)
+    else:
+        first = date(2000 + show_id % 25 + number, 9, 1)
+
+    return [
+        {
+            "id": season_id * 100 + episode,
+            "number": episode,
+            "name": f"Episode {episode}",
+            "airdate": (first + timedelta(weeks=episode - 1)).isoformat(),
+            "runtime": 30 + 30 * (show_id % 2),
+            "summary": f"<p>S{number}E{episode} of show {show_id}.</p>",
+        }
+        for episode in range(1, EPISODES_PER_SEASON + 1)
+    ]
+
+
+def tvmaze_updates(query):
+    now = int(time.time())
+    return {str(show_id): now for show_id in range(1, CHANGED_IDS + 1)}
+
+
+ROUTES = [
+    ("tmdb", re.compile(r"^/movie/changes$"), lambda match, query: tmdb_changes(query)),
+    ("tmdb", re.compile(r"^/movie/(\d+)$"), lambda match, query: tmdb_movie(int(match[1]), query)),
+    ("tmdb", re.compile(r"^/movie/(\d+)/credits$"), lambda match, query: tmdb_credits(int(match[1]), query)),
+    ("tvmaze", re.compile(r"^/updates/shows$"), lambda match, query: tvmaze_updates(query)),
+    ("tvmaze", re.compile(r"^/shows/(\d+)$"), lambda match, query: tvmaze_show(int(match[1]), query)),
+    ("tvmaze", re.compile(r"^/shows/(\d+)/seasons$"), lambda match, query: tvmaze_seasons(int(match[1]), query)),
+    ("tvmaze", re.compile(r"^/seasons/(\d+)/episodes$"), lambda match, query: tvmaze_episodes(int(match[1]), query)),
+]
+
+PREFIXES = {"tmdb": "/tmdb/3", "tvmaze": "/tvmaze"}
+
+
+def split_api(path):
+    """'/tmdb/3/movie/603' -> ('tmdb', '/movie/603')"""
+    for api, prefix in PREFIXES.items():
+        if path.startswith(prefix + "/"):
+            return api, path[len(prefix):]
+    return None, path
+
+
+#-------------------------------------------------------
+# Fixtures
+#-------------------------------------------------------
+def fixture_path(fixtures, api, path):
+    return os.path.join(fixtures, api, *path.strip("/").split("/")) + ".json"
+
+
+def load_fixture(fixtures, api, path):
+    try:
+        with open(fixture_path(fixtures, api, path), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def record_fixture(fixtures, api, path, query_string):
+    url = f"{REAL_BASES[api]}{path}" + (f"?{query_string}" if query_string else "")
+    with urlopen(url, timeout=30) as res:
+        body = res.read()
+
+    target = fixture_path(fixtures, api, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(body)
+    return body
+
+
+#-------------------------------------------------------
+# Server
+#-------------------------------------------------------
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, status):
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+
+def make_handler(opts, stats):
+    error_statuses = [int(s) for s in opts.error_status.split(",") if s]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like the real APIs
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+
+            # Injected failures first, they apply to every path
+            if opts.hang_rate and random.random() < opts.hang_rate:
+                time.sleep(opts.hang_seconds)
+            delay = (opts.latency_ms + random.uniform(0, opts.jitter_ms)) / 1000
+            if delay:
+                time.sleep(delay)
+            if error_statuses and opts.error_rate and random.random() < opts.error_rate:
+                status = random.choice(error_statuses)
+                return self.send_json(status, {"status_message": "Injected failure"}, {"Retry-After": "1"} if status == 429 else None)
+
+            api, path = split_api(parts.path)
+            for route_api, pattern, build in ROUTES:
+                match = pattern.match(path)
+                if api == route_api and match:
+                    break
+            else:
+                return self.send_json(404, {"status_message": "The resource you requested could not be found."})
+
+            body = load_fixture(opts.fixtures, api, path)
+            if body is None and opts.record:
+                try:
+                    body = record_fixture(opts.fixtures, api, path, parts.query)
+                except Exception as e:
+                    return self.send_json(502, {"status_message": f"Recording failed: {e}"})
+            if body is None:
+                body = json.dumps(build(match, query)).encode()
+            self.send_body(200, body)
+
+        def send_json(self, status, payload, headers=None):
+            self.send_body(status, json.dumps(payload).encode(), headers)
+
+        def send_body(self, status, body, headers=None):
+            stats.add(status)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json;charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if opts.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES, help="Directory of recorded responses.")
+    parser.add_argument("--record", action="store_true", help="Fetch and save missing fixtures from the real APIs.")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of responses that fail.")
+    parser.add_argument("--error-status", default="500,502,503,429", help="Statuses the failures are picked from.")
+    parser.add_argument("--hang-rate", type=float, default=0, help="Fraction of responses delayed by --hang-seconds.")
+    parser.add_argument("--hang-seconds", type=float, default=20)
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    opts = parser.parse_args()
+
+    stats = Stats()
+    server = ThreadingHTTPServer((opts.host, opts.port), make_handler(opts, stats))
+    server.daemon_threads = True
+
+    # Stopped by the load test with SIGTERM: shut down the same way as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    base = f"http://{opts.host}:{server.server_port}"
+    print(f"Fake upstream on {base}", flush=True)
+    print(f"    TMDB_API_BASE={base}{PREFIXES['tmdb']} TVMAZE_API_BASE={base}{PREFIXES['tvmaze']}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses by status: {dict(sorted(stats.counts.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Load test: mixed read / import / review traffic against a running server, reporting
+throughput and latency percentiles per kind of request.
+
+Each of --concurrency workers loops until --duration is up, picking what to do by --mix:
+    read    a GET of one of READ_PATHS (couple pages, club average, stats, lists, calendar)
+    import  POST /api/movies/import_from_tmdb/ or /api/shows/import_from_tvmaze/ with a random
+            id up to --import-ids, so some are new imports and some hit existing rows
+    review  POST /api/reviews/ on a random movie, then DELETE it again (reported as review_delete)
+Imports and reviews need --username/--password (a JWT is fetched from /api/token/).
+
+With --serve the whole stack is started locally: benchmarks/fake_upstream.py as TMDB/TVMaze,
+and gunicorn with the Procfile's worker class pointed at it, with the throttles raised so
+they don't cap the run. Without it, --base-url must already be running (and its
+TMDB_API_BASE / TVMAZE_API_BASE should point at the fake upstream, not the real APIs).
+
+Usage:
+    python benchmarks/load_test.py --serve --username trevor --password ... [--duration 30] [--concurrency 16]
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --mix read=90,import=5,review=5
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_PATHS = [
+    "/api/movies/?page_size=50",
+    "/api/reviews/?page_size=100",
+    "/api/shows/?fields=id,title,slug&page_size=50",
+    "/api/couple_reviews/tt/",
+    "/api/couple_reviews/mn/",
+    "/api/club_average/",
+    "/api/tv/couple/shows/tt/",
+    "/api/tv/calendar/",
+    "/api/stats/",
+    "/api/analytics/agreement/",
+]
+
+# Throttle rates for the --serve server, high enough that the load test measures the app
+UNTHROTTLED = "1000000/min"
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - {"read", "import", "review"}
+    if unknown:
+        raise SystemExit(f"Unknown --mix entries: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+#-------------------------------------------------------
+# Starting the local stack (--serve)
+#-------------------------------------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=2)
+            return
+        except httpx.TransportError:
+            time.sleep(0.25)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+
+def start_stack(opts):
+    upstream_port, app_port = free_port(), free_port()
+    upstream_base = f"http://127.0.0.1:{upstream_port}"
+
+    upstream = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "fake_upstream.py"),
+        "--port", str(upstream_port),
+        "--latency-ms", str(opts.upstream_latency_ms),
+        "--jitter-ms", str(opts.upstream_jitter_ms),
+        "--error-rate", str(opts.upstream_error_rate),
+    ])
+
+    env = {
+        **os.environ,
+        "TMDB_API_BASE": f"{upstream_base}/tmdb/3",
+        "TVMAZE_API_BASE": f"{upstream_base}/tvmaze",
+        "TMDB_API_KEY": os.environ.get("TMDB_API_KEY", "fake-upstream"),
+        "THROTTLE_IMPORTS": UNTHROTTLED,
+        "THROTTLE_REVIEW_WRITES": UNTHROTTLED,
+        "THROTTLE_ANON_HEAVY_READS": UNTHROTTLED,
+        "WEB_CONCURRENCY": str(opts.workers),
+    }
+    server = subprocess.Popen([
+        "gunicorn", "movieclub_backend.asgi:application",
+        "-k", "uvicorn_worker.UvicornWorker",
+        "--workers", str(opts.workers),
+        "--bind", f"127.0.0.1:{app_port}",
+        "--timeout", "60",
+    ], cwd=ROOT, env=env)
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        wait_until_up(upstream_base)
+        wait_until_up(base_url)
+    except BaseException:
+        stop_stack([server, upstream])
+        raise
+    return base_url, [server, upstream]
+
+
+def stop_stack(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+#-------------------------------------------------------
+# Traffic
+#-------------------------------------------------------
+class LoadTest:
+    def __init__(self, client, opts, weights, movie_ids):
+        self.client = client
+        self.opts = opts
+        self.kinds = list(weights)
+        self.weights = list(weights.values())
+        self.movie_ids = movie_ids
+        self.reviewing = set()   # movies a worker is reviewing right now, so workers don't collide
+        self.results = {}        # kind -> list of (latency, status or exception name)
+
+    def record(self, kind, started, outcome):
+        self.results.setdefault(kind, []).append((time.perf_counter() - started, outcome))
+
+    async def request(self, kind, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.record(kind, started, type(e).__name__)
+            return None
+        self.record(kind, started, response.status_code)
+        return response
+
+    async def read(self):
+        await self.request("read", "GET", random.choice(READ_PATHS))
+
+    async def import_(self):
+        upstream_id = random.randint(1, self.opts.import_ids)
+        if random.random() < 0.5:
+            await self.request("import_movie", "POST", "/api/movies/import_from_tmdb/", json={"tmdb_id": upstream_id})
+        else:
+            await self.request("import_show", "POST", "/api/shows/import_from_tvmaze/", json={"tvmaze_id": upstream_id})
+
+    async def review(self):
+        available = [movie_id for movie_id in random.sample(self.movie_ids, min(20, len(self.movie_ids))) if movie_id not in self.reviewing]
+        if not available:
+            return await self.read()
+
+        movie_id = available[0]
+        self.reviewing.add(movie_id)
+        try:
+            response = await self.request("review", "POST", "/api/reviews/", json={
+                "movie": movie_id,
+                "rating": round(random.uniform(1, 10), 1),
+                "rating_justification": "load test",
+            })
+            if response is not None and response.status_code == 201:
+                await self.request("review_delete", "DELETE", f"/api/reviews/{response.json()['id']}/")
+        finally:
+            self.reviewing.discard(movie_id)
+
+    async def worker(self, deadline):
+        actions = {"read": self.read, "import": self.import_, "review": self.review}
+        while time.monotonic() < deadline:
+            kind = random.choices(self.kinds, self.weights)[0]
+            await actions[kind]()
+
+    async def run(self):
+        deadline = time.monotonic() + self.opts.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(self.worker(deadline) for _ in range(self.opts.concurrency)))
+        return time.perf_counter() - started
+
+
+async def login(client, username, password):
+    response = await client.post("/api/token/", json={"username": username, "password": password})
+    if response.status_code != 200:
+        raise SystemExit(f"Login failed ({response.status_code}): {response.text[:200]}")
+    client.headers["Authorization"] = f"Bearer {response.json()['access']}"
+
+
+async def movie_ids(client):
+    response = await client.get("/api/movies/", params={"fields": "id", "page_size": 500})
+    response.raise_for_status()
+    return [movie["id"] for movie in response.json()["results"]]
+
+
+async def run_load_test(base_url, opts):
+    weights = parse_mix(opts.mix)
+    limits = httpx.Limits(max_connections=opts.concurrency, max_keepalive_connections=opts.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(opts.timeout), limits=limits) as client:
+        if opts.username:
+            await login(client, opts.username, opts.password)
+        elif weights.get("import") or weights.get("review"):
+            print("No --username given, only sending reads.\n")
+            weights = {"read": 1}
+
+        ids = await movie_ids(client) if weights.get("review") else []
+        if not ids and weights.pop("review", None):
+            print("No movies to review yet, skipping reviews.\n")
+
+        test = LoadTest(client, opts, weights, ids)
+        elapsed = await test.run()
+    return test.results, elapsed
+
+
+def report(results, elapsed):
+    total = sum(len(rows) for rows in results.values())
+    print(f"{total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s\n")
+    print(f"{'kind':14s} {'requests':>8s} {'req/s':>8s} {'errors':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}  statuses")
+
+    for kind, rows in sorted(results.items()):
+        latencies = sorted(latency * 1000 for latency, _ in rows)
+        statuses = {}
+        for _, outcome in rows:
+            statuses[outcome] = statuses.get(outcome, 0) + 1
+        errors = sum(count for outcome, count in statuses.items() if not (isinstance(outcome, int) and outcome < 400))
+        print(
+            f"{kind:14s} {len(rows):8d} {len(rows) / elapsed:8.1f} {errors:7d} "
+            f"{percentile(latencies, 0.50):8.1f} {percentile(latencies, 0.95):8.1f} "
+            f"{percentile(latencies, 0.99):8.1f} {latencies[-1]:8.1f}  "
+            + ", ".join(f"{outcome}: {count}" for outcome, count in sorted(statuses.items(), key=str))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--serve", action="store_true", help="Start the fake upstream and a local gunicorn first.")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers with --serve (more than 1 needs REDIS_URL).")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to send traffic for.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+    parser.add_argument("--mix", default="read=80,import=10,review=10", help="Relative weights of read/import/review.")
+    parser.add_argument("--import-ids", type=int, default=2000, help="Imports use TMDB/TVMaze ids from 1 to this.")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+    parser.add_argument("--username", default=os.environ.get("LOAD_TEST_USERNAME"))
+    parser.add_argument("--password", default=os.environ.get("LOAD_TEST_PASSWORD"))
+    parser.add_argument("--upstream-latency-ms", type=float, default=50, help="Fake upstream latency with --serve.")
+    parser.add_argument("--upstream-jitter-ms", type=float, default=50)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    opts = parser.parse_args()
+
+    processes = []
+    base_url = opts.base_url
+    if opts.serve:
+        base_url, processes = start_stack(opts)
+
+    print(f"server: {base_url}   concurrency: {opts.concurrency}   mix: {opts.mix}")
+    print()
+    try:
+        results, elapsed = asyncio.run(run_load_test(base_url, opts))
+    finally:
+        stop_stack(processes)
+
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+from django.contrib import admin
+
+from moviereviews_hub.couples import COUPLE_SLUG_TO_ID_MAP
+
+# =============================================
+# Admin list filters shared by the apps
+# =============================================
+
+
+def couple_list_filter(field_name):
+    """
+    A "by couple" changelist filter on `field_name`. The choices come from the couples map,
+    so the admin doesn't run a SELECT DISTINCT over the whole table to build them.
+    """
+
+    class CoupleListFilter(admin.SimpleListFilter):
+        title = "couple"
+        parameter_name = "couple"
+
+        def lookups(self, request, model_admin):
+            return [(couple_id, couple_id) for couple_id in COUPLE_SLUG_TO_ID_MAP.values()]
+
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{field_name: self.value()})
+            return queryset
+
+    return CoupleListFilter
@@ -0,0 +1,131 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .renderers import FastJSONRenderer
+
+# =============================================
+# Plumbing for the async (ASGI) API views: DRF authentication and parsing
+# for plain Django async views, JSON responses, streamed responses, and a pooled
+# HTTP client for the upstream APIs (TMDB, TVMaze)
+# =============================================
+
+UPSTREAM_TIMEOUT = httpx.Timeout(15.0)
+UPSTREAM_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# One client (and connection pool) per event loop. Under ASGI that is one per worker process
+_clients = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def upstream_client(request):
+    """
+    Yield an httpx.AsyncClient for upstream calls.
+
+    Under ASGI the event loop lives as long as the worker, so every request shares one
+    pooled client. Under WSGI Django runs each async view in a short-lived loop, so the
+    client is created for the request and closed afterwards.
+    """
+    if isinstance(request, ASGIRequest):
+        loop = asyncio.get_running_loop()
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS)
+            _clients[loop] = client
+        yield client
+    else:
+        async with httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS) as client:
+            yield client
+
+
+async def _aiterate(iterator):
+    # Pull each item on the thread that runs sync code, so DB cursors opened by the iterator stay usable
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=True)(iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def streaming_content(request, iterator):
+    """
+    Content for a StreamingHttpResponse that is really streamed under both servers.
+
+    Under ASGI Django would read a sync iterator into a list before sending anything,
+    so it is wrapped in an async iterator there. Under WSGI the sync iterator is used as is.
+    """
+    if isinstance(request, ASGIRequest):
+        return _aiterate(iterator)
+    return iterator
+
+
+class ImportFailed(Exception):
+    """Raised inside an import to end the request with {"detail": ...} and this status."""
+
+    def __init__(self, detail, status):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def _authenticate(drf_request):
+    try:
+        user = drf_request.user
+        drf_request.data  # parse the body while we are on the sync thread
+    except exceptions.APIException as e:
+        return None, e
+    return user, None
+
+
+def _throttle_wait(drf_request, throttle_classes):
+    # Like APIView.check_throttles: every throttle counts the request, the longest wait wins
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            waits.append(throttle.wait())
+    return max(waits) if waits else None
+
+
+async def authenticated_request(request, throttle_classes=()):
+    """
+    Run the project's DRF authenticators, parsers and the given throttles for a plain Django async view.
+
+    RETURNS (drf_request, None) when the user is logged in (and not throttled), or (None, error_response).
+    CSRF is enforced by SessionAuthentication exactly like in DRF views, so async views
+    using this should be csrf_exempt.
+    """
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+
+    user, error = await sync_to_async(_authenticate)(drf_request)
+    if error is not None:
+        return None, json_response({"detail": str(error.detail)}, status=error.status_code)
+    if not (user and user.is_authenticated):
+        return None, json_response({"detail": "Authentication credentials were not provided."}, status=401)
+
+    if throttle_classes:
+        wait = await sync_to_async(_throttle_wait)(drf_request, throttle_classes)
+        if wait is not None:
+            response = json_response({"detail": f"Request was throttled. Expected available in {wait} seconds."}, status=429)
+            response["Retry-After"] = str(wait)
+            return None, response
+
+    return drf_request, None
@@ -0,0 +1,150 @@
+import json
+import logging
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .db_router import replica_allowed, use_replica, view_uses_read_replica
+
+# =============================================
+# POST /api/batch/ runs several of our own GET endpoints in one round trip:
+#
+#   {"requests": [{"id": "movies", "url": "/api/couple_reviews/tt/"},
+#                 {"id": "club",   "url": "/api/club_average/"}]}
+#   -> {"responses": {"movies": {"status": 200, "body": {...}}, "club": {...}}}
+#
+# Each URL is resolved and its view called directly in this request: the user authenticated
+# once for the batch is handed to every sub-request, and they share its DB connection and
+# cache. Middleware runs once, for the batch, so replica routing is decided here per
+# sub-request the way ReplicaRoutingMiddleware would. Sub-requests keep their own permissions
+# and throttles, and the exceptions Django turns into 403/404/400 get those statuses. Only
+# GETs of /api/ endpoints, no streaming or async views, and at most MAX_BATCH_REQUESTS per batch.
+# =============================================
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_REQUESTS = 20
+
+# Headers of a sub-response worth passing on
+FORWARDED_HEADERS = ("Retry-After",)
+
+
+class BatchError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _parse_batch(data):
+    items = data.get("requests") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise BatchError(400, 'Send {"requests": [{"id": ..., "url": ...}, ...]}')
+    if len(items) > MAX_BATCH_REQUESTS:
+        raise BatchError(400, f"At most {MAX_BATCH_REQUESTS} requests per batch")
+
+    batch = {}
+    for item in items:
+        # A bare URL string is its own id
+        request_id, url = (item, item) if isinstance(item, str) else (item.get("id"), item.get("url"))
+        if not isinstance(request_id, str) or not isinstance(url, str):
+            raise BatchError(400, "Every request needs a string id and url")
+        if request_id in batch:
+            raise BatchError(400, f"Duplicate request id {request_id!r}")
+        batch[request_id] = url
+    return batch
+
+
+def _sub_request(request, path, query, match):
+    sub = HttpRequest()
+    sub.method = "GET"
+    sub.path = sub.path_info = path
+    sub.META = {
+        **{key: value for key, value in request.META.items() if key not in ("CONTENT_LENGTH", "CONTENT_TYPE")},
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+    }
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    sub.resolver_match = match
+
+    # DRF picks these up instead of running the authenticators again
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    if hasattr(response, "data"):   # DRF Response, not rendered yet
+        return response.data
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        return response.content.decode(response.charset or "utf-8", errors="replace")
+
+
+def _dispatch(request, url):
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/api/"):
+        raise BatchError(400, "Only relative /api/ URLs can be batched")
+
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        raise BatchError(404, "Not found.")
+    if match.func is batch_requests or iscoroutinefunction(match.func):
+        raise BatchError(400, "This endpoint can't be batched")
+
+    sub = _sub_request(request, parts.path, parts.query, match)
+    try:
+        with use_replica(view_uses_read_replica(match.func) or replica_allowed(sub)):
+            response = match.func(sub, *match.args, **match.kwargs)
+    except Http404:
+        raise BatchError(404, "Not found.")
+    except PermissionDenied:
+        raise BatchError(403, "You do not have permission to perform this action.")
+    except SuspiciousOperation:
+        logger.warning("Suspicious batched request %s", url, exc_info=True)
+        raise BatchError(400, "Bad request.")
+
+    if response.streaming:
+        raise BatchError(400, "Streaming endpoints can't be batched")
+
+    result = {"status": response.status_code, "body": _body(response)}
+    headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+    if headers:
+        result["headers"] = headers
+    return result
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny])   # every sub-request checks its own permissions
+def batch_requests(request):
+    try:
+        batch = _parse_batch(request.data)
+    except BatchError as e:
+        return Response({"detail": e.detail}, status=e.status)
+
+    responses = {}
+    for request_id, url in batch.items():
+        try:
+            responses[request_id] = _dispatch(request, url)
+        except BatchError as e:
+            responses[request_id] = {"status": e.status, "body": {"detail": e.detail}}
+        except Exception:
+            logger.exception("Batched request %s failed", url)
+            responses[request_id] = {"status": 500, "body": {"detail": "Server error."}}
+
+    return Response({"responses": responses})
+
+
+# Only reads, so it doesn't pin the client to the primary like other POSTs (see db_router.py)
+batch_requests.read_only = True
@@ -0,0 +1,144 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import permissions
+
+# =============================================
+# Read replica routing.
+#
+# Reads go to the "replica" database only while a request has switched it on through
+# ReplicaRoutingMiddleware: safe-method (GET/HEAD/OPTIONS) requests from clients that have
+# not just written something. Writes, management commands and background jobs always
+# use "default". After a write the client is pinned to the primary for
+# REPLICA_STICKY_SECONDS so they see their own review straight away.
+#
+# The pin is kept in two places so whichever worker serves the next request sees it: a signed
+# cookie the client sends back, and the default cache (which covers clients that don't keep
+# cookies, as long as the cache is shared, i.e. REDIS_URL is set).
+# =============================================
+
+REPLICA_ALIAS = "replica"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Route reads in this block to the replica (if one is configured)."""
+    token = _use_replica.set(enabled and replica_configured())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Objects loaded from the primary keep following it (e.g. related lookups after a write)
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return REPLICA_ALIAS if _use_replica.get() else "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db == "default"
+
+
+# ---------------------------------------------
+# Sticky primary after writes
+# ---------------------------------------------
+def _client_key(request):
+    # JWT clients are identified by their token, browser sessions by their cookie, everyone else by IP
+    identity = (
+        request.META.get("HTTP_AUTHORIZATION")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get("REMOTE_ADDR", "")
+    )
+    return "replica-sticky:" + hashlib.sha256(identity.encode()).hexdigest()
+
+
+REPLICA_PIN_COOKIE = "primary_pin"
+REPLICA_PIN_SALT = "db_router.replica_pin"
+
+
+def pin_to_primary(request, response):
+    until = time.time() + settings.REPLICA_STICKY_SECONDS
+    cache.set(_client_key(request), until, settings.REPLICA_STICKY_SECONDS)
+    response.set_signed_cookie(
+        REPLICA_PIN_COOKIE, str(until), salt=REPLICA_PIN_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+        samesite="Lax", secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+def is_pinned_to_primary(request):
+    cookie = request.get_signed_cookie(
+        REPLICA_PIN_COOKIE, default=None, salt=REPLICA_PIN_SALT, max_age=settings.REPLICA_STICKY_SECONDS,
+    )
+    until = float(cookie) if cookie else cache.get(_client_key(request))
+    return until is not None and until > time.time()
+
+
+def replica_allowed(request):
+    return request.method in permissions.SAFE_METHODS and not is_pinned_to_primary(request)
+
+
+def view_uses_read_replica(view_func):
+    """Whether the view (or its viewset class) set use_read_replica = True."""
+    view_class = getattr(view_func, "cls", None)
+    return getattr(view_func, "use_read_replica", False) or getattr(view_class, "use_read_replica", False)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Turn replica reads on for safe requests, and pin a client to the primary after a write.
+
+    Views (or viewset classes) can set `use_read_replica = True` to always read from the
+    replica for safe requests, even while pinned. That is meant for data users never write.
+    Views with `read_only = True` never pin the client, whatever their method.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        request._replica_allowed = replica_allowed(request)
+        token = _use_replica.set(request._replica_allowed)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+        if request.method not in permissions.SAFE_METHODS and response.status_code < 400 and not getattr(request, "_read_only_view", False):
+            pin_to_primary(request, response)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Views that only read despite the method (e.g. the batch endpoint) set read_only = True
+        request._read_only_view = getattr(view_func, "read_only", False)
+        if not replica_configured() or request.method not in permissions.SAFE_METHODS:
+            return None
+
+        if view_uses_read_replica(view_func):
+            _use_replica.set(True)
+        return None
@@ -0,0 +1,169 @@
+from django.utils.module_loading import import_string
+from rest_framework import permissions, serializers
+
+# =============================================
+# Sparse fieldsets for the API: ?fields=, ?exclude= and ?expand=
+#
+#   /api/movies/?fields=title,poster_url             only these fields
+#   /api/shows/?exclude=seasons.episodes              nested names use dots
+#   /api/reviews/?expand=movie                        swap a foreign key id for the nested object
+#
+# FieldSelectionMixin goes on serializers, FieldSelectionViewMixin on viewsets so the
+# SQL only loads (and joins/prefetches) what the serializer is going to output.
+# Selections only apply to safe (read) requests, writes always see every field.
+# =============================================
+
+
+def _split(value):
+    return {part.strip() for part in (value or "").split(",") if part.strip()}
+
+
+class FieldSelection:
+    def __init__(self, fields=None, exclude=(), expand=()):
+        self.fields = set(fields) if fields else None   # None means "everything"
+        self.exclude = set(exclude)
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return cls()
+        params = getattr(request, "query_params", request.GET)
+        return cls(_split(params.get("fields")), _split(params.get("exclude")), _split(params.get("expand")))
+
+    def is_empty(self):
+        return self.fields is None and not self.exclude and not self.expand
+
+    def narrows(self):
+        return self.fields is not None or bool(self.exclude)
+
+    def includes(self, name):
+        if name in self.exclude:
+            return False
+        if self.fields is None or name in self.expand:
+            return True
+        return name in self.fields or any(f.startswith(name + ".") for f in self.fields)
+
+    def for_child(self, name):
+        """The part of this selection that applies inside the nested field `name`."""
+        prefix = name + "."
+
+        def nested(items):
+            return {item[len(prefix):] for item in items if item.startswith(prefix)}
+
+        # "?fields=seasons" without any "seasons.x" keeps every nested field
+        child_fields = nested(self.fields) if self.fields is not None else None
+        return FieldSelection(child_fields, nested(self.exclude), nested(self.expand))
+
+
+def _unwrap(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+class FieldSelectionMixin:
+    """
+    Serializer mixin that applies a FieldSelection.
+
+    The outermost serializer reads the selection from the request in its context, nested
+    serializers get their part from their parent. Foreign keys listed in
+    Meta.expandable_fields = {"movie": MovieSerializer} (or a dotted path string, for
+    serializers defined later) can be swapped for the nested object with ?expand=.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._selection = kwargs.pop("selection", None)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def selection(self):
+        if self._selection is None:
+            outermost = self.parent is None or (
+                isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+            )
+            request = self.context.get("request") if outermost else None
+            self._selection = FieldSelection.from_request(request)
+        return self._selection
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection.is_empty():
+            return fields
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+
+        for name in list(fields):
+            if not selection.includes(name):
+                del fields[name]
+                continue
+
+            if name in selection.expand and name in expandable:
+                serializer_class = expandable[name]
+                if isinstance(serializer_class, str):
+                    serializer_class = import_string(serializer_class)
+                fields[name] = serializer_class(read_only=True)
+
+            # Hand the nested part of the selection down
+            nested = _unwrap(fields[name])
+            if isinstance(nested, FieldSelectionMixin):
+                nested._selection = selection.for_child(name)
+
+        return fields
+
+
+def field_is_nested(serializer, path):
+    """True if the dotted `path` is output as a nested serializer (so it needs a join or prefetch)."""
+    current = serializer
+    for name in path.split("."):
+        if not isinstance(_unwrap(current), serializers.BaseSerializer):
+            return False   # a parent on the path is output as an id
+        fields = _unwrap(current).fields
+        if name not in fields:
+            return False
+        current = fields[name]
+    return isinstance(_unwrap(current), serializers.BaseSerializer)
+
+
+class FieldSelectionViewMixin:
+    """
+    Viewset mixin that narrows the queryset to what the (field selected) serializer outputs.
+
+    selection_select_related / selection_prefetch_related map a serializer field path
+    to the relation to join or prefetch, and are only applied when that field is output
+    as a nested object. With ?fields= or ?exclude= the columns are narrowed with .only().
+    """
+    selection_select_related = {}
+    selection_prefetch_related = {}
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return qs
+
+        serializer = self.get_serializer()
+
+        for path, relation in self.selection_select_related.items():
+            if field_is_nested(serializer, path):
+                qs = qs.select_related(relation)
+        for path, relation in self.selection_prefetch_related.items():
+            if field_is_nested(serializer, path):
+                qs = qs.prefetch_related(relation)
+
+        if serializer.selection.narrows():
+            qs = qs.only(*self._selected_columns(serializer, qs))
+        return qs
+
+    def _selected_columns(self, serializer, qs):
+        model_fields = {f.name for f in qs.model._meta.concrete_fields}
+
+        columns = {qs.model._meta.pk.name, getattr(self, "lookup_field", "pk")}
+        columns.update(
+            field.source for field in serializer.fields.values()
+            if not field.write_only and field.source in model_fields
+        )
+
+        # Relations that are joined can't be deferred
+        if isinstance(qs.query.select_related, dict):
+            columns.update(qs.query.select_related)
+
+        return sorted(columns & model_fields)
@@ -0,0 +1,164 @@
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses fall back to gzip
+    brotli = None
+
+# =============================================
+# Project wide middleware
+# =============================================
+
+# Snapshot files are named <name>.<12 hex digit content hash>.json
+SNAPSHOT_HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.json$")
+
+
+class SnapshotWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, plus the JSON snapshots written at runtime by moviereviews_hub.snapshots.
+
+    WhiteNoise only scans its directories at startup, so snapshot files are looked up
+    on first request and then remembered. Their names carry a content hash, so they
+    are served with far-future immutable cache headers. publish_snapshots() deletes old
+    versions, so a remembered file is checked to still exist before it is served.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshot_prefix = settings.SNAPSHOT_URL
+        self.snapshot_root = os.path.abspath(settings.SNAPSHOT_ROOT) + os.path.sep
+        self.snapshot_files = {}   # url -> (path on disk, StaticFile)
+
+    def __call__(self, request):
+        path = request.path_info
+        if path.startswith(self.snapshot_prefix):
+            response = self.serve_snapshot(path, request)
+            if response is not None:
+                return response
+        return super().__call__(request)
+
+    def serve_snapshot(self, url, request):
+        found = self.snapshot_files.get(url)
+        if found is None or not os.path.isfile(found[0]):
+            self.snapshot_files.pop(url, None)
+            found = self.find_snapshot(url)
+            if found is None:
+                return None
+            self.snapshot_files[url] = found
+
+        try:
+            return self.serve(found[1], request)
+        except FileNotFoundError:   # removed by a publish in between
+            self.snapshot_files.pop(url, None)
+            return None
+
+    def find_snapshot(self, url):
+        name = url[len(self.snapshot_prefix):]
+        if not SNAPSHOT_HASHED_NAME.search(name) or not self.url_is_canonical(url):
+            return None
+
+        path = os.path.join(self.snapshot_root, name)
+        if not self.path_is_child_of(path, self.snapshot_root) or not os.path.isfile(path):
+            return None
+        return path, self.get_static_file(path, url)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.snapshot_prefix):
+            return bool(SNAPSHOT_HASHED_NAME.search(url))
+        return super().immutable_file_test(path, url)
+
+
+# ---------------------------------------------
+# Response compression
+# ---------------------------------------------
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def _accepted_encodings(accept_encoding):
+    # "gzip, br;q=0.9, *;q=0" -> {"gzip": 1.0, "br": 0.9, "*": 0.0}
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best encoding we support from an Accept-Encoding header, brotli first."""
+    accepted = _accepted_encodings(accept_encoding or "")
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    best = None
+    best_q = 0.0
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compress non-streaming text/JSON responses with brotli or gzip, whichever the client
+    prefers, once they are bigger than COMPRESSION_MIN_SIZE bytes.
+    Streaming responses (CSV exports, event streams) are left alone.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+
+        # Caches must keep the compressed and uncompressed versions apart, even when we skip compression
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+
+        # The body changed, so a strong ETag no longer matches it byte for byte
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        return response
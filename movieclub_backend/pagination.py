@@ -0,0 +1,202 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import remove_query_param
+
+# =============================================
+# Pagination and row counts for big tables. COUNT(*) on Postgres reads the whole table
+# (or index), which on millions of rows is slower than the page it is counting for, so
+# the API pages by keyset without counting, and large counts come from the planner's estimate
+# =============================================
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough and is used instead
+EXACT_COUNT_BELOW = 10_000
+
+
+def _planner_rows(queryset):
+    connection = connections[queryset.db]
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # Whole table: the row count kept by VACUUM/ANALYZE (-1 if the table was never analyzed)
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"]
+
+
+def estimated_count(queryset, exact_below=EXACT_COUNT_BELOW):
+    """
+    The number of rows in `queryset`: exact when it is small (or the database isn't Postgres),
+    otherwise Postgres' estimate, which is cheap but only approximately right.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+
+    estimate = _planner_rows(queryset)
+    if estimate is None or estimate < exact_below:
+        return queryset.count()
+    return int(estimate)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses estimated_count() for big querysets (e.g. admin changelists)."""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, "query"):
+            return estimated_count(self.object_list)
+        return super().count
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Default pagination for the API list endpoints.
+
+    Pages are read in id order with WHERE id > <cursor> LIMIT n, so every page costs the
+    same however deep it is and a response never holds more than max_page_size rows.
+    There is no count unless asked for:
+
+        ?page_size=200      rows per page (at most max_page_size)
+        ?count=exact        add "count" from COUNT(*)
+        ?count=estimate     add "count" from estimated_count() (cheap, approximate on big tables)
+
+    The count is left out of the next/previous links, so it is only paid for on the first page.
+    """
+
+    ordering = "id"   # unique and indexed, so the order is deterministic and the cursor is a keyset
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.count_query_param)
+        self.count = None
+        if mode == "exact":
+            self.count = queryset.count()
+        elif mode == "estimate":
+            self.count = estimated_count(queryset)
+
+        page = self._page(queryset, request, view)
+        if page is not None:
+            self.base_url = remove_query_param(self.base_url, self.count_query_param)
+        return page
+
+    def _page(self, queryset, request, view):
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {"count": self.count, **response.data}
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+
+class CompositeKeysetCursorPagination(KeysetCursorPagination):
+    """
+    KeysetCursorPagination ordered by several columns, e.g. ("air_date", "id").
+
+    DRF's cursor only keeps the first column's value plus an OFFSET into the rows sharing it,
+    so a page inside a long run of equal values (hundreds of episodes on one air date) skips
+    rows one by one, and past offset_cutoff it stops working. Here the cursor holds the boundary
+    row's value of every column and a page is read with
+
+        WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n
+
+    written out as a >= x AND (a > x OR (a = x AND b > y)), which an index on (a, b) serves as
+    one range scan. The columns are ascending and not null, and together they are unique.
+    """
+
+    def _page(self, queryset, request, view):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = None
+        if self.cursor and self.cursor.position is not None:
+            position = self._decode_position(queryset.model, self.cursor.position)
+
+        queryset = queryset.order_by(*(f"-{field}" if reverse else field for field in self.ordering))
+        if position is not None:
+            # The cursor's offset is 1 when the boundary row itself belongs to the page (see the links)
+            queryset = queryset.filter(self._beyond(position, reverse, inclusive=bool(self.cursor.offset)))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def _beyond(self, position, reverse, inclusive):
+        # (a, b, c) > (x, y, z) is a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        lookup = "lt" if reverse else "gt"
+        clauses = [
+            Q(**dict(zip(self.ordering[:i], position[:i])), **{f"{field}__{lookup}": position[i]})
+            for i, field in enumerate(self.ordering)
+        ]
+        if inclusive:
+            clauses.append(Q(**dict(zip(self.ordering, position))))
+        # The first column's bound on its own, so the planner starts the index scan there
+        return Q(**{f"{self.ordering[0]}__{lookup}e": position[0]}) & reduce(or_, clauses)
+
+    def _encode_position(self, row):
+        values = [row[field] if isinstance(row, dict) else getattr(row, field) for field in self.ordering]
+        return json.dumps([str(value) for value in values])
+
+    def _decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(self.ordering, values)]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._encode_position(self.page[-1])))
+        # An empty page read backwards: the next page starts at (and includes) the cursor's row
+        return self.encode_cursor(Cursor(offset=1, reverse=False, position=self.cursor.position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._encode_position(self.page[0])))
+        return self.encode_cursor(Cursor(offset=1, reverse=True, position=self.cursor.position))
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# =============================================
+# Small publish/subscribe layer for the live feeds (see moviereviews_hub/live.py).
+#
+# publish() is called from ordinary sync code (views, on_commit hooks), subscribe() from async
+# views under ASGI. A subscriber is an asyncio.Queue on its event loop, so an idle connection is
+# one suspended coroutine and no thread.
+#
+#   InProcessBroker  fans messages out inside the worker process. Enough for one worker
+#   RedisBroker      sends them through Redis pub/sub so every worker sees every message.
+#                    Each worker process keeps one Redis subscription, whatever the connection count
+#
+# settings.PUBSUB_BROKER picks the class (dotted path), by default Redis when REDIS_URL is set.
+# =============================================
+
+logger = logging.getLogger(__name__)
+
+# Messages a slow subscriber can fall behind by before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Put on a subscriber's queue instead of the messages it missed
+OVERFLOW = object()
+
+
+class Subscription:
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, message):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    def deliver(self, message):
+        """Hand a message to the subscriber from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # the loop is closed, the subscriber is gone
+
+    async def get(self):
+        """The next message (a JSON-compatible value), or OVERFLOW if some were dropped."""
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscriptions = {}   # channel -> set of Subscription
+        self._lock = threading.Lock()
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscriptions.get(channel)
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[channel]
+
+
+class RedisBroker(InProcessBroker):
+    """Publishes through Redis, one pattern subscription per worker loop fans messages out locally."""
+
+    PREFIX = "pubsub:"
+    RECONNECT_SECONDS = 2
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or settings.REDIS_URL
+        self._client = None
+        self._listeners = weakref.WeakKeyDictionary()   # loop -> listener task
+
+    def publish(self, channel, message):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        try:
+            self._client.publish(self.PREFIX + channel, json.dumps(message))
+        except redis.RedisError:
+            logger.exception("Could not publish to %s", channel)
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.PREFIX + "*")
+                    async for item in pubsub.listen():
+                        if item["type"] != "pmessage":
+                            continue
+                        channel = item["channel"].decode()[len(self.PREFIX):]
+                        self._deliver(channel, json.loads(item["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis subscription lost, reconnecting")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+
+        async with super().subscribe(channel) as subscription:
+            yield subscription
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                default = "movieclub_backend.pubsub.RedisBroker" if settings.REDIS_URL else "movieclub_backend.pubsub.InProcessBroker"
+                _broker = import_string(getattr(settings, "PUBSUB_BROKER", None) or default)()
+    return _broker
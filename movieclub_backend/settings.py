@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +28,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = [
     'movieclubdatabase.onrender.com',
+    # Local servers (e.g. benchmarks/load_test.py --serve)
+    'localhost',
+    '127.0.0.1',
 ]
 
 
@@ -47,6 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'movieclub_backend.middleware.SnapshotWhiteNoiseMiddleware',  # Serves static files and the JSON snapshots without hitting Django views
+    'movieclub_backend.middleware.CompressionMiddleware',         # brotli/gzip for large API responses
+    'movieclub_backend.db_router.ReplicaRoutingMiddleware',       # Sends safe requests to the read replica, if configured
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,14 +73,34 @@ CORS_ALLOWED_ORIGINS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',   # For token authentication from frontend
+        'moviereviews_hub.authentication.ClaimsJWTAuthentication',     # For token authentication from frontend, from the token's claims without a user query
         'rest_framework.authentication.SessionAuthentication',         # Tracks who a user is on api site
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly', # Controls who can do what with the API. Anyone can GET, but only users that have logged in can POST, etc.
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'movieclub_backend.renderers.FastJSONRenderer',  # orjson backed, falls back to the stdlib encoder if orjson is missing
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Every list endpoint is paged by id with a capped page size and no COUNT(*) (see pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'movieclub_backend.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 100,
+    # Rates for the throttled scopes (see throttling.py), per user when logged in and per IP otherwise
+    'DEFAULT_THROTTLE_RATES': {
+        'imports': os.environ.get('THROTTLE_IMPORTS', '30/hour'),
+        'review_writes': os.environ.get('THROTTLE_REVIEW_WRITES', '60/min'),
+        'anon_heavy_reads': os.environ.get('THROTTLE_ANON_HEAVY_READS', '60/min'),
+    },
+    # Render puts one proxy in front of the app, so the client IP is the last X-Forwarded-For entry
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
 }
 
+# Responses smaller than this are not worth compressing
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
 
 
 ROOT_URLCONF = 'movieclub_backend.urls'
@@ -100,14 +127,14 @@ WSGI_APPLICATION = 'movieclub_backend.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 import dj_database_url
-import os
+from importlib.util import find_spec
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 if DATABASE_URL:
     # Render / production
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        "default": dj_database_url.parse(DATABASE_URL)
     }
 else:
     # Local Postgres
@@ -122,6 +149,94 @@ else:
         }
     }
 
+# How database connections are reused. Applied the same way to every database, local or Render:
+#   native     - psycopg 3 connection pool inside each worker process (default when psycopg_pool is installed)
+#   pgbouncer  - an external pgbouncer in transaction mode, server-side cursors must be off
+#   persistent - one long lived connection per thread (CONN_MAX_AGE), with health checks
+DB_POOL_MODE = os.environ.get("DB_POOL_MODE") or ("native" if find_spec("psycopg_pool") else "persistent")
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))   # seconds to wait for a free connection
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "600"))
+
+
+def apply_connection_pooling(db):
+    if db.get("ENGINE") != "django.db.backends.postgresql":
+        return db  # e.g. sqlite for local experiments
+
+    options = db.setdefault("OPTIONS", {})
+
+    if DB_POOL_MODE == "native":
+        from psycopg_pool import ConnectionPool
+
+        # The pool hands out connections per request, Django must not also keep them open
+        db["CONN_MAX_AGE"] = 0
+        options["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+            "check": ConnectionPool.check_connection,   # drop dead connections before handing them out
+        }
+    else:
+        db["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+        db["CONN_HEALTH_CHECKS"] = True
+
+        if DB_POOL_MODE == "pgbouncer":
+            # Named cursors don't survive pgbouncer switching server connections between transactions
+            db["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+    return db
+
+
+# Optional read replica. Safe-method requests read from it (see movieclub_backend/db_router.py)
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = dj_database_url.parse(DATABASE_REPLICA_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+for _db in DATABASES.values():
+    apply_connection_pooling(_db)
+
+DATABASE_ROUTERS = ['movieclub_backend.db_router.PrimaryReplicaRouter']
+
+# After a write, a client reads from the primary for this long so they see their own changes
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "15"))
+
+
+# Cache. Shared through Redis when REDIS_URL is set (so every worker sees the same entries and
+# invalidations), otherwise a per-process in-memory cache for local development
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# gunicorn workers (see Procfile / render.yaml). Throttle counts, replica pins and cached payloads
+# live in the cache, so with several workers and the per-process cache every rate limit would be
+# multiplied by the worker count and invalidations would miss the other workers: refuse to start
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+if WEB_CONCURRENCY > 1 and not REDIS_URL:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(
+        f"WEB_CONCURRENCY={WEB_CONCURRENCY} needs a cache shared between the workers: set REDIS_URL, "
+        "or run a single worker"
+    )
+
+# Pub/sub behind the live review feeds (see pubsub.py). Redis when REDIS_URL is set, so events reach
+# clients connected to any worker, otherwise in-process. A dotted class path overrides the choice
+PUBSUB_BROKER = os.environ.get("PUBSUB_BROKER")
+
 
 
 # Password validation
@@ -160,6 +275,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Pre-rendered JSON snapshots of the public feeds (see moviereviews_hub/snapshots.py)
+SNAPSHOT_ROOT = os.environ.get("SNAPSHOT_ROOT", BASE_DIR / "snapshots")
+SNAPSHOT_URL = '/snapshots/'
+SNAPSHOTS_ENABLED = os.environ.get("SNAPSHOTS_ENABLED", "1") == "1"
+SNAPSHOT_DEBOUNCE_SECONDS = float(os.environ.get("SNAPSHOT_DEBOUNCE_SECONDS", "5"))
+
+# Upstream APIs. Point these at benchmarks/fake_upstream.py to load-test imports and syncs offline
+TMDB_API_BASE = os.environ.get("TMDB_API_BASE", "https://api.themoviedb.org/3").rstrip("/")
+TVMAZE_API_BASE = os.environ.get("TVMAZE_API_BASE", "https://api.tvmaze.com").rstrip("/")
+
+# Cached agreement analytics are dropped on every review write, this is only a safety net
+ANALYTICS_CACHE_SECONDS = int(os.environ.get("ANALYTICS_CACHE_SECONDS", str(24 * 60 * 60)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
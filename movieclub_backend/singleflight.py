@@ -0,0 +1,126 @@
+import asyncio
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# =============================================
+# Single-flight: when several requests want the same expensive thing at once (importing the
+# same TMDB id, rebuilding the same cold cache entry), one does the work and the others wait
+# for it and reuse the result instead of repeating it.
+#
+# The lock is a cache key taken with cache.add(), which is atomic, so with the Redis cache
+# (REDIS_URL) it coalesces across every worker process; with the local memory cache only
+# within one process. Callers pass check(), which returns the finished result (or None), so a
+# waiter picks up the result from wherever the worker left it: the database or the cache.
+#
+# Locks expire after lock_seconds so a crashed worker can't wedge a key, and a waiter that
+# gives up after wait_seconds does the work itself.
+# =============================================
+
+LOCK_PREFIX = "singleflight:"
+LOCK_SECONDS = 60
+WAIT_SECONDS = 30
+
+# Waiters poll for the result, starting fast and backing off to this
+POLL_MIN_SECONDS = 0.05
+POLL_MAX_SECONDS = 0.5
+
+
+def _release(lock_key, token):
+    # Only delete our own lock: it may have expired and been taken by someone else
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def single_flight(key, compute, check, lock_seconds=LOCK_SECONDS, wait_seconds=WAIT_SECONDS):
+    """
+    RETURNS check() if it has a result, otherwise compute() run by one caller per `key` at a time.
+    Concurrent callers wait for the running one and return check() once it finishes.
+    """
+    result = check()
+    if result is not None:
+        return result
+
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_seconds
+    poll = POLL_MIN_SECONDS
+
+    while True:
+        if cache.add(lock_key, token, timeout=lock_seconds):
+            try:
+                # The previous holder may have finished between our check and taking the lock
+                result = check()
+                return result if result is not None else compute()
+            finally:
+                _release(lock_key, token)
+
+        time.sleep(poll)
+        poll = min(poll * 2, POLL_MAX_SECONDS)
+
+        result = check()
+        if result is not None:
+            return result
+        if time.monotonic() >= deadline:
+            return compute()
+
+
+async def _arelease(lock_key, token):
+    if await cache.aget(lock_key) == token:
+        await cache.adelete(lock_key)
+
+
+async def asingle_flight(key, compute, check, lock_seconds=LOCK_SECONDS, wait_seconds=WAIT_SECONDS):
+    """single_flight() for async views: compute and check are coroutine functions, waiting doesn't block the loop."""
+    result = await check()
+    if result is not None:
+        return result
+
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_seconds
+    poll = POLL_MIN_SECONDS
+
+    while True:
+        if await cache.aadd(lock_key, token, timeout=lock_seconds):
+            try:
+                result = await check()
+                return result if result is not None else await compute()
+            finally:
+                await _arelease(lock_key, token)
+
+        await asyncio.sleep(poll)
+        poll = min(poll * 2, POLL_MAX_SECONDS)
+
+        result = await check()
+        if result is not None:
+            return result
+        if time.monotonic() >= deadline:
+            return await compute()
+
+
+def cache_is_shared():
+    """False for the per-process local memory cache, where one worker can't see another's entries."""
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def cached(key, build, timeout=None):
+    """
+    cache.get(key), and on a miss build() run once however many callers miss at the same time.
+    `build` must not return None.
+
+    Callers invalidate by changing the key (a generation bumped on writes), which only reaches
+    every worker through a shared cache. With the per-process cache (no REDIS_URL) nothing is
+    cached and build() runs every time, rather than other workers serving stale results.
+    """
+    if not cache_is_shared():
+        return build()
+
+    def compute():
+        value = build()
+        cache.set(key, value, timeout=timeout)
+        return value
+
+    return single_flight(f"cache:{key}", compute, lambda: cache.get(key))
@@ -0,0 +1,94 @@
+import math
+
+from rest_framework import permissions
+from rest_framework.throttling import SimpleRateThrottle
+
+# =============================================
+# Rate limits for the endpoints that are expensive to call: imports (which spend the TMDB/TVMaze
+# quota), review writes, and the heavy public reads when called anonymously.
+#
+# Each scope's rate is in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] and counted per user when
+# logged in, per client IP otherwise. Counts live in the default cache, so they need REDIS_URL to be
+# shared between workers (settings.py won't start several workers without it). Throttled requests
+# get a 429 with Retry-After (DRF adds it from wait()).
+# =============================================
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter: requests are counted in fixed windows and the previous window's
+    count is weighted by how much of it still overlaps the sliding window. Two counters per client
+    (updated with the cache's atomic incr) instead of DRF's list of every request timestamp.
+    """
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = (self.now % self.duration) / self.duration   # fraction of the current window gone by
+
+        current_key, previous_key = f"{self.key}:{window}", f"{self.key}:{window - 1}"
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+
+        if self.previous * (1 - self.elapsed) + self.current >= self.num_requests:
+            return self.throttle_failure()
+
+        # add() first so the counter expires, incr() is atomic on Redis and locmem
+        if not self.cache.add(current_key, 1, timeout=2 * self.duration):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:  # expired in between
+                self.cache.set(current_key, 1, timeout=2 * self.duration)
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        # When enough of the older window has slid out for one more request to fit
+        if self.current < self.num_requests:
+            remaining = 1 - (self.num_requests - self.current) / self.previous - self.elapsed
+        else:
+            # Not before the next window, where this window's count becomes the one sliding out
+            remaining = (1 - self.elapsed) + (1 - self.num_requests / self.current)
+        return max(math.ceil(remaining * self.duration), 1)
+
+
+class ImportRateThrottle(SlidingWindowRateThrottle):
+    """TMDB/TVMaze imports and spreadsheet uploads."""
+    scope = "imports"
+
+
+class ReviewWriteRateThrottle(SlidingWindowRateThrottle):
+    """Creating, editing and deleting reviews. Reads of the same endpoints are not counted."""
+    scope = "review_writes"
+
+    def allow_request(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return super().allow_request(request, view)
+
+
+class AnonHeavyReadRateThrottle(SlidingWindowRateThrottle):
+    """The heavy public reads (couple pages, analytics, stats, sync) for clients that aren't logged in."""
+    scope = "anon_heavy_reads"
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return True
+        return super().allow_request(request, view)
@@ -19,9 +19,14 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from moviereviews_hub.views import MovieViewSet, ReviewViewSet, couple_specific_reviews, CustomTokenObtainPairView, club_average_ratings
+from moviereviews_hub.views import MovieViewSet, ReviewViewSet, couple_specific_reviews, CustomTokenObtainPairView, club_average_ratings, snapshot_manifest, agreement_analytics, couple_recommendations
+from moviereviews_hub.views import stats_overview, reviewer_stats, couple_stats, export_reviews_csv, export_reviews_xlsx, import_reviews_upload, sync_changes
 from tvshows_app.views import TvShowViewSet, SeasonViewSet, EpisodeViewSet, TvShowReviewsViewSet
+from tvshows_app.views import show_watch_progress, couple_watch_progress, update_season_progress, tv_calendar
 from tvshows_app.views import tvShow_reviews_by_couple #, tvSeason_reviews_by_couple, tvEpisode_reviews_by_couple
+from moviereviews_hub import async_views as movie_async_views
+from tvshows_app import async_views as tv_async_views
+from movieclub_backend.batch import batch_requests
 
 router = DefaultRouter()
 router.register(r'movies', MovieViewSet, basename='movie')
@@ -33,8 +38,16 @@ router.register(r'tv-reviews', TvShowReviewsViewSet, basename='tv-reviews')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+
+    # Async import endpoints (wait on TMDB/TVMaze without holding a worker thread under ASGI).
+    # Listed before the router so they take these paths
+    path('api/movies/import_from_tmdb/', movie_async_views.import_from_tmdb, name='movie-import-from-tmdb'),
+    path('api/shows/import_from_tvmaze/', tv_async_views.import_from_tvmaze, name='tv-show-import-from-tvmaze'),
+
     path('api/', include(router.urls)),
     path('api/couple_reviews/<slug:couple_slug>/', couple_specific_reviews),
+    path('api/live/reviews/<slug:couple_slug>/', movie_async_views.live_reviews, name='live_reviews'),
+    path('api/recommendations/<slug:couple_slug>/', couple_recommendations, name='couple_recommendations'),
     path('api-auth/', include('rest_framework.urls')),
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -44,6 +57,38 @@ urlpatterns = [
     # path('api/tv/couple/seasons/<slug:couple_slug>/', tvSeason_reviews_by_couple, name='tv_seasons_by_couple'),
     # path('api/tv/couple/episodes/<slug:couple_slug>/', tvEpisode_reviews_by_couple, name='tv_episodes_by_couple'),
 
+    # Episode watch progress: the logged-in user's per show, marking a season, and per couple
+    path('api/tv/progress/shows/<slug:show_slug>/', show_watch_progress, name='tv_show_progress'),
+    path('api/tv/progress/shows/<slug:show_slug>/couples/', couple_watch_progress, name='tv_show_couple_progress'),
+    path('api/tv/progress/seasons/<int:season_id>/', update_season_progress, name='tv_season_progress'),
+
+    # Episodes airing between ?from= and ?to=, optionally only shows a couple follows (?couple=)
+    path('api/tv/calendar/', tv_calendar, name='tv_calendar'),
+
     # This path returns every movie with its club average rating
     path('api/club_average/', club_average_ratings, name = 'club_average'),
+
+    # Manifest pointing at the current pre-rendered JSON snapshots under /snapshots/
+    path('api/snapshots/', snapshot_manifest, name = 'snapshot_manifest'),
+
+    # How closely reviewers and couples agree with each other
+    path('api/analytics/agreement/', agreement_analytics, name = 'agreement_analytics'),
+
+    # Averages, harshest/kindest, histograms and genre preferences per reviewer and couple
+    path('api/stats/', stats_overview, name = 'stats_overview'),
+    path('api/stats/reviewers/<str:reviewer>/', reviewer_stats, name = 'reviewer_stats'),
+    path('api/stats/couples/<slug:couple_slug>/', couple_stats, name = 'couple_stats'),
+
+    # Every movie and TV review as a spreadsheet (admin only)
+    path('api/export/reviews.csv', export_reviews_csv, name = 'export_reviews_csv'),
+    path('api/export/reviews.xlsx', export_reviews_xlsx, name = 'export_reviews_xlsx'),
+
+    # Bulk review import from a spreadsheet (admin only)
+    path('api/import/reviews/', import_reviews_upload, name = 'import_reviews'),
+
+    # Rows changed since a client's token, for keeping a local mirror up to date
+    path('api/sync/', sync_changes, name = 'sync_changes'),
+
+    # Several GETs of the endpoints above in one round trip
+    path('api/batch/', batch_requests, name = 'batch_requests'),
 ]
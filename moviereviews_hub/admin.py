@@ -1,8 +1,81 @@
-from django.contrib import admin
+import asyncio
+import os
 
-# Register your models here.
-from django.contrib import admin
-from .models import Review, Movie  # Include any other models you want visible
+from django.contrib import admin, messages
 
-admin.site.register(Review)
-admin.site.register(Movie)
+from movieclub_backend.admin_filters import couple_list_filter
+from movieclub_backend.pagination import EstimatedCountPaginator
+from .models import Review, Movie, SyncState
+from .tmdb import afetch_movies, movie_fields_from_tmdb
+
+# =============================================
+# Admin pages. The changelists are built for big tables: foreign keys are joined in the
+# list query (list_select_related), picked with autocomplete instead of a <select> of every
+# row, filters don't scan the table for their choices, and counts are estimated
+# =============================================
+
+# Movies refreshed from TMDB per admin action, the request waits for all of them
+MAX_ADMIN_REFRESH = 200
+
+
+@admin.action(description="Refresh selected movies from TMDB")
+def refresh_from_tmdb(modeladmin, request, queryset):
+    api_key = os.environ.get("TMDB_API_KEY")
+    if not api_key:
+        modeladmin.message_user(request, "TMDB_API_KEY is not set.", messages.ERROR)
+        return
+
+    movies = list(queryset.exclude(TMDB_Api_ID__isnull=True).order_by("id")[:MAX_ADMIN_REFRESH])
+    results = asyncio.run(afetch_movies(api_key, [movie.TMDB_Api_ID for movie in movies]))
+
+    updated = failed = 0
+    for movie in movies:
+        result = results[movie.TMDB_Api_ID]
+        if isinstance(result, Exception):
+            failed += 1
+            continue
+
+        details, credits = result
+        changed = []
+        for name, value in movie_fields_from_tmdb(details, credits, fallback_title=movie.title).items():
+            if getattr(movie, name) != value:
+                setattr(movie, name, value)
+                changed.append(name)
+        if changed:
+            movie.save(update_fields=changed)
+            updated += 1
+
+    modeladmin.message_user(
+        request,
+        f"Refreshed {len(movies)} movies from TMDB: {updated} changed, {failed} failed."
+        + (f" Only the first {MAX_ADMIN_REFRESH} were refreshed." if queryset.count() > MAX_ADMIN_REFRESH else ""),
+        messages.WARNING if failed else messages.SUCCESS,
+    )
+
+
+@admin.register(Movie)
+class MovieAdmin(admin.ModelAdmin):
+    list_display = ("title", "release_yr", "TMDB_Api_ID", "slug")
+    search_fields = ("title",)   # also what the review autocomplete searches
+    ordering = ("-id",)
+    readonly_fields = ("slug",)
+    actions = [refresh_from_tmdb]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ("id", "movie", "reviewer", "couple_id", "rating")
+    list_select_related = ("movie",)
+    list_filter = (couple_list_filter("couple_id"),)
+    search_fields = ("=reviewer", "^movie__title")
+    autocomplete_fields = ("movie", "user")
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    list_display = ("name", "last_synced_at")
@@ -0,0 +1,229 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from movieclub_backend.db_router import use_replica
+from movieclub_backend.singleflight import cached
+
+from .couples import COUPLE_SLUG_TO_ID_MAP
+from .models import Review
+
+# =============================================
+# Couple agreement / taste similarity analytics.
+#
+# Every rating is loaded into one reviewer x title matrix (NaN where a reviewer has no rating)
+# and the pairwise statistics between all reviewers, and between all couples, are computed
+# with matrix products instead of looping over pairs of reviews.
+# Results are cached until the next review write (see signals.py).
+# =============================================
+
+# Items from the different review tables share one column space: id * 4 + kind
+ITEM_MOVIE, ITEM_SHOW, ITEM_SEASON, ITEM_EPISODE = range(4)
+
+CACHE_GENERATION_KEY = "analytics:agreement:generation"
+
+
+class RatingMatrix:
+    """Ratings as a float matrix, one row per reviewer and one column per rated title."""
+
+    def __init__(self, reviewers, couples, items, values):
+        self.reviewers = reviewers  # row labels (usernames)
+        self.couples = couples      # couple id of each row
+        self.items = items          # column labels, encoded as id * 4 + kind
+        self.values = values        # shape (len(reviewers), len(items)), NaN = not rated
+
+
+def _rating_rows(include_tv):
+    # (reviewer, couple id, item code, rating), one query per review table
+    movie_rows = (
+        Review.objects
+        .filter(rating__isnull=False)
+        .order_by("id")  # a later duplicate review wins
+        .values_list("reviewer", "couple_id", "movie_id", "rating")
+    )
+    for reviewer, couple_id, movie_id, rating in movie_rows.iterator(chunk_size=5000):
+        yield reviewer, couple_id, movie_id * 4 + ITEM_MOVIE, rating
+
+    if not include_tv:
+        return
+
+    from tvshows_app.models import TvShowRatingsAndReviews
+
+    kinds = {
+        TvShowRatingsAndReviews.TARGET_SHOW: ITEM_SHOW,
+        TvShowRatingsAndReviews.TARGET_SEASON: ITEM_SEASON,
+        TvShowRatingsAndReviews.TARGET_EPISODE: ITEM_EPISODE,
+    }
+    tv_rows = (
+        TvShowRatingsAndReviews.objects
+        .order_by("id")
+        .values_list(
+            "reviewer__username", "couple_slug", "target_type",
+            "tv_show_type_id", "tv_season_type_id", "tv_episode_type_id", "rating",
+        )
+    )
+    for username, couple_id, target_type, show_id, season_id, episode_id, rating in tv_rows.iterator(chunk_size=5000):
+        kind = kinds.get(target_type)
+        target_id = (show_id, season_id, episode_id)[kind - ITEM_SHOW] if kind is not None else None
+        if target_id is None:
+            continue
+        yield username, couple_id, target_id * 4 + kind, rating
+
+
+def load_rating_matrix(include_tv=False):
+    """Load every rating into a RatingMatrix. Reviewers and titles nobody rated are left out."""
+    rows = list(_rating_rows(include_tv))
+    if not rows:
+        return RatingMatrix([], [], np.empty(0, dtype=np.int64), np.empty((0, 0)))
+
+    reviewer_names, couple_ids, item_codes, ratings = zip(*rows)
+
+    reviewers, row_index = np.unique(np.array(reviewer_names, dtype=object), return_inverse=True)
+    items, col_index = np.unique(np.array(item_codes, dtype=np.int64), return_inverse=True)
+
+    values = np.full((len(reviewers), len(items)), np.nan)
+    values[row_index, col_index] = np.array(ratings, dtype=float)
+
+    # A reviewer's couple is the one on their latest review
+    couples = [""] * len(reviewers)
+    for row, couple_id in zip(row_index, couple_ids):
+        couples[row] = couple_id or ""
+
+    return RatingMatrix(list(reviewers), couples, items, values)
+
+
+def couple_matrix(matrix):
+    """Collapse reviewer rows into one row per couple, holding the couple's mean rating per title."""
+    present = set(matrix.couples)
+    couples = [c for c in COUPLE_SLUG_TO_ID_MAP.values() if c in present]
+    if not couples:
+        return couples, np.empty((0, matrix.values.shape[1]))
+
+    # membership[c, r] = 1 if reviewer r belongs to couple c
+    membership = (np.array(couples, dtype=object)[:, None] == np.array(matrix.couples, dtype=object)[None, :]).astype(float)
+
+    rated = ~np.isnan(matrix.values)
+    totals = membership @ np.where(rated, matrix.values, 0.0)
+    counts = membership @ rated.astype(float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts  # 0 / 0 -> NaN where no member rated the title
+    return couples, means
+
+
+def pairwise_agreement(values):
+    """
+    Pairwise statistics between the rows of `values` (NaN = not rated), each over the
+    titles both rows rated:
+      overlap        - number of titles both rated
+      correlation    - Pearson correlation of their ratings (NaN with < 2 shared titles or no variance)
+      mean_abs_diff  - mean absolute difference between their ratings (NaN with no shared titles)
+    """
+    rated = ~np.isnan(values)
+    mask = rated.astype(float)
+    x = np.where(rated, values, 0.0)
+
+    # Sums restricted to the titles both rows rated, as matrix products:
+    #   overlap[i, j] = sum_k m_ik m_jk,  sum_x[i, j] = sum_k x_ik m_jk,  ...
+    overlap = mask @ mask.T
+    sum_x = x @ mask.T
+    sum_y = sum_x.T
+    sum_xx = (x * x) @ mask.T
+    sum_yy = sum_xx.T
+    sum_xy = x @ x.T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_y / overlap
+        var_x = sum_xx - sum_x ** 2 / overlap
+        var_y = sum_yy - sum_y ** 2 / overlap
+        correlation = cov / np.sqrt(var_x * var_y)
+
+    # Rounding noise can leave a tiny variance where the ratings are really constant
+    correlation[(overlap < 2) | (var_x <= 1e-9) | (var_y <= 1e-9)] = np.nan
+    np.clip(correlation, -1.0, 1.0, out=correlation)
+
+    # |x - y| isn't a matrix product, so broadcast one row against all the others at a time.
+    # That is O(rows x titles) memory instead of O(rows^2 x titles)
+    abs_diff = np.empty_like(overlap)
+    for i in range(values.shape[0]):
+        abs_diff[i] = (np.abs(x[i] - x) * (mask[i] * mask)).sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_abs_diff = abs_diff / overlap
+
+    return {
+        "overlap": overlap.astype(int),
+        "correlation": correlation,
+        "mean_abs_diff": mean_abs_diff,
+    }
+
+
+def _as_json_matrix(array, digits=3):
+    # NaN isn't valid JSON, missing values go out as null
+    return [
+        [None if np.isnan(v) else round(float(v), digits) for v in row]
+        for row in array
+    ]
+
+
+def _agreement_block(labels, values):
+    stats = pairwise_agreement(values)
+    rated = ~np.isnan(values)
+
+    # Every row has at least one rating, so nanmean never sees an empty slice
+    means = np.nanmean(values, axis=1) if values.size else np.empty(0)
+
+    return {
+        "labels": list(labels),
+        "ratings": rated.sum(axis=1).tolist(),
+        "mean_rating": [None if np.isnan(m) else round(float(m), 2) for m in means],
+        "overlap": stats["overlap"].tolist(),
+        "correlation": _as_json_matrix(stats["correlation"]),
+        "mean_abs_diff": _as_json_matrix(stats["mean_abs_diff"]),
+    }
+
+
+def agreement_payload(include_tv=False):
+    matrix = load_rating_matrix(include_tv)
+    couples, couple_values = couple_matrix(matrix)
+
+    reviewers = _agreement_block(matrix.reviewers, matrix.values)
+    reviewers["couple_id"] = matrix.couples
+
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "includes_tv": include_tv,
+        "titles": int(matrix.values.shape[1]),
+        "reviewers": reviewers,
+        "couples": _agreement_block(couples, couple_values),
+    }
+
+
+# ---------------------------------------------
+# Caching. Entries are keyed by a generation number that every review write bumps,
+# so a result computed while a write lands is stored under the old (dead) generation.
+# Computed from the primary, a lagging replica would store stale data under the new one
+# ---------------------------------------------
+def _cache_generation():
+    return cache.get_or_set(CACHE_GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate_agreement_cache():
+    try:
+        cache.incr(CACHE_GENERATION_KEY)
+    except ValueError:  # not set (or evicted), start a fresh generation
+        cache.set(CACHE_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def cached_agreement_payload(include_tv=False):
+    key = f"analytics:agreement:{_cache_generation()}:{'tv' if include_tv else 'movies'}"
+    # Requests arriving while it is being computed wait for that result (see singleflight.py)
+    return cached(key, lambda: _agreement_payload_from_primary(include_tv), timeout=settings.ANALYTICS_CACHE_SECONDS)
+
+
+def _agreement_payload_from_primary(include_tv):
+    with use_replica(False):
+        return agreement_payload(include_tv)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MoviereviewsHubConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moviereviews_hub'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the signal handlers)
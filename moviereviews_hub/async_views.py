@@ -0,0 +1,96 @@
+import os
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from movieclub_backend.async_api import ImportFailed, authenticated_request, json_response, upstream_client
+from movieclub_backend.singleflight import asingle_flight
+from movieclub_backend.throttling import ImportRateThrottle
+
+from .couples import COUPLE_SLUG_TO_ID_MAP
+from .live import review_event_stream
+from .models import Movie
+from .serializers import MovieSerializer
+from .tmdb import afetch_movie, movie_fields_from_tmdb
+
+# ===================================================
+# Async views. These wait on upstream APIs, so they are written as native async views:
+# under ASGI a worker can have many of them in flight without tying up a thread each
+# ===================================================
+
+
+# POST /api/movies/import_from_tmdb/
+@csrf_exempt  # CSRF is still enforced for session logins by DRF's SessionAuthentication
+@require_POST
+async def import_from_tmdb(request):
+    drf_request, error = await authenticated_request(request, throttle_classes=[ImportRateThrottle])
+    if error:
+        return error
+
+    tmdb_id = drf_request.data.get("tmdb_id")
+    if not tmdb_id:
+        return json_response({"detail": "tmdb_id required"}, status=400)
+
+    try:
+        tmdb_id = int(tmdb_id)
+    except (TypeError, ValueError):
+        return json_response({"detail": "tmdb_id must be an integer"}, status=400)
+
+    TMDB_KEY = os.environ.get("TMDB_API_KEY")
+
+    # If already imported, return it
+    async def existing():
+        movie = await Movie.objects.filter(TMDB_Api_ID=tmdb_id).afirst()
+        return (movie, False) if movie else None
+
+    async def import_movie():
+        if not TMDB_KEY:
+            raise ImportFailed("TMDB_API_KEY not configured", status=500)
+
+        # ---- Fetch TMDB movie details and credits at the same time ----
+        try:
+            async with upstream_client(request) as client:
+                details, credits = await afetch_movie(client, tmdb_id, TMDB_KEY)
+        except Exception as e:
+            raise ImportFailed(f"TMDB details failed: {e}", status=502)
+
+        # Movie.save() still generates the unique slug
+        try:
+            movie = await Movie.objects.acreate(
+                TMDB_Api_ID=tmdb_id,
+                **movie_fields_from_tmdb(details, credits, fallback_title=f"Movie {tmdb_id}"),
+            )
+        except IntegrityError:
+            # Imported by a worker the single-flight lock couldn't see (no shared cache)
+            return await existing() or (None, False)
+        return movie, True
+
+    # Members adding the same movie at the same time share one import (see singleflight.py)
+    try:
+        movie, created = await asingle_flight(f"import:tmdb:{tmdb_id}", import_movie, existing)
+    except ImportFailed as e:
+        return json_response({"detail": e.detail}, status=e.status)
+    if movie is None:
+        return json_response({"detail": "Import conflicted with another import, try again"}, status=409)
+
+    return json_response(MovieSerializer(movie).data, status=201 if created else 200)
+
+
+# GET /api/live/reviews/<couple_slug>/
+@require_GET
+async def live_reviews(request, couple_slug):
+    couple_id = COUPLE_SLUG_TO_ID_MAP.get(couple_slug.lower())
+    if couple_id is None:
+        return json_response({"detail": "Unknown couple"}, status=404)
+
+    # Under WSGI an open stream would hold a worker thread for as long as the page is open
+    if not isinstance(request, ASGIRequest):
+        return json_response({"detail": "The live feed needs the ASGI server"}, status=503)
+
+    response = StreamingHttpResponse(review_event_stream(couple_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # don't let a proxy hold events back
+    return response
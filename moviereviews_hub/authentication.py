@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from movieclub_backend.db_router import use_replica
+
+from .couples import couple_id_for_username
+from .models import TokenVersion
+
+# =============================================
+# JWT authentication from the token's signed claims, without loading the User row.
+#
+# CustomTokenObtainPairSerializer puts the username, couple, staff flag and the user's token
+# version into every token (add_claims). ClaimsJWTAuthentication trusts those claims once the
+# signature checks out, so request.user is a TokenUser built from the token, and the only
+# lookup is the version, read from a cached copy of the (small) TokenVersion table.
+#
+# Revoking a user's tokens (revoke_tokens, run when any of the TOKEN_FIELDS change or the user
+# is deleted) bumps their version, so every token issued before is rejected. With the shared
+# Redis cache that takes effect immediately, with the per-process cache within
+# TOKEN_VERSIONS_CACHE_SECONDS.
+# =============================================
+
+TOKEN_VERSION_CLAIM = "ver"
+
+# User fields the claims are built from (the couple comes from the username), plus the password and
+# is_active: a change to any of them revokes the tokens already issued
+TOKEN_FIELDS = ("username", "is_staff", "is_superuser", "is_active", "password")
+
+TOKEN_VERSIONS_CACHE_KEY = "auth:token_versions"
+TOKEN_VERSIONS_CACHE_SECONDS = 300
+
+
+def token_versions():
+    """{user_id: version} for every user whose tokens were ever revoked."""
+    return cache.get_or_set(
+        TOKEN_VERSIONS_CACHE_KEY,
+        _token_versions_from_primary,
+        timeout=TOKEN_VERSIONS_CACHE_SECONDS,
+    )
+
+
+def _token_versions_from_primary():
+    # A replica that hasn't seen a revocation yet would keep the revoked tokens valid for the cache timeout
+    with use_replica(False):
+        return dict(TokenVersion.objects.values_list("user_id", "version"))
+
+
+def current_token_version(user_id):
+    return token_versions().get(user_id, 0)
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to this user so far."""
+    with transaction.atomic():
+        if not TokenVersion.objects.filter(user_id=user_id).update(version=F("version") + 1):
+            try:
+                with transaction.atomic():
+                    TokenVersion.objects.create(user_id=user_id, version=1)
+            except IntegrityError:  # created by a concurrent revoke
+                TokenVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+    transaction.on_commit(lambda: cache.delete(TOKEN_VERSIONS_CACHE_KEY))
+
+
+def add_claims(token, user):
+    """The claims ClaimsJWTAuthentication reads instead of the User row."""
+    token["username"] = user.username
+    token["couple"] = couple_id_for_username(user.username)
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    token[TOKEN_VERSION_CLAIM] = current_token_version(user.id)
+    return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that builds request.user from the token's claims (a TokenUser, with
+    .username, .couple, .is_staff) instead of querying the User table. Tokens issued before the
+    claims existed have no version claim and still go through the normal User lookup.
+    """
+
+    def get_user(self, validated_token):
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if version is None or user_id is None:
+            return super().get_user(validated_token)
+
+        if version != current_token_version(user_id):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return TokenUser(validated_token)
@@ -0,0 +1,138 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.module_loading import import_string
+
+from movieclub_backend.fieldsets import FieldSelection
+from .models import ChangeLogEntry
+from .stats import lock_tables
+
+# =============================================
+# Change log behind the /api/sync/ delta endpoint.
+#
+# Every write to a synced model appends (model, object_id, deleted) to ChangeLogEntry; the
+# entry id is the sync token. A client sends the last token it saw and gets back the current
+# version of every row changed after it, tombstones for the deleted ones, and a new token,
+# so a local mirror stays up to date without re-downloading the catalogs.
+#
+# Signals record single writes (signals.py in both apps), bulk paths (sync_show_tree,
+# import_reviews) call record_changes() themselves. Entries are written once the write has
+# committed, so a token never points past a change that could still roll back, and under a
+# table lock, so entries become visible in id order and a token never skips one still in flight.
+# =============================================
+
+# sync key -> (model, serializer, fields left out). Nested children are synced as their own rows
+SYNC_MODELS = {
+    "movies":     ("moviereviews_hub.Movie", "moviereviews_hub.serializers.MovieSerializer", ()),
+    "reviews":    ("moviereviews_hub.Review", "moviereviews_hub.serializers.ReviewSerializer", ()),
+    "shows":      ("tvshows_app.TvShow", "tvshows_app.serializers.TvShowSerializer", ("seasons",)),
+    "seasons":    ("tvshows_app.Season", "tvshows_app.serializers.SeasonSerializer", ("episodes",)),
+    "episodes":   ("tvshows_app.Episode", "tvshows_app.serializers.EpisodeSerializer", ()),
+    "tv_reviews": ("tvshows_app.TvShowRatingsAndReviews", "tvshows_app.serializers.TvShowReviewSerializer", ()),
+}
+
+MODEL_TO_SYNC_KEY = {label: key for key, (label, _, _) in SYNC_MODELS.items()}
+
+# Changes handed out per response, the client asks again while "more" is true
+SYNC_PAGE_SIZE = 1000
+
+
+def record_changes(model, ids, deleted=False):
+    """Append log entries for these rows of `model` once the current transaction commits."""
+    key = MODEL_TO_SYNC_KEY.get(model._meta.label)
+    ids = [pk for pk in ids if pk is not None]
+    if key is None or not ids:
+        return
+
+    transaction.on_commit(lambda: _write_entries(key, ids, deleted))
+
+
+def _write_entries(key, ids, deleted):
+    # Ids come from a sequence before the insert commits. Without the lock a writer could commit
+    # id 8 while id 7 is still in flight, and a client handed token 8 would never see 7. The mode
+    # conflicts with itself but not with readers, so writers take turns and /api/sync/ never waits
+    with transaction.atomic():
+        lock_tables([ChangeLogEntry], "SHARE ROW EXCLUSIVE")
+        ChangeLogEntry.objects.bulk_create(
+            [ChangeLogEntry(model=key, object_id=pk, deleted=deleted) for pk in ids],
+            batch_size=1000,
+        )
+
+
+# ---------------------------------------------
+# Reading
+# ---------------------------------------------
+def parse_token(value):
+    """The entry id in a client token, 0 (from the beginning) when there is none. ValueError if malformed."""
+    if value in (None, ""):
+        return 0
+    token = int(value)
+    if token < 0:
+        raise ValueError(value)
+    return token
+
+
+def _serialize(key, ids):
+    label, serializer_path, exclude = SYNC_MODELS[key]
+    model = apps.get_model(label)
+    serializer_class = import_string(serializer_path)
+    rows = model.objects.filter(pk__in=ids).order_by("pk")
+    return serializer_class(rows, many=True, selection=FieldSelection(exclude=exclude)).data
+
+
+def changes_since(token, limit=SYNC_PAGE_SIZE):
+    """
+    Everything that changed after `token`: the current rows, tombstones for deleted rows and
+    the token to send next time. At most `limit` entries are read, "more" says whether to ask again.
+    """
+    entries = list(
+        ChangeLogEntry.objects
+        .filter(pk__gt=token)
+        .order_by("pk")
+        .values_list("pk", "model", "object_id", "deleted")[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the latest entry per row counts
+    latest = {}
+    for pk, key, object_id, deleted in entries:
+        latest[(key, object_id)] = deleted
+
+    changes = {key: [] for key in SYNC_MODELS}
+    deleted = {key: [] for key in SYNC_MODELS}
+    upserts = {key: [] for key in SYNC_MODELS}
+    for (key, object_id), is_deleted in latest.items():
+        if key not in SYNC_MODELS:
+            continue
+        (deleted if is_deleted else upserts)[key].append(object_id)
+
+    for key, ids in upserts.items():
+        # A row deleted after this page is missing here, its tombstone comes in a later page
+        if ids:
+            changes[key] = _serialize(key, ids)
+    for ids in deleted.values():
+        ids.sort()
+
+    return {
+        "token": str(entries[-1][0] if entries else token),
+        "more": more,
+        "changes": changes,
+        "deleted": deleted,
+    }
+
+
+# ---------------------------------------------
+# Maintenance
+# ---------------------------------------------
+def compact_changelog():
+    """
+    Drop entries superseded by a later entry for the same row. Any token still gets the latest
+    state of every row changed after it, the log just stops growing with every edit.
+    RETURNS the number of entries deleted.
+    """
+    newer = ChangeLogEntry.objects.filter(
+        model=OuterRef("model"), object_id=OuterRef("object_id"), pk__gt=OuterRef("pk")
+    )
+    deleted, _ = ChangeLogEntry.objects.filter(Exists(newer)).delete()
+    return deleted
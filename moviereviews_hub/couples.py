@@ -0,0 +1,36 @@
+# ===================================================
+# The couples in the club. Kept in one place so views, signals and
+# background jobs all agree on which couple pages exist
+# ===================================================
+
+# Map each slug to a couple ID that is used in the database
+COUPLE_SLUG_TO_ID_MAP = {
+    "tt"     : "TrevorTaylor",
+    "mn"     : "MarissaNathan",
+    "sb"     : "SierraBenett",
+    "mom_dad": "MomDad",
+    "ml"     : "MiaLogan",
+    "af"     : "AnnieFelix"
+}
+
+# Map each member's username to their couple ID. Reviews from anyone else are filed under "uncategorized"
+USERNAME_TO_COUPLE_ID = {
+    "trevor" : "TrevorTaylor",
+    "taylor" : "TrevorTaylor",
+    "marissa": "MarissaNathan",
+    "nathan" : "MarissaNathan",
+    "sierra" : "SierraBenett",
+    "benett" : "SierraBenett",
+    "rob"    : "MomDad",
+    "terry"  : "MomDad",
+    "mia"    : "MiaLogan",
+    "logan"  : "MiaLogan",
+    "annie"  : "AnnieFelix",
+    "felix"  : "AnnieFelix"
+}
+
+UNCATEGORIZED_COUPLE_ID = "uncategorized"
+
+
+def couple_id_for_username(username):
+    return USERNAME_TO_COUPLE_ID.get((username or "").lower(), UNCATEGORIZED_COUPLE_ID)
@@ -0,0 +1,164 @@
+import csv
+
+from django.db import connections, router
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .models import Review
+
+# =============================================
+# Export of the full review history (movies and TV) joined with the title metadata.
+# Rows are read with server-side cursors and written out as they arrive, so memory stays
+# flat no matter how many reviews there are. Used by the admin export endpoints and
+# the export_reviews management command.
+# =============================================
+
+EXPORT_HEADER = [
+    "source", "review_id", "reviewer", "couple_id", "rating", "review",
+    "target", "title", "season", "episode", "episode_title", "year",
+    "genres", "credits", "upstream_id",
+]
+
+CHUNK_SIZE = 2000
+
+
+def stream_queryset(qs, chunk_size=CHUNK_SIZE):
+    """
+    Iterate a queryset in constant memory.
+
+    Normally that is .iterator() on a server-side cursor. Behind pgbouncer in transaction mode
+    server-side cursors are disabled (see settings.apply_connection_pooling) and .iterator() would
+    load the whole result, so the rows are paged by primary key instead. The pk has to be the
+    "id" key of .values() rows or the first column of .values_list() rows.
+    """
+    db = router.db_for_read(qs.model)
+    if not connections[db].settings_dict.get("DISABLE_SERVER_SIDE_CURSORS"):
+        yield from qs.iterator(chunk_size=chunk_size)
+        return
+
+    last_pk = None
+    while True:
+        page = qs.order_by("pk")
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1]["id"] if isinstance(rows[-1], dict) else rows[-1][0]
+
+
+def _join(values):
+    return "; ".join(values or [])
+
+
+def movie_review_rows():
+    reviews = (
+        Review.objects
+        .order_by("id")
+        .values_list(
+            "id", "reviewer", "couple_id", "rating", "rating_justification",
+            "movie__title", "movie__release_yr", "movie__genres", "movie__director", "movie__TMDB_Api_ID",
+        )
+    )
+    for review_id, reviewer, couple_id, rating, text, title, year, genres, directors, tmdb_id in stream_queryset(reviews):
+        yield [
+            "movie", review_id, reviewer, couple_id, rating, text,
+            "movie", title, None, None, "", year,
+            _join(genres), _join(directors), tmdb_id,
+        ]
+
+
+def tv_review_rows():
+    from tvshows_app.models import TvShowRatingsAndReviews
+
+    # A review hangs off a show, a season or an episode, the show is reached through whichever is set
+    reviews = (
+        TvShowRatingsAndReviews.objects
+        .order_by("id")
+        .values(
+            "id", "reviewer__username", "couple_slug", "rating", "rating_justification", "target_type",
+            "tv_show_type__title", "tv_show_type__premiered", "tv_show_type__genres",
+            "tv_show_type__creators", "tv_show_type__TvMazeAPIid",
+            "tv_season_type__season_number", "tv_season_type__season_release_year",
+            "tv_season_type__show__title", "tv_season_type__show__genres",
+            "tv_season_type__show__creators", "tv_season_type__TvMazeAPI_season_id",
+            "tv_episode_type__episode_number", "tv_episode_type__episode_title", "tv_episode_type__air_date",
+            "tv_episode_type__season_number__season_number", "tv_episode_type__season_number__show__title",
+            "tv_episode_type__season_number__show__genres", "tv_episode_type__season_number__show__creators",
+            "tv_episode_type__TvMazeAPI_episode_id",
+        )
+    )
+    for r in stream_queryset(reviews):
+        if r["target_type"] == TvShowRatingsAndReviews.TARGET_EPISODE:
+            show = "tv_episode_type__season_number__show__"
+            season = r["tv_episode_type__season_number__season_number"]
+            episode = r["tv_episode_type__episode_number"]
+            episode_title = r["tv_episode_type__episode_title"]
+            air_date = r["tv_episode_type__air_date"]
+            year = air_date.year if air_date else None
+            upstream_id = r["tv_episode_type__TvMazeAPI_episode_id"]
+        elif r["target_type"] == TvShowRatingsAndReviews.TARGET_SEASON:
+            show = "tv_season_type__show__"
+            season, episode, episode_title = r["tv_season_type__season_number"], None, ""
+            year = r["tv_season_type__season_release_year"]
+            upstream_id = r["tv_season_type__TvMazeAPI_season_id"]
+        else:
+            show = "tv_show_type__"
+            season, episode, episode_title = None, None, ""
+            premiered = r["tv_show_type__premiered"]
+            year = premiered.year if premiered else None
+            upstream_id = r["tv_show_type__TvMazeAPIid"]
+
+        yield [
+            "tv", r["id"], r["reviewer__username"], r["couple_slug"], r["rating"], r["rating_justification"],
+            r["target_type"], r[f"{show}title"], season, episode, episode_title, year,
+            _join(r[f"{show}genres"]), _join(r[f"{show}creators"]), upstream_id,
+        ]
+
+
+def review_rows():
+    yield from movie_review_rows()
+    yield from tv_review_rows()
+
+
+# ---------------------------------------------
+# Writers
+# ---------------------------------------------
+class _Echo:
+    # csv.writer wants a file, this one hands back what was written instead of keeping it
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, rows_per_chunk=500):
+    """Yield the CSV text (header first) in chunks of `rows_per_chunk` rows."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= rows_per_chunk:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _xlsx_value(value):
+    # Excel rejects control characters, which do turn up in pasted review text
+    return ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value
+
+
+def write_xlsx(rows, fileobj):
+    """
+    Write the rows to `fileobj` as an XLSX workbook. openpyxl's write-only mode spools
+    rows to a temporary file instead of keeping cell objects, so memory stays flat.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Reviews")
+    sheet.append(EXPORT_HEADER)
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    workbook.save(fileobj)
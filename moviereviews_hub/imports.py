@@ -0,0 +1,326 @@
+import csv
+import io
+import re
+import unicodedata
+import zipfile
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from . import changelog, read_models
+from .analytics import invalidate_agreement_cache
+from .couples import COUPLE_SLUG_TO_ID_MAP, couple_id_for_username
+from .models import Movie, Review, ReviewStat
+from .recommendations import invalidate_couple_profile
+from .snapshots import schedule_publish
+from .stats import add_contribution, apply_deltas, lock_tables
+
+# =============================================
+# Bulk import of historical movie reviews from a spreadsheet (XLSX or CSV).
+#
+# Movies are matched by TMDB id, or by title + director, against an index built from one
+# query. Reviews are upserted on (movie, reviewer) with bulk_create in batches inside one
+# transaction. The review signals don't run for bulk writes, so the import applies the stat
+# deltas of the rows it replaced and refreshes the cards of the movies it touched itself.
+# Used by the import_reviews command and the admin upload endpoint.
+# =============================================
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+RATING_MIN, RATING_MAX = 0, 10
+
+# couple_id values a row may give, matched case-insensitively
+COUPLE_IDS = {couple_id.lower(): couple_id for couple_id in COUPLE_SLUG_TO_ID_MAP.values()}
+
+# Accepted spellings of each column header (compared after normalize_header)
+COLUMN_ALIASES = {
+    "tmdb_id":  {"tmdb_id", "tmdb", "tmdb_api_id"},
+    "title":    {"title", "movie", "movie_title"},
+    "director": {"director", "directors"},
+    "reviewer": {"reviewer", "username", "user", "name"},
+    "couple_id": {"couple_id", "couple"},
+    "rating":   {"rating", "score"},
+    "review":   {"review", "rating_justification", "justification", "comment", "comments", "notes"},
+}
+
+
+class ImportFileError(Exception):
+    """Raised when the uploaded file can't be read as a review spreadsheet at all."""
+
+
+def normalize_header(value):
+    return re.sub(r"[^a-z0-9]+", "_", str(value or "").strip().lower()).strip("_")
+
+
+def normalize_text(value):
+    """Lowercase, strip accents and punctuation, collapse whitespace: "Amélie (2001)!" -> "amelie 2001"."""
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", value.casefold()).split())
+
+
+# ---------------------------------------------
+# Reading
+# ---------------------------------------------
+def _xlsx_rows(fileobj):
+    # read_only streams the sheet XML instead of building every cell in memory
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()  # leave the underlying file open for the caller
+
+
+def _checked_rows(rows):
+    # A corrupt workbook or a CSV that isn't UTF-8 only fails once it's read, turn that into a file error
+    try:
+        yield from rows
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"The file can't be read as a UTF-8 CSV: {e}") from e
+    except (zipfile.BadZipFile, InvalidFileException) as e:
+        raise ImportFileError(f"The file can't be read as an XLSX workbook: {e}") from e
+
+
+def _is_xlsx(fileobj, filename):
+    if filename:
+        return filename.lower().endswith((".xlsx", ".xlsm"))
+    head = fileobj.read(4)
+    fileobj.seek(0)
+    return head == b"PK\x03\x04"  # zip container
+
+
+def read_rows(fileobj, filename=""):
+    """
+    Yield (row_number, {column: value}) for every data row of a binary file object.
+    Row numbers match what a spreadsheet program shows (the header is row 1).
+    """
+    rows = _checked_rows(_xlsx_rows(fileobj) if _is_xlsx(fileobj, filename) else _csv_rows(fileobj))
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("The file is empty.")
+
+    columns = {}
+    for index, name in enumerate(header):
+        key = normalize_header(name)
+        for column, aliases in COLUMN_ALIASES.items():
+            if key in aliases and column not in columns:
+                columns[column] = index
+
+    if "reviewer" not in columns or "rating" not in columns:
+        raise ImportFileError("The header needs at least a reviewer and a rating column.")
+    if "tmdb_id" not in columns and "title" not in columns:
+        raise ImportFileError("The header needs a tmdb_id or a title column to find the movie.")
+
+    for row_number, row in enumerate(rows, start=2):
+        if not row or all(value in (None, "") for value in row):
+            continue
+        yield row_number, {
+            column: (row[index] if index < len(row) else None)
+            for column, index in columns.items()
+        }
+
+
+# ---------------------------------------------
+# Matching
+# ---------------------------------------------
+class MovieIndex:
+    """Every movie keyed by TMDB id and by normalized title (+ director), built from one query."""
+
+    def __init__(self):
+        self.by_tmdb = {}
+        self.by_title_director = {}
+        self.by_title = {}
+
+        for movie_id, tmdb_id, title, directors in Movie.objects.values_list("id", "TMDB_Api_ID", "title", "director"):
+            if tmdb_id is not None:
+                self.by_tmdb[tmdb_id] = movie_id
+
+            title_key = normalize_text(title)
+            self.by_title.setdefault(title_key, set()).add(movie_id)
+            for director in directors or []:
+                self.by_title_director.setdefault((title_key, normalize_text(director)), set()).add(movie_id)
+
+    def resolve(self, tmdb_id=None, title=None, director=None):
+        """RETURNS (movie_id, None) or (None, error message)."""
+        if tmdb_id not in (None, ""):
+            try:
+                movie_id = self.by_tmdb.get(int(float(tmdb_id)))
+            except (TypeError, ValueError):
+                return None, f"Invalid TMDB id {tmdb_id!r}"
+            if movie_id is not None:
+                return movie_id, None
+            if not title:
+                return None, f"No movie with TMDB id {tmdb_id}"
+
+        title_key = normalize_text(title)
+        if not title_key:
+            return None, "No TMDB id or title"
+
+        # A director cell can list several names
+        candidates = set()
+        for name in re.split(r"[;,/&]| and ", str(director or "")):
+            candidates |= self.by_title_director.get((title_key, normalize_text(name)), set())
+        if not candidates:
+            candidates = self.by_title.get(title_key, set())
+
+        if len(candidates) == 1:
+            return next(iter(candidates)), None
+        if not candidates:
+            return None, f"No movie titled {title!r}"
+        return None, f"{len(candidates)} movies are titled {title!r}, add the director or TMDB id"
+
+
+def _parse_rating(value):
+    if value in (None, ""):
+        return None, "Missing rating"
+    try:
+        rating = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return None, f"Invalid rating {value!r}"
+    if not RATING_MIN <= rating <= RATING_MAX:
+        return None, f"Rating {rating} is outside {RATING_MIN}-{RATING_MAX}"
+    return rating, None
+
+
+def _parse_couple_id(value, reviewer):
+    # A blank couple comes from the reviewer, like for reviews posted through the API
+    value = str(value or "").strip()
+    if not value:
+        return couple_id_for_username(reviewer), None
+    if len(value) > Review._meta.get_field("couple_id").max_length:
+        return None, f"Couple {value!r} is too long"
+    if value.lower() not in COUPLE_IDS:
+        return None, f"Unknown couple {value!r}"
+    return COUPLE_IDS[value.lower()], None
+
+
+# ---------------------------------------------
+# Importing
+# ---------------------------------------------
+def _previous_reviews(reviews):
+    """(movie_id, reviewer, couple_id, rating) of the existing reviews the imported ones replace."""
+    movie_ids = {movie_id for movie_id, _ in reviews}
+    reviewers = {reviewer for _, reviewer in reviews}
+    rows = Review.objects.filter(movie_id__in=movie_ids, reviewer__in=reviewers).values_list(
+        "movie_id", "reviewer", "couple_id", "rating"
+    )
+    return [row for row in rows if (row[0], row[1]) in reviews]
+
+
+def _stat_deltas(previous, reviews):
+    # What the replaced reviews contributed comes off, what the imported ones contribute goes on
+    genres = dict(Movie.objects.filter(pk__in={movie_id for movie_id, _ in reviews}).values_list("id", "genres"))
+    deltas = {}
+    for movie_id, reviewer, couple_id, rating in previous:
+        add_contribution(deltas, ReviewStat.SOURCE_MOVIES, reviewer, couple_id, rating, genres.get(movie_id), sign=-1)
+    for review in reviews.values():
+        add_contribution(deltas, ReviewStat.SOURCE_MOVIES, review.reviewer, review.couple_id, review.rating, genres.get(review.movie_id))
+    return deltas
+
+
+def _refresh_derived_data(movie_ids, couple_ids):
+    # bulk_create skips the review signals, so do once what they would have done per review
+    read_models.refresh_cards_for_movies(movie_ids)
+    invalidate_agreement_cache()
+    for couple_id in couple_ids:
+        invalidate_couple_profile(couple_id)
+    schedule_publish()
+
+
+def import_reviews(fileobj, filename="", dry_run=False):
+    """
+    Import the reviews in a spreadsheet. Rows with problems are skipped and reported,
+    the rest are written (unless dry_run).
+
+    RETURNS a report dict: rows, created, updated, skipped, errors [{row, error}], dry_run
+    """
+    movies = MovieIndex()
+    users = {username.lower(): (user_id, username) for user_id, username in User.objects.values_list("id", "username")}
+
+    errors = []
+    reviews = {}  # (movie_id, reviewer) -> Review, a later row for the same pair wins
+    rows = 0
+
+    for row_number, row in read_rows(fileobj, filename):
+        rows += 1
+
+        reviewer_name = str(row.get("reviewer") or "").strip()
+        if not reviewer_name:
+            errors.append({"row": row_number, "error": "Missing reviewer"})
+            continue
+        user_id, reviewer = users.get(reviewer_name.lower(), (None, reviewer_name.lower()))
+        if len(reviewer) > Review._meta.get_field("reviewer").max_length:
+            errors.append({"row": row_number, "error": f"Reviewer name {reviewer_name!r} is too long"})
+            continue
+
+        rating, error = _parse_rating(row.get("rating"))
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+
+        couple_id, error = _parse_couple_id(row.get("couple_id"), reviewer)
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+
+        movie_id, error = movies.resolve(row.get("tmdb_id"), row.get("title"), row.get("director"))
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+
+        reviews[(movie_id, reviewer)] = Review(
+            movie_id=movie_id,
+            reviewer=reviewer,
+            couple_id=couple_id,
+            rating=rating,
+            rating_justification=str(row.get("review") or "").strip(),
+            user_id=user_id,
+        )
+
+    if dry_run or not reviews:
+        previous = _previous_reviews(reviews)
+    else:
+        with transaction.atomic():
+            # Review and movie writes wait until the import commits, so the reviews read here are
+            # the ones the upsert replaces and the stat deltas below stay exact
+            lock_tables([Review, Movie], "SHARE ROW EXCLUSIVE")
+            previous = _previous_reviews(reviews)
+
+            Review.objects.bulk_create(
+                list(reviews.values()),
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["movie", "reviewer"],
+                update_fields=["couple_id", "rating", "rating_justification", "user"],
+            )
+            # bulk_create sends no signals, log the rows for /api/sync/ here (Postgres fills in the pks)
+            changelog.record_changes(Review, [review.pk for review in reviews.values()])
+            apply_deltas(_stat_deltas(previous, reviews))
+
+            movie_ids = {movie_id for movie_id, _ in reviews}
+            couple_ids = {review.couple_id for review in reviews.values()} | {couple_id for _, _, couple_id, _ in previous}
+            transaction.on_commit(lambda: _refresh_derived_data(movie_ids, couple_ids))
+
+    # Which pairs already existed, for the created vs. updated counts
+    existing = {(movie_id, reviewer) for movie_id, reviewer, _, _ in previous}
+
+    return {
+        "dry_run": dry_run,
+        "rows": rows,
+        "created": len(reviews) - len(existing),
+        "updated": len(existing),
+        "skipped": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "errors_truncated": len(errors) > MAX_REPORTED_ERRORS,
+    }
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from django.db import transaction
+
+from movieclub_backend.pubsub import OVERFLOW, get_broker
+
+# =============================================
+# Live review feed. ReviewViewSet and TvShowReviewsViewSet publish an event when a review is
+# created, updated or deleted, and /api/live/reviews/<couple_slug>/ streams the events for that
+# couple as Server-Sent Events, so a couple page can patch itself instead of polling.
+#
+# Each event is one "data:" line of JSON:
+#   {"type": "created" | "updated" | "deleted", "source": "movies" | "tv", "review": {...}}
+# Deleted reviews carry only {"id": ...}. A "resync" event means events were dropped (the
+# client fell too far behind) and the page should be reloaded.
+# =============================================
+
+SOURCE_MOVIES = "movies"
+SOURCE_TV = "tv"
+
+# A comment line is sent this often so proxies don't close an idle stream
+HEARTBEAT_SECONDS = 20
+
+# How long the browser waits before reconnecting a dropped stream
+RETRY_MILLISECONDS = 5000
+
+
+def review_channel(couple_id):
+    return f"reviews:{couple_id}"
+
+
+def publish_review_event(event_type, source, couple_id, review):
+    """Publish the event once the current transaction commits, so clients never see a rolled back write."""
+    message = {"type": event_type, "source": source, "review": review}
+    transaction.on_commit(lambda: get_broker().publish(review_channel(couple_id), message))
+
+
+def _sse(data, event=None):
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def review_event_stream(couple_id):
+    """The SSE body for one couple's feed. Runs until the client disconnects (the task is cancelled)."""
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+    async with get_broker().subscribe(review_channel(couple_id)) as subscription:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if message is OVERFLOW:
+                yield _sse({}, event="resync")
+                return
+            yield _sse(message)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from moviereviews_hub.changelog import compact_changelog
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change log entries superseded by a later entry for the same row. "
+        "Sync tokens stay valid, run this periodically to keep the /api/sync/ log small."
+    )
+
+    def handle(self, *args, **opts):
+        deleted = compact_changelog()
+        self.stdout.write(self.style.SUCCESS(f"Done. Entries deleted={deleted}"))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moviereviews_hub.exports import review_rows, csv_chunks, write_xlsx
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every movie and TV review, joined with the title metadata, as CSV or XLSX. "
+        "Rows are streamed from the database, so memory use doesn't grow with the number of reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "xlsx"], default="csv", help="Output format.")
+        parser.add_argument(
+            "--output",
+            type=str,
+            default="",
+            help="File to write. CSV goes to stdout when omitted, XLSX needs a file.",
+        )
+
+    def handle(self, *args, **opts):
+        output = opts["output"]
+
+        if opts["format"] == "xlsx":
+            if not output:
+                raise CommandError("--output is required for XLSX exports.")
+            with open(output, "wb") as f:
+                write_xlsx(review_rows(), f)
+        elif output:
+            with open(output, "w", newline="", encoding="utf-8") as f:
+                f.writelines(csv_chunks(review_rows()))
+        else:
+            sys.stdout.writelines(csv_chunks(review_rows()))
+            return
+
+        self.stderr.write(self.style.SUCCESS(f"Done. Wrote {output}"))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moviereviews_hub.imports import import_reviews, ImportFileError
+
+
+class Command(BaseCommand):
+    help = (
+        "Import movie reviews from an XLSX or CSV spreadsheet. Movies are matched by TMDB id or "
+        "title + director, existing reviews from the same reviewer are updated. "
+        "Columns: reviewer, rating, tmdb_id and/or title, optional director, couple_id, review."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str, help="Spreadsheet to import (.xlsx or .csv).")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and report without saving.")
+        parser.add_argument("--show-errors", type=int, default=50, help="How many row errors to print.")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+
+        try:
+            with open(opts["path"], "rb") as f:
+                report = import_reviews(f, opts["path"], dry_run=opts["dry_run"])
+        except OSError as e:
+            raise CommandError(f"Can't read {opts['path']}: {e}")
+        except ImportFileError as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"][:opts["show_errors"]]:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
+        if report["skipped"] > opts["show_errors"]:
+            self.stdout.write(self.style.WARNING(f"... and {report['skipped'] - opts['show_errors']} more"))
+
+        prefix = "[DRY RUN] " if report["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Done. rows={report['rows']} created={report['created']} updated={report['updated']} "
+            f"skipped={report['skipped']} in {time.perf_counter() - started:.1f}s"
+        ))
@@ -1,23 +1,39 @@
 import os
 import time
 import requests
+from datetime import datetime
 
-from django.core.management.base import BaseCommand
-from moviereviews_hub.models import Movie
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from moviereviews_hub.models import Movie, SyncState
+from moviereviews_hub.tmdb import TMDB_BASE, movie_fields_from_tmdb, fetch_changed_movie_ids
 
-TMDB_BASE = "https://api.themoviedb.org/3"
+# Name of the SyncState row that records the last successful refresh
+TMDB_SYNC_NAME = "tmdb_movies"
 
 
 class Command(BaseCommand):
     help = (
         "Overwrite all Movie fields from TMDB for movies that have TMDB_Api_ID. "
-        "Keeps internal DB IDs, slugs, and reviews intact."
+        "Keeps internal DB IDs, slugs, and reviews intact. "
+        "With --incremental, only movies listed in TMDB's changes feed since the last successful run are refreshed."
     )
 
     def add_arguments(self, parser):
         parser.add_argument("--limit", type=int, default=0, help="Only process N movies (0 = all).")
         parser.add_argument("--sleep", type=float, default=0.25, help="Seconds to sleep between TMDB requests.")
         parser.add_argument("--dry-run", action="store_true", help="Print changes without saving.")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only refresh movies that TMDB reports as changed since the last successful run.",
+        )
+        parser.add_argument(
+            "--since",
+            type=str,
+            default="",
+            help="Override the start of the incremental window (YYYY-MM-DD).",
+        )
 
     def handle(self, *args, **opts):
         tmdb_key = os.environ.get("TMDB_API_KEY")
@@ -29,7 +45,28 @@ class Command(BaseCommand):
         sleep_s = opts["sleep"]
         dry = opts["dry_run"]
 
+        # Remember when this run started, this becomes the start of the next incremental window
+        run_started = timezone.now()
+
         qs = Movie.objects.exclude(TMDB_Api_ID__isnull=True).order_by("id")
+
+        if opts["incremental"]:
+            since = self._incremental_since(opts["since"])
+            if since is None:
+                self.stdout.write(self.style.WARNING("No previous successful run recorded, doing a full refresh."))
+            else:
+                try:
+                    changed_ids = fetch_changed_movie_ids(tmdb_key, since, run_started)
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f"TMDB changes feed failed: {e}"))
+                    return
+
+                # Intersect the changes feed with our own movies in a single query
+                qs = qs.filter(TMDB_Api_ID__in=changed_ids)
+                self.stdout.write(
+                    f"TMDB reported {len(changed_ids)} changed movies since {since:%Y-%m-%d}."
+                )
+
         if limit and limit > 0:
             qs = qs[:limit]
 
@@ -60,47 +97,9 @@ class Command(BaseCommand):
                 self.stderr.write(self.style.WARNING(f"FAILED Movie(id={movie.id}) TMDB={tmdb_id}: {e}"))
                 continue
 
-            # --- Parse TMDB fields ---
-            title = details.get("title") or details.get("original_title") or movie.title
-
-            # Summary / overview
-            summary = details.get("overview") or ""
-
-            # Director(s)
-            directors = []
-            for p in (credits.get("crew") or []):
-                if p.get("job") == "Director" and p.get("name"):
-                    directors.append(p["name"])
-            directors = list(dict.fromkeys(directors))  # unique, stable order
-
-            # Top cast (first 10)
-            actors = [c.get("name") for c in (credits.get("cast") or [])[:10] if c.get("name")]
-
-            # Genres
-            genres = [g.get("name") for g in (details.get("genres") or []) if g.get("name")]
-
-            # Release year
-            release_date = details.get("release_date") or ""
-            release_yr = int(release_date[:4]) if len(release_date) >= 4 and release_date[:4].isdigit() else None
-
-            runtime = details.get("runtime")
-
-            # Poster
-            poster_path = details.get("poster_path") or ""
-            poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else ""
-
             # Overwrite everything (except internal id + slug)
-            updates = {
-                "title": title,
-                "summary": summary,
-                "director": directors,
-                "actors": actors,
-                "genres": genres,
-                "release_yr": release_yr,
-                "runtime": runtime,
-                "poster_url": poster_url,
-                "TMDB_Api_ID": tmdb_id,
-            }
+            updates = movie_fields_from_tmdb(details, credits, fallback_title=movie.title)
+            updates["TMDB_Api_ID"] = tmdb_id
 
             if dry:
                 self.stdout.write(f"DRY-RUN Movie(id={movie.id}) updates={updates}")
@@ -113,4 +112,22 @@ class Command(BaseCommand):
             processed += 1
             time.sleep(sleep_s)
 
+        # Only a complete, error free run moves the window forward, otherwise the next run retries the same changes
+        if not dry and failed == 0 and not (limit and limit > 0):
+            SyncState.objects.update_or_create(
+                name=TMDB_SYNC_NAME,
+                defaults={"last_synced_at": run_started},
+            )
+
         self.stdout.write(self.style.SUCCESS(f"Done. Processed={processed}, Failed={failed}"))
+
+    def _incremental_since(self, since_opt):
+        # An explicit --since wins over the stored state
+        if since_opt:
+            try:
+                return timezone.make_aware(datetime.strptime(since_opt, "%Y-%m-%d"))
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+
+        state = SyncState.objects.filter(name=TMDB_SYNC_NAME).first()
+        return state.last_synced_at if state else None
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from moviereviews_hub.snapshots import publish_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the couple feeds and club averages to pre-compressed JSON snapshot files "
+        "and publish a new manifest. Writes already trigger this automatically, run it after deploys or bulk changes."
+    )
+
+    def handle(self, *args, **opts):
+        manifest = publish_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Published {len(manifest['files'])} snapshots, version={manifest['version']}"
+        ))
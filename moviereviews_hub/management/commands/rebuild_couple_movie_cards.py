@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from moviereviews_hub.read_models import rebuild_all_cards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the CoupleMovieCard read model used by the couple pages. "
+        "Normally kept up to date by signals, run this on a schedule or after bulk data changes."
+    )
+
+    def handle(self, *args, **opts):
+        written = rebuild_all_cards()
+        self.stdout.write(self.style.SUCCESS(f"Done. Cards written={written}"))
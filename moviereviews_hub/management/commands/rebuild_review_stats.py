@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from moviereviews_hub.stats import rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the ReviewStat summary table behind /api/stats/ from every movie and TV review. "
+        "Normally kept up to date by signals, run this after bulk data changes."
+    )
+
+    def handle(self, *args, **opts):
+        written = rebuild_review_stats()
+        self.stdout.write(self.style.SUCCESS(f"Done. Stat rows written={written}"))
@@ -0,0 +1,73 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from moviereviews_hub.models import Review
+from moviereviews_hub.read_models import rebuild_all_cards
+from moviereviews_hub.stats import rebuild_review_stats
+
+DELETE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "List reviews left over from someone reviewing the same movie more than once, which migration "
+        "0010 (one review per reviewer and movie) refuses to run with. With --apply, keep the latest "
+        "review of each pair and delete the others, after saving them to a JSON backup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apply", action="store_true", help="Delete the older duplicates (default: only list them).")
+        parser.add_argument("--backup", type=str, default="", help="Where to save the deleted reviews (default: duplicate_reviews_<timestamp>.json).")
+
+    def handle(self, *args, **opts):
+        pairs = (
+            Review.objects.values("movie_id", "reviewer")
+            .annotate(n=Count("id"))
+            .filter(n__gt=1)
+            .order_by("movie_id", "reviewer")
+        )
+
+        removed = []
+        for pair in pairs:
+            reviews = list(
+                Review.objects.filter(movie_id=pair["movie_id"], reviewer=pair["reviewer"])
+                .order_by("-id")
+                .values("id", "movie_id", "movie__title", "reviewer", "couple_id", "rating", "rating_justification", "user_id")
+            )
+            keep, older = reviews[0], reviews[1:]
+            self.stdout.write(f"{keep['movie__title']!r} by {keep['reviewer']}: keeping #{keep['id']} (rating {keep['rating']})")
+            for review in older:
+                self.stdout.write(self.style.WARNING(f"    remove #{review['id']} (rating {review['rating']}): {review['rating_justification'][:80]!r}"))
+            removed.extend(older)
+
+        if not removed:
+            self.stdout.write(self.style.SUCCESS("Done. No duplicate reviews."))
+            return
+        if not opts["apply"]:
+            self.stdout.write(self.style.SUCCESS(f"Done. {len(removed)} duplicate reviews, run again with --apply to delete them."))
+            return
+
+        backup = opts["backup"] or f"duplicate_reviews_{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(backup, "w") as f:
+            json.dump(removed, f, cls=DjangoJSONEncoder, indent=2)
+        self.stdout.write(f"Saved the {len(removed)} reviews to delete in {os.path.abspath(backup)}")
+
+        # Deleted with plain SQL: this runs before migrations 0010-0012, so the review signals would
+        # write to tables that don't exist yet. What they maintain is rebuilt below instead.
+        table = connection.ops.quote_name(Review._meta.db_table)
+        ids = [review["id"] for review in removed]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                    batch = ids[start:start + DELETE_BATCH_SIZE]
+                    cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+            cards = rebuild_all_cards()
+            stats = rebuild_review_stats()
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Deleted={len(removed)} cards written={cards} stat rows written={stats}"))
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from moviereviews_hub.authentication import revoke_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Invalidate every JWT issued so far to the given users (they have to log in again). "
+        "Changing a user's password, username, staff/superuser flags or active flag does this automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="+")
+
+    def handle(self, *args, **opts):
+        users = dict(User.objects.filter(username__in=opts["usernames"]).values_list("username", "id"))
+        missing = sorted(set(opts["usernames"]) - set(users))
+        if missing:
+            raise CommandError(f"Unknown users: {', '.join(missing)}")
+
+        for user_id in users.values():
+            revoke_tokens(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Done. Users revoked={len(users)}"))
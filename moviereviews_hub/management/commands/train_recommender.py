@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from moviereviews_hub.recommendations import train, publish_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the couple recommender (rating matrix factorization + movie content embedding) "
+        "and publish it for /api/recommendations/<couple_slug>/. Run on a schedule, new reviews "
+        "are folded in between runs without retraining."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=16, help="Number of latent factors.")
+        parser.add_argument("--iterations", type=int, default=15, help="ALS iterations.")
+        parser.add_argument("--reg", type=float, default=5.0, help="Regularization strength.")
+        parser.add_argument("--content-dims", type=int, default=32, help="Size of the content embedding.")
+        parser.add_argument(
+            "--content-weight",
+            type=float,
+            default=0.3,
+            help="Share of the prediction that comes from the content signal (0-1).",
+        )
+        parser.add_argument("--keep", type=int, default=2, help="How many trained models to keep.")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+
+        model = train(
+            factors=opts["factors"],
+            reg=opts["reg"],
+            iterations=opts["iterations"],
+            content_dims=opts["content_dims"],
+            content_weight=min(max(opts["content_weight"], 0.0), 1.0),
+        )
+        publish_model(model, keep=max(opts["keep"], 1))
+
+        p = model.params
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Model #{model.id}: reviewers={p['reviewers']} movies={p['movies']} ratings={p['ratings']} "
+            f"factors={p['factors']} size={len(model.arrays) // 1024}KB in {time.perf_counter() - started:.1f}s"
+        ))
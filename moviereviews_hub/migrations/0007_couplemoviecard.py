@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:44
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The couples in couples.COUPLE_SLUG_TO_ID_MAP when this migration was written
+COUPLE_IDS = ['TrevorTaylor', 'MarissaNathan', 'SierraBenett', 'MomDad', 'MiaLogan', 'AnnieFelix']
+
+
+# Fill the read model from the existing movies and reviews
+def backfill_cards(apps, schema_editor):
+    Movie = apps.get_model('moviereviews_hub', 'Movie')
+    Review = apps.get_model('moviereviews_hub', 'Review')
+    CoupleMovieCard = apps.get_model('moviereviews_hub', 'CoupleMovieCard')
+
+    reviews_by_key = {}
+    for review in Review.objects.order_by('id').values('movie_id', 'couple_id', 'reviewer', 'rating', 'rating_justification'):
+        reviews_by_key.setdefault((review['couple_id'], review['movie_id']), {})[review['reviewer'].strip().capitalize()] = {
+            'rating': review['rating'],
+            'review': review['rating_justification'],
+        }
+
+    cards = []
+    for movie in Movie.objects.order_by('id'):
+        for couple_id in COUPLE_IDS:
+            cards.append(CoupleMovieCard(
+                couple_id=couple_id,
+                movie_id=movie.id,
+                title=movie.title,
+                director=movie.director,
+                actors=movie.actors,
+                genres=movie.genres,
+                summary=movie.summary,
+                release_yr=movie.release_yr,
+                runtime=movie.runtime,
+                poster_url=movie.poster_url,
+                reviews=reviews_by_key.get((couple_id, movie.id), {}),
+            ))
+    CoupleMovieCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviereviews_hub', '0006_syncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoupleMovieCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('couple_id', models.CharField(max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('director', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), default=list, size=None)),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=200), default=list, size=None)),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=150), default=list, size=None)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('release_yr', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('runtime', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('poster_url', models.CharField(blank=True, default='', max_length=255)),
+                ('reviews', models.JSONField(blank=True, default=dict)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='couple_cards', to='moviereviews_hub.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('couple_id', 'movie'), name='unique_couple_movie_card')],
+            },
+        ),
+        migrations.RunPython(backfill_cards, migrations.RunPython.noop),
+    ]
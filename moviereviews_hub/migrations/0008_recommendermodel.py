@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviereviews_hub', '0007_couplemoviecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommenderModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trained_at', models.DateTimeField(auto_now_add=True)),
+                ('params', models.JSONField(default=dict)),
+                ('arrays', models.BinaryField()),
+            ],
+        ),
+    ]
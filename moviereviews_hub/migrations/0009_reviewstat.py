@@ -0,0 +1,75 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+import math
+
+
+# Fill the summary table from the existing movie and TV reviews. A frozen copy of
+# stats.compute_stat_rows, so later changes to the app code can't change what this migration does
+def backfill_stats(apps, schema_editor):
+    Review = apps.get_model('moviereviews_hub', 'Review')
+    TvShowRatingsAndReviews = apps.get_model('tvshows_app', 'TvShowRatingsAndReviews')
+    ReviewStat = apps.get_model('moviereviews_hub', 'ReviewStat')
+
+    totals = {}  # (source, kind, name, genre, bucket) -> [count, rating_sum]
+
+    def add(source, reviewer, couple_id, rating, genres):
+        bucket = min(max(int(math.floor(rating)), 0), 10)
+        for kind, name in (('reviewer', reviewer), ('couple', couple_id)):
+            if not name:
+                continue
+            for genre in {'', *(genres or [])}:
+                entry = totals.setdefault((source, kind, name, genre, bucket), [0, 0.0])
+                entry[0] += 1
+                entry[1] += rating
+
+    movie_reviews = (
+        Review.objects.filter(rating__isnull=False)
+        .values_list('reviewer', 'couple_id', 'rating', 'movie__genres')
+    )
+    for reviewer, couple_id, rating, genres in movie_reviews.iterator(chunk_size=5000):
+        add('movies', reviewer, couple_id, rating, genres)
+
+    tv_reviews = TvShowRatingsAndReviews.objects.filter(rating__isnull=False).values_list(
+        'reviewer__username', 'couple_slug', 'rating',
+        'tv_show_type__genres', 'tv_season_type__show__genres', 'tv_episode_type__season_number__show__genres',
+    )
+    for username, couple_id, rating, show_genres, season_genres, episode_genres in tv_reviews.iterator(chunk_size=5000):
+        add('tv', username, couple_id, rating, show_genres or season_genres or episode_genres)
+
+    ReviewStat.objects.bulk_create(
+        [
+            ReviewStat(source=source, kind=kind, name=name, genre=genre, bucket=bucket, count=count, rating_sum=rating_sum)
+            for (source, kind, name, genre, bucket), (count, rating_sum) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviereviews_hub', '0008_recommendermodel'),
+        ('tvshows_app', '0004_rename_review_justification_tvshowratingsandreviews_rating_justification_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=10)),
+                ('kind', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=150)),
+                ('genre', models.CharField(blank=True, default='', max_length=150)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'kind', 'name', 'genre', 'bucket'), name='unique_review_stat')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
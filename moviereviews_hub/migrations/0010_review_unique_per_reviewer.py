@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Reviews aren't deleted here: when someone reviewed the same movie more than once, stop and
+# let resolve_duplicate_reviews list them and remove the older ones with a backup
+def check_no_duplicate_reviews(apps, schema_editor):
+    Review = apps.get_model('moviereviews_hub', 'Review')
+
+    duplicates = (
+        Review.objects.values('movie_id', 'reviewer')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+        .count()
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (movie, reviewer) pairs have more than one review, which the one review per "
+            f"reviewer and movie constraint can't allow. List them with "
+            f"`python manage.py resolve_duplicate_reviews`, keep the latest of each with --apply "
+            f"(the others are saved to a JSON backup), then run migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviereviews_hub', '0009_reviewstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('movie', 'reviewer'), name='unique_review_per_movie_reviewer'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# One entry per existing row, so syncing from the beginning returns the whole catalog.
+# The sync keys are the ones changelog.SYNC_MODELS had when this migration was written
+def backfill_changelog(apps, schema_editor):
+    ChangeLogEntry = apps.get_model('moviereviews_hub', 'ChangeLogEntry')
+
+    for key, label in [
+        ('movies', 'moviereviews_hub.Movie'),
+        ('reviews', 'moviereviews_hub.Review'),
+        ('shows', 'tvshows_app.TvShow'),
+        ('seasons', 'tvshows_app.Season'),
+        ('episodes', 'tvshows_app.Episode'),
+        ('tv_reviews', 'tvshows_app.TvShowRatingsAndReviews'),
+    ]:
+        model = apps.get_model(label)
+        batch = []
+        for pk in model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000):
+            batch.append(ChangeLogEntry(model=key, object_id=pk))
+            if len(batch) >= 5000:
+                ChangeLogEntry.objects.bulk_create(batch)
+                batch = []
+        ChangeLogEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviereviews_hub', '0011_review_couple_id_index'),
+        ('tvshows_app', '0004_rename_review_justification_tvshowratingsandreviews_rating_justification_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id'], name='changelog_model_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changelog, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User  # For logins
 from django.contrib.postgres.fields import ArrayField
@@ -57,4 +58,130 @@ class Review(models.Model):
     rating    = models.FloatField(null=True, blank=True)
     rating_justification = models.TextField(blank=True, default="")
     user      = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
-    # contains_spoiler = models.BooleanField(default = false)  probably will be handled elsewhere
\ No newline at end of file
+    # contains_spoiler = models.BooleanField(default = false)  probably will be handled elsewhere
+
+    class Meta:
+        constraints = [
+            # One review per person per movie, also what the spreadsheet import upserts on
+            models.UniqueConstraint(
+                fields = ["movie", "reviewer"],
+                name = "unique_review_per_movie_reviewer"
+            )
+        ]
+        indexes = [
+            # Couple filters: admin, recommendations fold-in, import refreshes
+            models.Index(fields = ["couple_id"], name = "review_couple_id_idx")
+        ]
+
+# Remembers when each upstream sync (TMDB changes feed, TVMaze updates, ...) last finished successfully,
+# so the next run only has to ask for what changed since then
+class SyncState(models.Model):
+    name           = models.CharField(max_length = 50, unique = True)
+    last_synced_at = models.DateTimeField(null = True, blank = True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_synced_at}"
+
+
+# Denormalized read model for the couple pages. One row per (couple, movie) holding the movie card fields
+# and that couple's reviews, kept up to date by the signals in signals.py (see read_models.py)
+class CoupleMovieCard(models.Model):
+    couple_id  = models.CharField(max_length = 20)
+    movie      = models.ForeignKey(Movie, on_delete = models.CASCADE, related_name = "couple_cards")
+
+    # Copies of the Movie fields shown on the card
+    title      = models.CharField(max_length = 200)
+    director   = ArrayField(models.CharField(max_length = 100), default = list)
+    actors     = ArrayField(models.CharField(max_length = 200), default = list)
+    genres     = ArrayField(models.CharField(max_length = 150), default = list)
+    summary    = models.TextField(blank = True, default = "")
+    release_yr = models.PositiveSmallIntegerField(null = True, blank = True)
+    runtime    = models.PositiveSmallIntegerField(null = True, blank = True)
+    poster_url = models.CharField(max_length = 255, blank = True, default = "")
+
+    # { "Trevor": {"rating": 8.5, "review": "..."}, "Taylor": {...} }
+    reviews    = models.JSONField(default = dict, blank = True)
+
+    class Meta:
+        constraints = [
+            # Also the index the couple page scans: WHERE couple_id = ... ORDER BY movie_id
+            models.UniqueConstraint(
+                fields = ["couple_id", "movie"],
+                name = "unique_couple_movie_card"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.couple_id} - {self.title}"
+
+
+# A trained recommender (see recommendations.py). `arrays` holds the compact NumPy arrays
+# (movie ids, biases, item factors, content factors) saved with np.savez, `params` the scalars
+class RecommenderModel(models.Model):
+    trained_at = models.DateTimeField(auto_now_add = True)
+    params     = models.JSONField(default = dict)
+    arrays     = models.BinaryField()
+
+    def __str__(self):
+        return f"Recommender #{self.pk} @ {self.trained_at}"
+
+
+# Incrementally maintained rating statistics (see stats.py). One row per
+# (source, reviewer or couple, genre, rating bucket) with the number of ratings and their sum,
+# so averages, histograms and genre preferences are read from a handful of rows
+class ReviewStat(models.Model):
+    SOURCE_MOVIES = "movies"
+    SOURCE_TV     = "tv"
+
+    KIND_REVIEWER = "reviewer"
+    KIND_COUPLE   = "couple"
+
+    source     = models.CharField(max_length = 10)
+    kind       = models.CharField(max_length = 10)
+    name       = models.CharField(max_length = 150)   # reviewer username or couple id
+    genre      = models.CharField(max_length = 150, blank = True, default = "")   # "" = every genre
+    bucket     = models.PositiveSmallIntegerField()    # whole part of the rating, 0-10
+    count      = models.IntegerField(default = 0)
+    rating_sum = models.FloatField(default = 0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields = ["source", "kind", "name", "genre", "bucket"],
+                name = "unique_review_stat"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.kind} {self.name} [{self.genre or 'all'}] {self.bucket}: {self.count}"
+
+
+# Append-only log of catalog writes for the /api/sync/ delta endpoint (see changelog.py).
+# The id is the sequence clients sync from: one row per created/updated/deleted
+# Movie, Review, TvShow, Season, Episode or TV review
+class ChangeLogEntry(models.Model):
+    model      = models.CharField(max_length = 20)    # sync key, "movies", "episodes", ...
+    object_id  = models.BigIntegerField()
+    deleted    = models.BooleanField(default = False)  # True = tombstone
+    created_at = models.DateTimeField(default = timezone.now)
+
+    class Meta:
+        indexes = [
+            # Compaction looks up every entry of a row
+            models.Index(fields = ["model", "object_id"], name = "changelog_model_object_idx")
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model} {self.object_id}{' deleted' if self.deleted else ''}"
+
+
+# Revocation table for the claims-only JWT authentication (see authentication.py). Access tokens carry
+# the user's version when issued, bumping it here invalidates every token issued before.
+# Users without a row are at version 0. Rows outlive their user (no cascade, no FK constraint) so the
+# revocation written when a user is deleted keeps that user's tokens rejected
+class TokenVersion(models.Model):
+    user    = models.OneToOneField(User, on_delete = models.DO_NOTHING, db_constraint = False, related_name = "token_version")
+    version = models.PositiveIntegerField(default = 0)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
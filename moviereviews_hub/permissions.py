@@ -11,4 +11,5 @@ class IsReviewOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         # Otherwise, only allow the review's owner to edit/delete
-        return obj.user == request.user
+        # Compared by id: request.user is a TokenUser when authenticated from JWT claims
+        return obj.user_id == request.user.id
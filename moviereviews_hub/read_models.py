@@ -0,0 +1,136 @@
+from .couples import COUPLE_SLUG_TO_ID_MAP
+from .models import Movie, Review, CoupleMovieCard
+
+# =============================================
+# Keeps the CoupleMovieCard read model in sync with Movie and Review.
+# Single writes refresh only the rows they touch, rebuild_all_cards() recomputes everything
+# =============================================
+
+# Movie fields that are copied onto every card
+CARD_MOVIE_FIELDS = ["title", "director", "actors", "genres", "summary", "release_yr", "runtime", "poster_url"]
+
+
+def couple_ids():
+    return list(COUPLE_SLUG_TO_ID_MAP.values())
+
+
+def reviews_payload(reviews):
+    """Build the {Reviewer: {rating, review}} dict shown on a card from Review .values() dicts."""
+    reviewer_reviews = {}
+    for review in reviews:
+        normalized_reviewer_name = review["reviewer"].strip().capitalize()
+        reviewer_reviews[normalized_reviewer_name] = {
+            "rating": review["rating"],
+            "review": review["rating_justification"]
+        }
+    return reviewer_reviews
+
+
+def _upsert_cards(cards):
+    CoupleMovieCard.objects.bulk_create(
+        cards,
+        batch_size = 500,
+        update_conflicts = True,
+        unique_fields = ["couple_id", "movie"],
+        update_fields = CARD_MOVIE_FIELDS + ["reviews"],
+    )
+
+
+def refresh_movie_cards(movie_id):
+    """Rewrite every couple's card for one movie, e.g. after the movie itself was edited."""
+    refresh_cards_for_movies([movie_id])
+
+
+def refresh_cards_for_movies(movie_ids, batch_size = 1000):
+    """Rewrite every couple's card for these movies, e.g. after a bulk import, two queries per batch."""
+    movie_ids = sorted(set(movie_ids))
+    couples = couple_ids()
+
+    for start in range(0, len(movie_ids), batch_size):
+        batch = movie_ids[start:start + batch_size]
+        movies = Movie.objects.filter(pk__in = batch).values("id", *CARD_MOVIE_FIELDS)   # deleted ones took their cards along
+
+        reviews_by_key = {}
+        for review in (
+            Review.objects.filter(movie_id__in = batch)
+            .order_by("id")
+            .values("movie_id", "couple_id", "reviewer", "rating", "rating_justification")
+        ):
+            reviews_by_key.setdefault((review["couple_id"], review["movie_id"]), []).append(review)
+
+        _upsert_cards([
+            CoupleMovieCard(
+                couple_id = couple_id,
+                movie_id = movie["id"],
+                reviews = reviews_payload(reviews_by_key.get((couple_id, movie["id"]), [])),
+                **{field: movie[field] for field in CARD_MOVIE_FIELDS},
+            )
+            for movie in movies
+            for couple_id in couples
+        ])
+
+
+def refresh_couple_movie_card(couple_id, movie_id):
+    """Rewrite one couple's card for one movie, e.g. after one of their reviews changed."""
+    if couple_id not in couple_ids():
+        return  # reviews from uncategorized users never show up on a couple page
+
+    movie = Movie.objects.filter(pk = movie_id).values("id", *CARD_MOVIE_FIELDS).first()
+    if movie is None:
+        return
+
+    reviews = (
+        Review.objects.filter(movie_id = movie_id, couple_id = couple_id)
+        .order_by("id")
+        .values("couple_id", "reviewer", "rating", "rating_justification")
+    )
+
+    _upsert_cards([
+        CoupleMovieCard(
+            couple_id = couple_id,
+            movie_id = movie_id,
+            reviews = reviews_payload(reviews),
+            **{field: movie[field] for field in CARD_MOVIE_FIELDS},
+        )
+    ])
+
+
+def rebuild_all_cards():
+    """
+    Recompute the whole read model with one query for movies and one for reviews.
+    Rows are upserted, so readers never see an empty table while this runs.
+    """
+    reviews_by_key = {}
+    for review in (
+        Review.objects.order_by("id")
+        .values("movie_id", "couple_id", "reviewer", "rating", "rating_justification")
+        .iterator(chunk_size = 2000)
+    ):
+        reviews_by_key.setdefault((review["couple_id"], review["movie_id"]), []).append(review)
+
+    couples = couple_ids()
+    batch = []
+    written = 0
+
+    for movie in Movie.objects.order_by("id").values("id", *CARD_MOVIE_FIELDS).iterator(chunk_size = 2000):
+        for couple_id in couples:
+            batch.append(CoupleMovieCard(
+                couple_id = couple_id,
+                movie_id = movie["id"],
+                reviews = reviews_payload(reviews_by_key.get((couple_id, movie["id"]), [])),
+                **{field: movie[field] for field in CARD_MOVIE_FIELDS},
+            ))
+
+        if len(batch) >= 2000:
+            _upsert_cards(batch)
+            written += len(batch)
+            batch = []
+
+    if batch:
+        _upsert_cards(batch)
+        written += len(batch)
+
+    # Drop cards for couples that are no longer in the club
+    CoupleMovieCard.objects.exclude(couple_id__in = couples).delete()
+
+    return written
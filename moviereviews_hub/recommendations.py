@@ -0,0 +1,334 @@
+import io
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from movieclub_backend.db_router import use_replica
+from movieclub_backend.singleflight import single_flight
+
+from .analytics import load_rating_matrix
+from .models import Movie, Review, RecommenderModel
+
+# =============================================
+# "What should we watch next" recommendations for each couple.
+#
+# Offline (manage.py train_recommender):
+#   - a low-rank matrix factorization of the reviewer x movie ratings, fitted with ALS
+#     (rating ~ global mean + reviewer bias + movie bias + reviewer factors . movie factors)
+#   - a content embedding of every movie from its genres, directors and actors
+#     (TF-IDF of the shared terms reduced with a randomized SVD)
+#   Both are stored as float32 arrays on a RecommenderModel row.
+#
+# Online (/api/recommendations/<couple_slug>/):
+#   the couple's current ratings are folded into the trained movie factors (a small k x k
+#   ridge solve) and into a content taste profile. The folded-in profile is cached until the
+#   couple's next review write, so a request is two cache reads, two matrix-vector products
+#   and a partial sort.
+# =============================================
+
+RATING_MIN, RATING_MAX = 0.0, 10.0
+
+MODEL_ID_CACHE_KEY = "recommendations:model_id"
+MODEL_ID_CACHE_SECONDS = 60
+
+
+def _profile_cache_key(couple_id):
+    return f"recommendations:couple:{couple_id}"
+
+
+# ---------------------------------------------
+# Training
+# ---------------------------------------------
+def _solve_rows(mask, residuals, factors, reg):
+    """
+    Ridge-solve one factor vector per row of `mask` against the fixed `factors` of the other side:
+        (F_r^T F_r + reg I) x = F_r^T e,  where F_r are the factors of the entries the row rated.
+    All rows are solved at once as a batch of k x k systems.
+    """
+    k = factors.shape[1]
+    lhs = np.einsum("ri,ik,il->rkl", mask, factors, factors, optimize=True) + reg * np.eye(k)
+    rhs = residuals @ factors
+    return np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+
+def fit_factors(values, factors=16, reg=5.0, iterations=15, seed=0):
+    """
+    Fit biases and factors to `values` (rows x movies, NaN = not rated) with alternating least squares.
+
+    RETURNS (global_mean, row_bias, item_bias, row_factors, item_factors)
+    """
+    rng = np.random.default_rng(seed)
+    rated = ~np.isnan(values)
+    mask = rated.astype(float)
+    r = np.where(rated, values, 0.0)
+
+    global_mean = float(r.sum() / max(mask.sum(), 1))
+
+    # Regularized biases, shrunk towards 0 for rows/movies with few ratings
+    item_bias = (mask * (r - global_mean)).sum(axis=0) / (mask.sum(axis=0) + reg)
+    row_bias = (mask * (r - global_mean - item_bias)).sum(axis=1) / (mask.sum(axis=1) + reg)
+    residuals = mask * (r - global_mean - row_bias[:, None] - item_bias[None, :])
+
+    k = max(1, min(factors, values.shape[0]))
+    row_factors = rng.normal(0, 0.1, (values.shape[0], k))
+    item_factors = rng.normal(0, 0.1, (values.shape[1], k))
+
+    for _ in range(iterations):
+        row_factors = _solve_rows(mask, residuals, item_factors, reg)
+        item_factors = _solve_rows(mask.T, residuals.T, row_factors, reg)
+
+    return global_mean, row_bias, item_bias, row_factors, item_factors
+
+
+def content_factors(movies, dims=32, max_terms=2000, seed=0):
+    """
+    Embed every movie from its genres, directors and actors. `movies` is a list of
+    (genres, directors, actors) tuples. Rows of the result are unit length (or zero for
+    movies with no shared terms), so a dot product is a cosine similarity.
+    """
+    docs = [
+        {f"g:{g}" for g in genres or []} | {f"d:{d}" for d in directors or []} | {f"a:{a}" for a in actors or []}
+        for genres, directors, actors in movies
+    ]
+
+    doc_freq = {}
+    for terms in docs:
+        for term in terms:
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+
+    # A term on a single movie can't make two movies similar, keep the most common shared terms
+    shared = sorted((t for t, df in doc_freq.items() if df >= 2), key=lambda t: (-doc_freq[t], t))[:max_terms]
+    if not shared or not movies:
+        return np.zeros((len(movies), 1), dtype=np.float32)
+
+    vocab = {term: i for i, term in enumerate(shared)}
+    idf = np.log(len(movies) / np.array([doc_freq[t] for t in shared], dtype=float))
+
+    features = np.zeros((len(movies), len(vocab)), dtype=np.float32)
+    for row, terms in enumerate(docs):
+        cols = [vocab[t] for t in terms if t in vocab]
+        features[row, cols] = idf[cols]
+
+    # Randomized SVD: project onto a random subspace, then take an exact SVD of the small matrix
+    dims = max(1, min(dims, *features.shape))
+    rng = np.random.default_rng(seed)
+    sketch = features @ rng.normal(size=(features.shape[1], min(dims + 10, features.shape[1]))).astype(np.float32)
+    basis, _ = np.linalg.qr(sketch)
+    u, s, _ = np.linalg.svd(basis.T @ features, full_matrices=False)
+    embedding = (basis @ u[:, :dims]) * s[:dims]
+
+    norms = np.linalg.norm(embedding, axis=1, keepdims=True)
+    return np.divide(embedding, norms, out=np.zeros_like(embedding), where=norms > 0).astype(np.float32)
+
+
+def train(factors=16, reg=5.0, iterations=15, content_dims=32, content_weight=0.3, seed=0):
+    """Train on every movie review and movie, RETURNS an unsaved RecommenderModel."""
+    matrix = load_rating_matrix(include_tv=False)
+
+    movies = list(Movie.objects.order_by("id").values_list("id", "genres", "director", "actors"))
+    movie_ids = np.array([m[0] for m in movies], dtype=np.int64)
+
+    # Spread the rated columns over every movie, movies nobody rated keep NaN
+    values = np.full((matrix.values.shape[0], len(movie_ids)), np.nan)
+    values[:, np.searchsorted(movie_ids, matrix.items // 4)] = matrix.values
+
+    global_mean, _, item_bias, row_factors, item_factors = fit_factors(values, factors, reg, iterations, seed)
+
+    arrays = {
+        "movie_ids": movie_ids,
+        "item_bias": item_bias.astype(np.float32),
+        "item_factors": item_factors.astype(np.float32),
+        "content_factors": content_factors([m[1:] for m in movies], content_dims, seed=seed),
+    }
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+
+    return RecommenderModel(
+        params={
+            "global_mean": global_mean,
+            "reg": reg,
+            "factors": int(item_factors.shape[1]),
+            "content_weight": content_weight,
+            "reviewers": int(values.shape[0]),
+            "movies": int(values.shape[1]),
+            "ratings": int((~np.isnan(values)).sum()),
+        },
+        arrays=buffer.getvalue(),
+    )
+
+
+def publish_model(model, keep=2):
+    """Save a trained model, point the API at it and drop all but the newest `keep` models."""
+    with transaction.atomic():
+        model.save()
+        stale = RecommenderModel.objects.order_by("-id").values_list("id", flat=True)[keep:]
+        RecommenderModel.objects.filter(id__in=list(stale)).delete()
+
+    cache.set(MODEL_ID_CACHE_KEY, model.id, timeout=MODEL_ID_CACHE_SECONDS)
+
+
+# ---------------------------------------------
+# Serving
+# ---------------------------------------------
+class Recommender:
+    """A trained RecommenderModel loaded into memory."""
+
+    def __init__(self, model_id, trained_at, params, arrays):
+        self.model_id = model_id
+        self.trained_at = trained_at
+        self.global_mean = params["global_mean"]
+        self.reg = params["reg"]
+        self.content_weight = params["content_weight"]
+
+        self.movie_ids = arrays["movie_ids"]
+        self.item_bias = arrays["item_bias"]
+        self.item_factors = arrays["item_factors"]
+        self.content_factors = arrays["content_factors"]
+
+    @classmethod
+    def from_model(cls, model):
+        with np.load(io.BytesIO(bytes(model.arrays))) as arrays:
+            return cls(model.id, model.trained_at, model.params, {name: arrays[name] for name in arrays.files})
+
+    def _positions(self, movie_ids):
+        # Column of each movie id, -1 for movies added since the model was trained
+        if not len(self.movie_ids):
+            return np.full(len(movie_ids), -1)
+        pos = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        return np.where(self.movie_ids[pos] == movie_ids, pos, -1)
+
+    def fold_in(self, movie_ids, ratings):
+        """
+        Fit a couple's bias, factors and content profile to their ratings with the movie
+        side held fixed, the same ridge solve ALS uses for a reviewer row.
+        """
+        pos = self._positions(movie_ids)
+        known = pos >= 0
+        pos, r = pos[known], ratings[known]
+
+        k = self.item_factors.shape[1]
+        profile = {
+            "model_id": self.model_id,
+            "rated": np.asarray(movie_ids, dtype=np.int64),
+            "bias": 0.0,
+            "factors": np.zeros(k, dtype=np.float32),
+            "taste": np.zeros(self.content_factors.shape[1], dtype=np.float32),
+            "mean": float(ratings.mean()) if len(ratings) else self.global_mean,
+            "spread": float(ratings.std()) if len(ratings) > 1 else 1.0,
+        }
+        if not len(r):
+            return profile
+
+        bias = float((r - self.global_mean - self.item_bias[pos]).sum() / (len(r) + self.reg))
+        residual = r - self.global_mean - bias - self.item_bias[pos]
+        rated_factors = self.item_factors[pos]
+        profile["bias"] = bias
+        profile["factors"] = np.linalg.solve(
+            rated_factors.T @ rated_factors + self.reg * np.eye(k), rated_factors.T @ residual
+        ).astype(np.float32)
+
+        # Taste = content of what they rated, weighted by how much they liked it vs. their own average
+        taste = (r - r.mean()) @ self.content_factors[pos]
+        norm = np.linalg.norm(taste)
+        if norm > 0:
+            profile["taste"] = (taste / norm).astype(np.float32)
+
+        return profile
+
+    def predict(self, profile):
+        """Predicted rating of every movie in the model for a folded-in profile."""
+        collaborative = self.global_mean + profile["bias"] + self.item_bias + self.item_factors @ profile["factors"]
+        content = profile["mean"] + profile["spread"] * (self.content_factors @ profile["taste"])
+
+        w = self.content_weight
+        return np.clip((1 - w) * collaborative + w * content, RATING_MIN, RATING_MAX)
+
+    def top_n(self, profile, n):
+        """RETURNS [(movie_id, predicted_rating)] for the best `n` movies the couple hasn't rated."""
+        scores = self.predict(profile)
+        scores[np.isin(self.movie_ids, profile["rated"])] = -np.inf
+
+        n = min(n, int(np.isfinite(scores).sum()))
+        if n <= 0:
+            return []
+        best = np.argpartition(-scores, n - 1)[:n]
+        best = best[np.argsort(-scores[best])]
+        return [(int(self.movie_ids[i]), float(scores[i])) for i in best]
+
+
+_loaded = None  # the Recommender this process last loaded
+
+
+def get_recommender():
+    """The newest trained Recommender, or None if none has been trained yet."""
+    global _loaded
+
+    model_id = cache.get(MODEL_ID_CACHE_KEY)
+    if model_id is None:
+        # From the primary, here and below: the replica may not have the newest model yet
+        with use_replica(False):
+            model_id = RecommenderModel.objects.order_by("-id").values_list("id", flat=True).first()
+        if model_id is None:
+            return None
+        cache.set(MODEL_ID_CACHE_KEY, model_id, timeout=MODEL_ID_CACHE_SECONDS)
+
+    if _loaded is None or _loaded.model_id != model_id:
+        with use_replica(False):
+            model = RecommenderModel.objects.filter(id=model_id).first()
+        if model is None:  # deleted by a newer training run, look the newest one up again
+            cache.delete(MODEL_ID_CACHE_KEY)
+            return get_recommender()
+        _loaded = Recommender.from_model(model)
+    return _loaded
+
+
+def couple_ratings(couple_id):
+    """RETURNS (movie_ids, ratings) with the couple's mean rating of every movie they reviewed."""
+    rows = list(
+        Review.objects
+        .filter(couple_id=couple_id, rating__isnull=False)
+        .values_list("movie_id", "rating")
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    movie_ids, ratings = (np.array(col) for col in zip(*rows))
+    unique_ids, index = np.unique(movie_ids.astype(np.int64), return_inverse=True)
+    means = np.bincount(index, weights=ratings.astype(float)) / np.bincount(index)
+    return unique_ids, means
+
+
+def couple_profile(recommender, couple_id):
+    """The couple's folded-in profile, cached until their next review write (see signals.py)."""
+    key = _profile_cache_key(couple_id)
+
+    def current():
+        profile = cache.get(key)
+        return profile if profile is not None and profile["model_id"] == recommender.model_id else None
+
+    def fold_in():
+        # From the primary, or a lagging replica's ratings would stay cached past the write
+        with use_replica(False):
+            ratings = couple_ratings(couple_id)
+        profile = recommender.fold_in(*ratings)
+        cache.set(key, profile, timeout=None)
+        return profile
+
+    # One request folds the profile in, others arriving meanwhile wait for it (see singleflight.py)
+    return single_flight(key, fold_in, current)
+
+
+def invalidate_couple_profile(couple_id):
+    cache.delete(_profile_cache_key(couple_id))
+
+
+def recommend_for_couple(couple_id, n=20):
+    """
+    RETURNS (recommender, [(movie_id, predicted_rating)]) for the couple's top `n` unrated movies,
+    or (None, []) if no model has been trained yet.
+    """
+    recommender = get_recommender()
+    if recommender is None:
+        return None, []
+    return recommender, recommender.top_n(couple_profile(recommender, couple_id), n)
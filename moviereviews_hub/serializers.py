@@ -9,6 +9,7 @@ import json
 
 import json
 from rest_framework import serializers
+from movieclub_backend.fieldsets import FieldSelectionMixin
 
 def _clean_array_field(value, field_name):
     # Case 1: Already valid list
@@ -36,7 +37,7 @@ def _clean_array_field(value, field_name):
 
 
 # Serializer for the Movie model
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(FieldSelectionMixin, serializers.ModelSerializer):
 
     # Expect a list of items, and each item will be a string
     director = serializers.ListField(child=serializers.CharField())
@@ -107,7 +108,7 @@ class MovieSerializer(serializers.ModelSerializer):
         }
 
 # Serializer for the Review model
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(FieldSelectionMixin, serializers.ModelSerializer):
 
     # Allow these to be blank for when a user on the site submits new review/rating for new movie
     rating = serializers.FloatField(required=False, allow_null=True)
@@ -117,17 +118,18 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = '__all__'
         read_only_fields = ['user', 'reviewer', 'couple_id']
+        expandable_fields = {'movie': MovieSerializer}  # ?expand=movie nests the movie instead of its id
 
 # your_app/serializers.py
 
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import add_claims
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
 
-        # ✅ Add custom claims
-        token['username'] = user.username
-
-        return token
+        # ✅ Add custom claims (username, couple, staff flag, token version), so requests
+        # are authenticated from the token alone (see authentication.py)
+        return add_claims(token, user)
@@ -0,0 +1,138 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Movie, Review
+from . import changelog, read_models, stats
+from .analytics import invalidate_agreement_cache
+from .authentication import TOKEN_FIELDS, revoke_tokens
+from .recommendations import invalidate_couple_profile
+from .snapshots import schedule_publish
+
+# =============================================
+# Signal handlers that keep derived data (read models, caches, ...) in step with writes.
+# Work is deferred with transaction.on_commit so a rolled back write never leaks into derived data.
+# The ReviewStat deltas are the exception: they are applied right away, inside the write's
+# transaction when there is one, so the summary rows commit or roll back together with the review
+# =============================================
+
+
+@receiver(pre_save, sender=Movie)
+def movie_about_to_save(sender, instance, **kwargs):
+    # Remember the genres, the stats of the movie's reviews move if they change
+    instance._previous_genres = None
+    if instance.pk:
+        instance._previous_genres = Movie.objects.filter(pk=instance.pk).values_list("genres", flat=True).first()
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, **kwargs):
+    previous_genres = getattr(instance, "_previous_genres", None)
+    if previous_genres is not None and set(previous_genres) != set(instance.genres or []):
+        deltas = {}
+        for reviewer, couple_id, rating in Review.objects.filter(movie_id=instance.pk).values_list("reviewer", "couple_id", "rating"):
+            stats.add_contribution(deltas, stats.ReviewStat.SOURCE_MOVIES, reviewer, couple_id, rating, previous_genres, sign=-1)
+            stats.add_contribution(deltas, stats.ReviewStat.SOURCE_MOVIES, reviewer, couple_id, rating, instance.genres)
+        stats.apply_deltas(deltas)
+
+    transaction.on_commit(lambda: read_models.refresh_movie_cards(instance.pk))
+    transaction.on_commit(schedule_publish)
+    changelog.record_changes(Movie, [instance.pk])
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    transaction.on_commit(schedule_publish)
+    changelog.record_changes(Movie, [instance.pk], deleted=True)
+
+
+@receiver(pre_save, sender=Review)
+def review_about_to_save(sender, instance, **kwargs):
+    # Remember which card the review belonged to (an update can move it to another movie)
+    # and what it contributed to the stats
+    instance._previous_card_key = None
+    instance._previous_stats = None
+    if instance.pk:
+        previous = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list("couple_id", "movie_id", "reviewer", "rating", "movie__genres")
+            .first()
+        )
+        if previous:
+            instance._previous_card_key = previous[:2]
+            instance._previous_stats = previous
+
+
+def _review_stats_contribution(deltas, review, sign=1):
+    genres = stats.movie_genres(review.movie_id)
+    return stats.add_contribution(
+        deltas, stats.ReviewStat.SOURCE_MOVIES, review.reviewer, review.couple_id, review.rating, genres, sign
+    )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    keys = {(instance.couple_id, instance.movie_id)}
+    previous = getattr(instance, "_previous_card_key", None)
+    if previous:
+        keys.add(previous)
+
+    deltas = {}
+    previous_stats = getattr(instance, "_previous_stats", None)
+    if previous_stats:
+        couple_id, _, reviewer, rating, genres = previous_stats
+        stats.add_contribution(deltas, stats.ReviewStat.SOURCE_MOVIES, reviewer, couple_id, rating, genres, sign=-1)
+    stats.apply_deltas(_review_stats_contribution(deltas, instance))
+
+    for couple_id, movie_id in keys:
+        transaction.on_commit(
+            lambda couple_id=couple_id, movie_id=movie_id: read_models.refresh_couple_movie_card(couple_id, movie_id)
+        )
+    for couple_id in {couple_id for couple_id, _ in keys}:
+        transaction.on_commit(lambda couple_id=couple_id: invalidate_couple_profile(couple_id))
+    transaction.on_commit(schedule_publish)
+    transaction.on_commit(invalidate_agreement_cache)
+    changelog.record_changes(Review, [instance.pk])
+
+
+@receiver(pre_delete, sender=Review)
+def review_about_to_delete(sender, instance, **kwargs):
+    # A cascade sends every pre_delete before deleting anything, so the movie row is still
+    # there even when it is what is being deleted
+    stats.apply_deltas(_review_stats_contribution({}, instance, sign=-1))
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    couple_id, movie_id = instance.couple_id, instance.movie_id
+    transaction.on_commit(lambda: read_models.refresh_couple_movie_card(couple_id, movie_id))
+    transaction.on_commit(lambda: invalidate_couple_profile(couple_id))
+    transaction.on_commit(schedule_publish)
+    transaction.on_commit(invalidate_agreement_cache)
+    changelog.record_changes(Review, [instance.pk], deleted=True)
+
+
+@receiver(pre_save, sender=User)
+def user_about_to_save(sender, instance, update_fields=None, **kwargs):
+    # A change to anything the tokens carry, the password or is_active revokes the tokens already
+    # issued (see authentication.py). Logins only save last_login, those skip the lookup
+    instance._revoke_tokens = False
+    if not instance.pk or (update_fields is not None and not set(TOKEN_FIELDS) & set(update_fields)):
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list(*TOKEN_FIELDS).first()
+    if previous:
+        instance._revoke_tokens = previous != tuple(getattr(instance, field) for field in TOKEN_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if getattr(instance, "_revoke_tokens", False):
+        revoke_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # The tokens don't need the User row, so they'd keep working. The TokenVersion row is left
+    # behind by the delete and bumped here
+    revoke_tokens(instance.pk)
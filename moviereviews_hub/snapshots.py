@@ -0,0 +1,233 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from movieclub_backend.db_router import use_replica
+from movieclub_backend.singleflight import cached
+
+from .couples import COUPLE_SLUG_TO_ID_MAP
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always written
+    brotli = None
+
+# =============================================
+# Publishes the public read payloads (couple pages, TV couple pages, club averages)
+# as pre-rendered, pre-compressed JSON files with content-hashed names.
+# WhiteNoise serves them straight from disk (see movieclub_backend/middleware.py),
+# and /api/snapshots/ returns the manifest that points at the current files.
+#
+# The API endpoints for the same payloads read them through cached_payload(), which
+# schedule_publish() (called on every write that changes them) invalidates.
+# =============================================
+
+MANIFEST_NAME = "manifest.json"
+
+# Touched by schedule_publish(), removed once a publish has covered it (see publish_if_dirty)
+DIRTY_MARKER = ".dirty"
+
+
+def _snapshot_payloads():
+    # Imported here since the TV views import from this app's views
+    from .views import couple_reviews_payload, club_average_payload
+    from tvshows_app.views import tv_couple_shows_payload
+
+    yield "club_average", club_average_payload()
+    for slug, couple_id in COUPLE_SLUG_TO_ID_MAP.items():
+        yield f"couple_reviews/{slug}", couple_reviews_payload(couple_id)
+        yield f"tv_couple_shows/{slug}", tv_couple_shows_payload(couple_id)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_snapshot(root, name, body):
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    filename = f"{name.replace('/', '-')}.{digest}.json"
+    path = os.path.join(root, filename)
+
+    if not os.path.exists(path):
+        # Compressed variants go first, WhiteNoise looks for them next to the plain file
+        _write_atomic(f"{path}.gz", gzip.compress(body, compresslevel=9))
+        if brotli is not None:
+            _write_atomic(f"{path}.br", brotli.compress(body))
+        _write_atomic(path, body)
+
+    return filename
+
+
+def read_manifest():
+    path = os.path.join(settings.SNAPSHOT_ROOT, MANIFEST_NAME)
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def publish_snapshots():
+    """Render every snapshot payload, write the files that changed and swap in a new manifest."""
+    root = str(settings.SNAPSHOT_ROOT)
+    os.makedirs(root, exist_ok=True)
+
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    previous = read_manifest() or {}
+    started = time.time()
+
+    files = {}
+    for name, payload in _snapshot_payloads():
+        files[name] = _write_snapshot(root, name, renderer.render(payload))
+
+    manifest = {
+        "version": hashlib.sha256("".join(sorted(files.values())).encode()).hexdigest()[:12],
+        "generated_at": timezone.now().isoformat(),
+        "files": {name: f"{settings.SNAPSHOT_URL}{filename}" for name, filename in files.items()},
+    }
+    _write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(manifest).encode())
+
+    # Keep the previous version around so clients holding the old manifest can still fetch it
+    keep = set(files.values())
+    keep.update(url.rsplit("/", 1)[-1] for url in (previous.get("files") or {}).values())
+    for filename in os.listdir(root):
+        if filename.endswith(".tmp"):
+            continue  # another worker is mid-write
+        base = filename[:-3] if filename.endswith((".gz", ".br")) else filename
+        if base not in (MANIFEST_NAME, DIRTY_MARKER) and base not in keep:
+            try:
+                os.remove(os.path.join(root, filename))
+            except OSError:
+                pass
+
+    # Writes that landed after this publish read the payloads keep the marker for the next one
+    marked_at = _dirty_since()
+    if marked_at is not None and marked_at <= started:
+        try:
+            os.remove(_dirty_path())
+        except OSError:
+            pass
+
+    return manifest
+
+
+# ---------------------------------------------
+# Cached payloads for the API endpoints. Keyed by a generation number that every write bumps,
+# and built once per generation however many requests miss at the same time. Only cached when
+# the cache is shared between workers (REDIS_URL), see singleflight.cached(). Built from the
+# primary: a lagging replica would store the state before the write under the new generation
+# ---------------------------------------------
+PAYLOAD_GENERATION_KEY = "payloads:generation"
+PAYLOAD_CACHE_SECONDS = 24 * 60 * 60
+
+
+def invalidate_payload_cache():
+    try:
+        cache.incr(PAYLOAD_GENERATION_KEY)
+    except ValueError:  # not set (or evicted), start a fresh generation
+        cache.set(PAYLOAD_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def cached_payload(name, build):
+    generation = cache.get_or_set(PAYLOAD_GENERATION_KEY, time.time_ns, timeout=None)
+
+    def build_on_primary():
+        with use_replica(False):
+            return build()
+
+    return cached(f"payloads:{generation}:{name}", build_on_primary, timeout=PAYLOAD_CACHE_SECONDS)
+
+
+# ---------------------------------------------
+# Debounced publishing. The first write starts a timer, every other write that lands before
+# it fires is covered by the same rebuild since the payloads are read when the timer fires.
+#
+# The timer lives in the worker that took the write, so if that worker exits first the publish
+# would be lost. Every write also touches a dirty marker next to the snapshots, which only a
+# finished publish removes: publish_if_dirty() (run from /api/snapshots/) starts an overdue
+# publish in whichever worker sees it, and the publish_snapshots command clears it too
+# ---------------------------------------------
+_publish_lock = threading.Lock()
+_publish_timer = None
+
+
+def _dirty_path():
+    return os.path.join(str(settings.SNAPSHOT_ROOT), DIRTY_MARKER)
+
+
+def _dirty_since():
+    try:
+        return os.path.getmtime(_dirty_path())
+    except OSError:
+        return None
+
+
+def _mark_dirty():
+    os.makedirs(str(settings.SNAPSHOT_ROOT), exist_ok=True)
+    with open(_dirty_path(), "a"):
+        pass
+    os.utime(_dirty_path())
+
+
+def _run_scheduled_publish():
+    global _publish_timer
+    with _publish_lock:
+        _publish_timer = None
+    try:
+        publish_snapshots()
+    finally:
+        connections.close_all()  # this thread is about to exit, don't leave its connection open
+
+
+def _start_publish_timer(delay):
+    global _publish_timer
+    with _publish_lock:
+        if _publish_timer is not None:
+            return
+        _publish_timer = threading.Timer(delay, _run_scheduled_publish)
+        _publish_timer.daemon = True
+        _publish_timer.start()
+
+
+def schedule_publish():
+    invalidate_payload_cache()
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+
+    _mark_dirty()
+    _start_publish_timer(settings.SNAPSHOT_DEBOUNCE_SECONDS)
+
+
+def publish_pending():
+    """
+    Run a scheduled publish now instead of when its timer fires, for processes (management
+    commands) that would exit first. RETURNS the manifest, or None when nothing was scheduled.
+    """
+    global _publish_timer
+    with _publish_lock:
+        timer, _publish_timer = _publish_timer, None
+    if timer is None:
+        return None
+    timer.cancel()
+    return publish_snapshots()
+
+
+def publish_if_dirty():
+    """Publish now if a write has been waiting longer than its debounced publish should take."""
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    marked_at = _dirty_since()
+    if marked_at is not None and time.time() - marked_at > 2 * settings.SNAPSHOT_DEBOUNCE_SECONDS:
+        _start_publish_timer(0)
@@ -0,0 +1,247 @@
+import math
+
+from django.db import connection, transaction
+
+from .couples import COUPLE_SLUG_TO_ID_MAP
+from .models import Movie, Review, ReviewStat
+
+# =============================================
+# Reviewer and couple rating statistics (averages, harshest/kindest, histograms, genre preferences)
+# backed by the ReviewStat summary table.
+#
+# Every review contributes (count=1, rating) to one row per (reviewer or couple) x (all genres
+# plus each of its genres) x rating bucket. Review writes apply the difference between the old
+# and new contribution with one upsert (see signals.py), so the /api/stats/ endpoints read a
+# few rows no matter how many reviews there are. rebuild_review_stats() recomputes everything.
+# =============================================
+
+HISTOGRAM_BUCKETS = 11  # 0-10, a 10 gets its own bucket
+
+# Reviewers/couples need this many ratings to be ranked harshest or kindest
+MIN_RATINGS_TO_RANK = 3
+
+COUPLE_ID_TO_SLUG = {couple_id: slug for slug, couple_id in COUPLE_SLUG_TO_ID_MAP.items()}
+
+
+def rating_bucket(rating):
+    return min(max(int(math.floor(rating)), 0), HISTOGRAM_BUCKETS - 1)
+
+
+def add_contribution(deltas, source, reviewer, couple_id, rating, genres, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one review's contribution to `deltas`,
+    a {(source, kind, name, genre, bucket): [count, rating_sum]} dict.
+    """
+    if rating is None:
+        return deltas
+
+    bucket = rating_bucket(rating)
+    for kind, name in ((ReviewStat.KIND_REVIEWER, reviewer), (ReviewStat.KIND_COUPLE, couple_id)):
+        if not name:
+            continue
+        for genre in {"", *(genres or [])}:
+            entry = deltas.setdefault((source, kind, name, genre, bucket), [0, 0.0])
+            entry[0] += sign
+            entry[1] += sign * rating
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Add the deltas to the summary table in one INSERT ... ON CONFLICT DO UPDATE statement."""
+    # In key order, so concurrent writes lock the rows they share in the same order instead of
+    # deadlocking (the genres come from a set, whose order differs between processes)
+    rows = [
+        (*key, count, rating_sum)
+        for key, (count, rating_sum) in sorted(deltas.items())
+        if count or rating_sum
+    ]
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(ReviewStat._meta.db_table)
+    key_columns = ", ".join(qn(c) for c in ("source", "kind", "name", "genre", "bucket"))
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+
+    sql = (
+        f"INSERT INTO {table} ({key_columns}, {qn('count')}, {qn('rating_sum')}) VALUES {placeholders} "
+        f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+        f"{qn('count')} = {table}.{qn('count')} + EXCLUDED.{qn('count')}, "
+        f"{qn('rating_sum')} = {table}.{qn('rating_sum')} + EXCLUDED.{qn('rating_sum')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+# ---------------------------------------------
+# Where a review's genres come from
+# ---------------------------------------------
+def movie_genres(movie_id):
+    return Movie.objects.filter(pk=movie_id).values_list("genres", flat=True).first() or []
+
+
+def tv_review_genres(show_id, season_id, episode_id):
+    """Genres of the show a TV review (of a show, season or episode) belongs to."""
+    from tvshows_app.models import TvShow, Season, Episode
+
+    if show_id:
+        genres = TvShow.objects.filter(pk=show_id).values_list("genres", flat=True).first()
+    elif season_id:
+        genres = Season.objects.filter(pk=season_id).values_list("show__genres", flat=True).first()
+    elif episode_id:
+        genres = Episode.objects.filter(pk=episode_id).values_list("season_number__show__genres", flat=True).first()
+    else:
+        genres = None
+    return genres or []
+
+
+# Fields read for a TV review's contribution, the three genre paths cover show/season/episode reviews
+TV_REVIEW_STAT_FIELDS = [
+    "reviewer__username", "couple_slug", "rating",
+    "tv_show_type__genres", "tv_season_type__show__genres", "tv_episode_type__season_number__show__genres",
+]
+
+
+def _tv_row_contribution(deltas, row, sign=1):
+    username, couple_id, rating, show_genres, season_genres, episode_genres = row
+    genres = show_genres or season_genres or episode_genres or []
+    return add_contribution(deltas, ReviewStat.SOURCE_TV, username, couple_id, rating, genres, sign)
+
+
+def tv_reviews_contribution(deltas, reviews, sign=1):
+    """Add/remove the contributions of a TvShowRatingsAndReviews queryset."""
+    for row in reviews.values_list(*TV_REVIEW_STAT_FIELDS).iterator():
+        _tv_row_contribution(deltas, row, sign)
+    return deltas
+
+
+# ---------------------------------------------
+# Full rebuild
+# ---------------------------------------------
+def compute_stat_rows():
+    """Every summary row, computed from one streamed query per review table."""
+    from tvshows_app.models import TvShowRatingsAndReviews
+
+    deltas = {}
+    for reviewer, couple_id, rating, genres in (
+        Review.objects
+        .filter(rating__isnull=False)
+        .values_list("reviewer", "couple_id", "rating", "movie__genres")
+        .iterator(chunk_size=5000)
+    ):
+        add_contribution(deltas, ReviewStat.SOURCE_MOVIES, reviewer, couple_id, rating, genres)
+
+    for row in TvShowRatingsAndReviews.objects.values_list(*TV_REVIEW_STAT_FIELDS).iterator(chunk_size=5000):
+        _tv_row_contribution(deltas, row)
+
+    return [
+        dict(source=source, kind=kind, name=name, genre=genre, bucket=bucket, count=count, rating_sum=rating_sum)
+        for (source, kind, name, genre, bucket), (count, rating_sum) in deltas.items()
+    ]
+
+
+def lock_tables(models, mode):
+    """LOCK TABLE ... IN <mode> MODE until the current transaction ends (Postgres only, elsewhere a no-op)."""
+    if connection.vendor != "postgresql":
+        return
+    tables = ", ".join(connection.ops.quote_name(model._meta.db_table) for model in models)
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {tables} IN {mode} MODE")
+
+
+def rebuild_review_stats():
+    # Every review write applies its delta to ReviewStat, so locking it first lets the writes in
+    # flight finish before the recount and makes new ones wait until the new rows are committed
+    with transaction.atomic():
+        lock_tables([ReviewStat], "EXCLUSIVE")
+        rows = compute_stat_rows()
+        ReviewStat.objects.all().delete()
+        ReviewStat.objects.bulk_create([ReviewStat(**row) for row in rows], batch_size=1000)
+    return len(rows)
+
+
+# ---------------------------------------------
+# Reading
+# ---------------------------------------------
+def _summaries(rows):
+    # {(kind, name): {"ratings", "sum", "histogram"}} from (kind, name, bucket, count, rating_sum) rows
+    summaries = {}
+    for kind, name, bucket, count, rating_sum in rows:
+        summary = summaries.setdefault((kind, name), {"ratings": 0, "sum": 0.0, "histogram": [0] * HISTOGRAM_BUCKETS})
+        summary["ratings"] += count
+        summary["sum"] += rating_sum
+        summary["histogram"][bucket] += count
+    return summaries
+
+
+def _average(summary):
+    return round(summary["sum"] / summary["ratings"], 2) if summary["ratings"] else None
+
+
+def _entry(kind, name, summary):
+    entry = {
+        "reviewer" if kind == ReviewStat.KIND_REVIEWER else "couple_id": name,
+        "ratings": summary["ratings"],
+        "average": _average(summary),
+        "histogram": summary["histogram"],
+    }
+    if kind == ReviewStat.KIND_COUPLE:
+        entry["couple_slug"] = COUPLE_ID_TO_SLUG.get(name)
+    return entry
+
+
+def _ranked(entries):
+    ranked = [e for e in entries if e["ratings"] >= MIN_RATINGS_TO_RANK]
+    if not ranked:
+        return None, None
+    by_average = sorted(ranked, key=lambda e: e["average"])
+    return by_average[0], by_average[-1]
+
+
+def stats_overview_payload(source):
+    """Every reviewer and couple with their average and histogram, plus the harshest and kindest."""
+    rows = (
+        ReviewStat.objects
+        .filter(source=source, genre="", count__gt=0)
+        .values_list("kind", "name", "bucket", "count", "rating_sum")
+    )
+    summaries = _summaries(rows)
+
+    payload = {"source": source}
+    for kind, key in ((ReviewStat.KIND_REVIEWER, "reviewers"), (ReviewStat.KIND_COUPLE, "couples")):
+        entries = sorted(
+            (_entry(k, name, summary) for (k, name), summary in summaries.items() if k == kind),
+            key=lambda e: -e["ratings"],
+        )
+        harshest, kindest = _ranked(entries)
+        payload[key] = entries
+        payload[f"harshest_{kind}"] = harshest
+        payload[f"kindest_{kind}"] = kindest
+    return payload
+
+
+def group_stats_payload(source, kind, name):
+    """One reviewer's or couple's average, histogram and per-genre averages, or None if they have no ratings."""
+    rows = list(
+        ReviewStat.objects
+        .filter(source=source, kind=kind, name=name, count__gt=0)
+        .values_list("genre", "bucket", "count", "rating_sum")
+    )
+
+    overall = _summaries((kind, name, bucket, count, rating_sum) for genre, bucket, count, rating_sum in rows if genre == "")
+    if not overall:
+        return None
+
+    by_genre = _summaries(("genre", genre, bucket, count, rating_sum) for genre, bucket, count, rating_sum in rows if genre)
+    genres = sorted(
+        (
+            {"genre": genre, "ratings": summary["ratings"], "average": _average(summary)}
+            for (_, genre), summary in by_genre.items()
+        ),
+        key=lambda g: (-g["average"], -g["ratings"]),
+    )
+
+    payload = _entry(kind, name, overall[(kind, name)])
+    payload["source"] = source
+    payload["genres"] = genres
+    return payload
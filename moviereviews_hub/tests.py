@@ -1,3 +1,440 @@
-from django.test import TestCase
+import io
+import threading
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from movieclub_backend import db_router
+
+from . import analytics, changelog, snapshots, stats
+from .authentication import ClaimsJWTAuthentication
+from .changelog import changes_since, parse_token
+from .imports import import_reviews, ImportFileError
+from .models import ChangeLogEntry, CoupleMovieCard, Movie, Review, ReviewStat, TokenVersion
+from .serializers import CustomTokenObtainPairSerializer
+from .stats import compute_stat_rows
+
+
+def csv_file(*lines):
+    return io.BytesIO("\n".join(lines).encode())
+
+
+# =============================================
+# Spreadsheet import: row error report, upsert on (movie, reviewer), unreadable files
+# =============================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ImportReviewsTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(TMDB_Api_ID = 603, title = "The Matrix", director = ["Lana Wachowski"])
+
+    def test_error_report(self):
+        report = import_reviews(csv_file(
+            "reviewer,rating,tmdb_id,couple_id",
+            "trevor,8,603,",
+            ",7,603,",
+            "taylor,eleven,603,",
+            "marissa,7,999,",
+            "nathan,7,603,NoSuchCouple",
+            "sierra,7,603," + "x" * 21,
+            "benett,7,603,trevortaylor",
+        ), "reviews.csv")
+
+        self.assertEqual((report["rows"], report["created"], report["updated"], report["skipped"]), (7, 2, 0, 5))
+        self.assertEqual([error["row"] for error in report["errors"]], [3, 4, 5, 6, 7])
+        self.assertEqual(report["errors"][0]["error"], "Missing reviewer")
+        self.assertIn("Unknown couple", report["errors"][3]["error"])
+        self.assertIn("too long", report["errors"][4]["error"])
+        self.assertEqual(
+            dict(Review.objects.values_list("reviewer", "couple_id")),
+            {"trevor": "TrevorTaylor", "benett": "TrevorTaylor"},
+        )
+
+    def test_upsert_updates_the_existing_review(self):
+        Review.objects.create(movie = self.movie, reviewer = "trevor", couple_id = "TrevorTaylor", rating = 5)
+
+        report = import_reviews(csv_file(
+            "reviewer,rating,title,director,review",
+            "Trevor,6,The Matrix,Lana Wachowski,first",
+            "trevor,9,the matrix,,second",   # a later row for the same pair wins
+        ), "reviews.csv")
+
+        self.assertEqual((report["created"], report["updated"], report["skipped"]), (0, 1, 0))
+        self.assertEqual(list(Review.objects.values_list("rating", "rating_justification")), [(9.0, "second")])
+
+    def test_stats_and_cards_follow_the_imported_rows(self):
+        self.movie.genres = ["Action"]
+        self.movie.save()
+        other = Movie.objects.create(TMDB_Api_ID = 604, title = "Heat", genres = ["Crime"])
+        Review.objects.create(movie = self.movie, reviewer = "trevor", couple_id = "TrevorTaylor", rating = 5)
+        Review.objects.create(movie = other, reviewer = "mia", couple_id = "MiaLogan", rating = 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_reviews(csv_file(
+                "reviewer,rating,tmdb_id,couple_id",
+                "trevor,9,603,MomDad",   # moves to another couple
+                "sierra,6,603,",
+            ), "reviews.csv")
+
+        stat_rows = {
+            (row["source"], row["kind"], row["name"], row["genre"], row["bucket"]): (row["count"], row["rating_sum"])
+            for row in compute_stat_rows()
+        }
+        self.assertEqual(
+            set(ReviewStat.objects.filter(count__gt=0).values_list("source", "kind", "name", "genre", "bucket", "count", "rating_sum")),
+            {(*key, *value) for key, value in stat_rows.items()},
+        )
+        self.assertFalse(ReviewStat.objects.filter(kind = "couple", name = "TrevorTaylor", count__gt = 0).exists())
+
+        cards = dict(CoupleMovieCard.objects.filter(movie = self.movie).values_list("couple_id", "reviews"))
+        self.assertEqual(cards["MomDad"], {"Trevor": {"rating": 9.0, "review": ""}})
+        self.assertEqual(cards["TrevorTaylor"], {})
+        self.assertEqual(cards["SierraBenett"], {"Sierra": {"rating": 6.0, "review": ""}})
+
+    def test_dry_run_writes_nothing(self):
+        report = import_reviews(csv_file("reviewer,rating,tmdb_id", "trevor,8,603"), "reviews.csv", dry_run=True)
+        self.assertEqual(report["created"], 1)
+        self.assertFalse(Review.objects.exists())
+
+    def test_unreadable_files(self):
+        for content, filename in [
+            ("reviewer,rating,tmdb_id\ntrévor,8,603".encode("latin-1"), "reviews.csv"),
+            (b"not a zip file", "reviews.xlsx"),
+            (b"", "reviews.csv"),
+            (b"name,score\ntrevor,8", "reviews.csv"),
+        ]:
+            with self.subTest(filename=filename, content=content[:12]):
+                with self.assertRaises(ImportFileError):
+                    import_reviews(io.BytesIO(content), filename)
+
+
+# =============================================
+# POST /api/reviews/: one review per reviewer and movie, also when two POSTs race
+# =============================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ReviewCreateTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title = "Heat")
+        self.user = User.objects.create_user("trevor")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self):
+        return self.client.post("/api/reviews/", {"movie": self.movie.id, "rating": 8}, format = "json")
+
+    def test_second_review_is_rejected(self):
+        self.assertEqual(self.post().status_code, 201)
+        response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("movie", response.data)
+
+    def test_concurrent_duplicate_is_a_400(self):
+        # The other POST commits between this one's exists() check and its insert
+        Review.objects.create(movie = self.movie, reviewer = "trevor", couple_id = "TrevorTaylor", rating = 7)
+        exists = QuerySet.exists
+        calls = []
+
+        def exists_before_the_other_commit(queryset):
+            if queryset.model is Review and not calls:
+                calls.append(queryset)
+                return False
+            return exists(queryset)
+
+        with mock.patch.object(QuerySet, "exists", exists_before_the_other_commit):
+            response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("movie", response.data)
+        self.assertEqual(Review.objects.count(), 1)
+
+
+# =============================================
+# ReviewStat deltas applied by the review signals, checked against a full recompute
+# =============================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ReviewStatDeltaTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title = "Heat", genres = ["Crime", "Drama"])
+        self.review = Review.objects.create(movie = self.movie, reviewer = "trevor", couple_id = "TrevorTaylor", rating = 7.5)
+
+    def stat_rows(self):
+        return {
+            (source, kind, name, genre, bucket): (count, rating_sum)
+            for source, kind, name, genre, bucket, count, rating_sum in ReviewStat.objects.filter(count__gt=0).values_list(
+                "source", "kind", "name", "genre", "bucket", "count", "rating_sum"
+            )
+        }
+
+    def recomputed_rows(self):
+        return {
+            (row["source"], row["kind"], row["name"], row["genre"], row["bucket"]): (row["count"], row["rating_sum"])
+            for row in compute_stat_rows() if row["count"]
+        }
+
+    def test_create(self):
+        rows = self.stat_rows()
+        self.assertEqual(len(rows), 6)   # reviewer and couple x all genres, Crime, Drama
+        self.assertEqual(rows[("movies", "reviewer", "trevor", "", 7)], (1, 7.5))
+        self.assertEqual(rows, self.recomputed_rows())
+
+    def test_update_moves_the_rating(self):
+        Review.objects.create(movie = self.movie, reviewer = "taylor", couple_id = "TrevorTaylor", rating = 7)
+        self.review.rating = 9
+        self.review.save()
+
+        rows = self.stat_rows()
+        self.assertEqual(rows[("movies", "couple", "TrevorTaylor", "Drama", 7)], (1, 7.0))
+        self.assertEqual(rows[("movies", "couple", "TrevorTaylor", "Drama", 9)], (1, 9.0))
+        self.assertNotIn(("movies", "reviewer", "trevor", "", 7), rows)
+        self.assertEqual(rows, self.recomputed_rows())
+
+    def test_update_to_no_rating(self):
+        self.review.rating = None
+        self.review.save()
+        self.assertEqual(self.stat_rows(), {})
+
+    def test_genre_change(self):
+        self.movie.genres = ["Drama", "Thriller"]
+        self.movie.save()
+
+        rows = self.stat_rows()
+        self.assertIn(("movies", "reviewer", "trevor", "Thriller", 7), rows)
+        self.assertNotIn(("movies", "reviewer", "trevor", "Crime", 7), rows)
+        self.assertEqual(rows, self.recomputed_rows())
+
+    def test_delete(self):
+        self.review.delete()
+        self.assertEqual(self.stat_rows(), {})
+
+    def test_movie_delete_cascades(self):
+        self.movie.delete()
+        self.assertEqual(self.stat_rows(), {})
+
+    def test_rows_are_upserted_in_key_order(self):
+        deltas = {}
+        for genre in ("Western", "Action", "", "Drama"):
+            stats.add_contribution(deltas, "movies", "trevor", "TrevorTaylor", 6, [genre])
+        with mock.patch.object(stats, "connection") as fake_connection:
+            fake_connection.ops.quote_name = str
+            stats.apply_deltas(dict(reversed(deltas.items())))
+
+        cursor = fake_connection.cursor.return_value.__enter__.return_value
+        params = cursor.execute.call_args.args[1]
+        keys = [tuple(params[i:i + 5]) for i in range(0, len(params), 7)]
+        self.assertEqual(sorted(keys), sorted(deltas))
+        self.assertEqual(keys, sorted(keys))
+
+
+# =============================================
+# Claims-only JWT authentication: tokens stop working once revoked, also when the user is deleted
+# =============================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("trevor", password = "secret")
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def authenticate(self):
+        return ClaimsJWTAuthentication().get_user(self.token)
+
+    def test_password_change_revokes(self):
+        self.assertEqual(self.authenticate().username, "trevor")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("other")
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.authenticate().username, "trevor")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertEqual(TokenVersion.objects.get(user_id = self.token["user_id"]).version, 1)
+
+
+# =============================================
+# /api/sync/ tokens: parsing, latest entry per row, paging, entries committed out of order
+# =============================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ChangelogTokenTests(TestCase):
+    def log(self, model, object_id, deleted=False):
+        return ChangeLogEntry.objects.create(model = model, object_id = object_id, deleted = deleted).pk
+
+    def test_parse_token(self):
+        self.assertEqual(parse_token(None), 0)
+        self.assertEqual(parse_token(""), 0)
+        self.assertEqual(parse_token("42"), 42)
+        for value in ("-1", "abc", "1.5"):
+            with self.assertRaises(ValueError):
+                parse_token(value)
+
+    def test_latest_entry_per_row_wins(self):
+        movie = Movie.objects.create(title = "Heat")
+        self.log("movies", movie.pk)
+        self.log("movies", 999)
+        last = self.log("movies", 999, deleted=True)
+
+        result = changes_since(0)
+        self.assertEqual(result["token"], str(last))
+        self.assertFalse(result["more"])
+        self.assertEqual([row["id"] for row in result["changes"]["movies"]], [movie.pk])
+        self.assertEqual(result["deleted"]["movies"], [999])
+
+        self.assertEqual(changes_since(last)["token"], str(last))   # nothing new
+
+    def test_paging(self):
+        ids = [self.log("reviews", n, deleted=True) for n in range(1, 6)]
+
+        first = changes_since(0, limit=2)
+        self.assertTrue(first["more"])
+        self.assertEqual((first["token"], first["deleted"]["reviews"]), (str(ids[1]), [1, 2]))
+
+        second = changes_since(parse_token(first["token"]), limit=3)
+        self.assertFalse(second["more"])
+        self.assertEqual((second["token"], second["deleted"]["reviews"]), (str(ids[4]), [3, 4, 5]))
+
+    def test_entries_are_written_under_the_table_lock(self):
+        with mock.patch.object(changelog, "lock_tables") as lock, self.captureOnCommitCallbacks(execute=True):
+            changelog.record_changes(Movie, [7], deleted=True)
+        lock.assert_called_once_with([ChangeLogEntry], "SHARE ROW EXCLUSIVE")
+        self.assertEqual(changes_since(0)["deleted"]["movies"], [7])
+
+    def test_endpoint_rejects_bad_tokens(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/sync/?since=abc").status_code, 400)
+        self.assertEqual(client.get("/api/sync/").status_code, 200)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs two concurrent transactions")
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ChangelogCommitOrderTests(TransactionTestCase):
+    def test_later_entry_waits_for_an_earlier_one_in_flight(self):
+        first_written, release = threading.Event(), threading.Event()
+
+        def first():
+            with transaction.atomic():
+                changelog._write_entries("episodes", [1], True)
+                first_written.set()
+                release.wait(10)
+            connection.close()
+
+        def second():
+            changelog._write_entries("episodes", [2], True)
+            connection.close()
+
+        slow = threading.Thread(target=first)
+        slow.start()
+        first_written.wait(10)
+        fast = threading.Thread(target=second)
+        fast.start()
+        fast.join(0.5)
+
+        # Entry 2 can't commit ahead of entry 1, so no token skips past it
+        self.assertTrue(fast.is_alive())
+        self.assertEqual(changes_since(0)["token"], "0")
+
+        release.set()
+        slow.join()
+        fast.join()
+        self.assertEqual(changes_since(0)["deleted"]["episodes"], [1, 2])
+
+
+# =============================================
+# Read replica routing: the router, the primary pin after writes, the middleware, and cache
+# fills that must read the primary. Needs DATABASE_REPLICA_URL, whose test database mirrors default
+# =============================================
+@skipUnless(db_router.replica_configured(), "no read replica configured")
+@override_settings(SNAPSHOTS_ENABLED = False)
+class ReplicaRoutingTests(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()   # pins from other tests
+        self.factory = RequestFactory()
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def read_alias(self):
+        return self.router.db_for_read(Movie)
+
+    def through_middleware(self, request, view=None, status=200):
+        seen = {}
+
+        def view_func(request):
+            seen["alias"] = self.read_alias()
+            return HttpResponse(status = status)
+
+        for attribute, value in (view or {}).items():
+            setattr(view_func, attribute, value)
+
+        middleware = db_router.ReplicaRoutingMiddleware(lambda request: middleware.process_view(request, view_func, (), {}) or view_func(request))
+        return middleware(request), seen["alias"]
+
+    def test_router(self):
+        self.assertEqual(self.read_alias(), "default")
+        with db_router.use_replica():
+            self.assertEqual(self.read_alias(), db_router.REPLICA_ALIAS)
+            self.assertEqual(Movie.objects.all().db, db_router.REPLICA_ALIAS)
+            self.assertEqual(list(Movie.objects.all()), [])   # queries the mirror
+            self.assertEqual(self.router.db_for_write(Movie), "default")
+
+            # Related lookups of an object loaded from the primary stay there
+            movie = Movie(title = "Heat")
+            movie._state.db = "default"
+            self.assertEqual(self.router.db_for_read(Review, instance = movie), "default")
+            with db_router.use_replica(False):
+                self.assertEqual(self.read_alias(), "default")
+        self.assertTrue(self.router.allow_migrate("default", "moviereviews_hub"))
+        self.assertFalse(self.router.allow_migrate(db_router.REPLICA_ALIAS, "moviereviews_hub"))
+
+    def test_pin_by_cookie_and_by_cache(self):
+        request = self.factory.post("/api/reviews/", HTTP_AUTHORIZATION = "Bearer abc")
+        response = HttpResponse()
+        db_router.pin_to_primary(request, response)
+        cookie = response.cookies[db_router.REPLICA_PIN_COOKIE]
+
+        by_cookie = self.factory.get("/api/movies/")
+        by_cookie.COOKIES[db_router.REPLICA_PIN_COOKIE] = cookie.value
+        self.assertTrue(db_router.is_pinned_to_primary(by_cookie))
+
+        # No cookie, but the same client according to the shared cache
+        self.assertTrue(db_router.is_pinned_to_primary(self.factory.get("/api/movies/", HTTP_AUTHORIZATION = "Bearer abc")))
+        self.assertFalse(db_router.is_pinned_to_primary(self.factory.get("/api/movies/", HTTP_AUTHORIZATION = "Bearer xyz")))
+
+        tampered = self.factory.get("/api/movies/")
+        tampered.COOKIES[db_router.REPLICA_PIN_COOKIE] = cookie.value + "0"
+        self.assertFalse(db_router.is_pinned_to_primary(tampered))
+
+    def test_middleware(self):
+        response, alias = self.through_middleware(self.factory.get("/api/movies/"))
+        self.assertEqual(alias, db_router.REPLICA_ALIAS)
+        self.assertNotIn(db_router.REPLICA_PIN_COOKIE, response.cookies)
+
+        # A write reads the primary and pins the client
+        response, alias = self.through_middleware(self.factory.post("/api/reviews/"), status = 201)
+        self.assertEqual(alias, "default")
+        pinned = self.factory.get("/api/movies/")
+        pinned.COOKIES[db_router.REPLICA_PIN_COOKIE] = response.cookies[db_router.REPLICA_PIN_COOKIE].value
+        self.assertEqual(self.through_middleware(pinned)[1], "default")
+        self.assertEqual(self.through_middleware(pinned, {"use_read_replica": True})[1], db_router.REPLICA_ALIAS)
+
+        # Failed and read-only writes don't pin
+        response, _ = self.through_middleware(self.factory.post("/api/reviews/"), status = 400)
+        self.assertNotIn(db_router.REPLICA_PIN_COOKIE, response.cookies)
+        response, _ = self.through_middleware(self.factory.post("/api/batch/"), {"read_only": True})
+        self.assertNotIn(db_router.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_cache_fills_read_the_primary(self):
+        seen = []
+        with db_router.use_replica():
+            snapshots.cached_payload("test", lambda: seen.append(self.read_alias()) or {})
+            with mock.patch.object(analytics, "agreement_payload", lambda include_tv: seen.append(self.read_alias()) or {}):
+                analytics.cached_agreement_payload()
+        self.assertEqual(seen, ["default", "default"])
@@ -0,0 +1,145 @@
+import asyncio
+import httpx
+import requests
+from datetime import timedelta
+
+from django.conf import settings
+
+# =============================================
+# Helpers for talking to TMDB. Shared by the import endpoint and the
+# management commands so the movie fields are always parsed the same way
+# =============================================
+
+TMDB_BASE = settings.TMDB_API_BASE
+TMDB_POSTER_BASE = "https://image.tmdb.org/t/p/w500"
+
+# TMDB only accepts a window of up to 14 days on the /movie/changes endpoint
+TMDB_CHANGES_MAX_DAYS = 14
+
+
+def movie_fields_from_tmdb(details, credits, fallback_title=""):
+    """
+    Turn the TMDB /movie/{id} and /movie/{id}/credits payloads into the
+    field values stored on our Movie model.
+    """
+    title = details.get("title") or details.get("original_title") or fallback_title
+
+    # Summary / overview
+    summary = details.get("overview") or ""
+
+    # Director(s)
+    directors = []
+    for p in (credits.get("crew") or []):
+        if p.get("job") == "Director" and p.get("name"):
+            directors.append(p["name"])
+    directors = list(dict.fromkeys(directors))  # unique, stable order
+
+    # Top cast (first 10)
+    actors = [c.get("name") for c in (credits.get("cast") or [])[:10] if c.get("name")]
+
+    # Genres
+    genres = [g.get("name") for g in (details.get("genres") or []) if g.get("name")]
+
+    # Release year (TMDB uses release_date: "YYYY-MM-DD")
+    release_date = details.get("release_date") or ""
+    release_yr = int(release_date[:4]) if len(release_date) >= 4 and release_date[:4].isdigit() else None
+
+    runtime = details.get("runtime")
+
+    # Poster
+    poster_path = details.get("poster_path") or ""
+    poster_url = f"{TMDB_POSTER_BASE}{poster_path}" if poster_path else ""
+
+    return {
+        "title": title,
+        "summary": summary,
+        "director": directors,
+        "actors": actors,
+        "genres": genres,
+        "release_yr": release_yr,
+        "runtime": runtime,
+        "poster_url": poster_url,
+    }
+
+
+def fetch_changed_movie_ids(api_key, since, until, timeout=20):
+    """
+    Return the set of TMDB movie ids that changed between `since` and `until` (datetimes).
+    The /movie/changes endpoint is paged and limited to 14 days per call, so longer
+    windows are split into consecutive chunks.
+    """
+    changed_ids = set()
+
+    start = since.date()
+    end = until.date()
+
+    while start <= end:
+        chunk_end = min(start + timedelta(days = TMDB_CHANGES_MAX_DAYS - 1), end)
+
+        page = 1
+        total_pages = 1
+        while page <= total_pages:
+            res = requests.get(
+                f"{TMDB_BASE}/movie/changes",
+                params={
+                    "api_key": api_key,
+                    "start_date": start.isoformat(),
+                    "end_date": chunk_end.isoformat(),
+                    "page": page,
+                },
+                timeout=timeout,
+            )
+            res.raise_for_status()
+            data = res.json()
+
+            for item in (data.get("results") or []):
+                if item.get("id"):
+                    changed_ids.add(int(item["id"]))
+
+            total_pages = data.get("total_pages") or 1
+            page += 1
+
+        start = chunk_end + timedelta(days = 1)
+
+    return changed_ids
+
+
+async def afetch_movie(client, tmdb_id, api_key):
+    """
+    Fetch /movie/{id} and /movie/{id}/credits concurrently with an httpx.AsyncClient.
+    Details are required (errors are raised), credits are optional and come back as {} on failure.
+    """
+    params = {"api_key": api_key, "language": "en-US"}
+    details_res, credits_res = await asyncio.gather(
+        client.get(f"{TMDB_BASE}/movie/{tmdb_id}", params=params),
+        client.get(f"{TMDB_BASE}/movie/{tmdb_id}/credits", params=params),
+        return_exceptions=True,
+    )
+
+    if isinstance(details_res, Exception):
+        raise details_res
+    details_res.raise_for_status()
+    details = details_res.json()
+
+    credits = {}
+    if not isinstance(credits_res, Exception) and credits_res.is_success:
+        credits = credits_res.json()
+
+    return details, credits
+
+
+async def afetch_movies(api_key, tmdb_ids, concurrency=8):
+    """
+    Fetch many movies concurrently, at most `concurrency` at a time.
+    RETURNS {tmdb_id: (details, credits)}, with the exception instead for movies that failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
+        async def fetch(tmdb_id):
+            async with semaphore:
+                return await afetch_movie(client, tmdb_id, api_key)
+
+        results = await asyncio.gather(*(fetch(tmdb_id) for tmdb_id in tmdb_ids), return_exceptions=True)
+
+    return dict(zip(tmdb_ids, results))
@@ -1,21 +1,38 @@
 # from django.shortcuts import render
-import os
-import requests
 
+import tempfile
+
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.functional import SimpleLazyObject
 from django.utils.text import slugify
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from django.db.models import Avg, Count
 
-from .models import Movie, Review
+from .models import Movie, Review, CoupleMovieCard, ReviewStat
+from .couples import COUPLE_SLUG_TO_ID_MAP, couple_id_for_username
 from .serializers import MovieSerializer, ReviewSerializer, CustomTokenObtainPairSerializer
 from .permissions import IsReviewOwnerOrReadOnly
+from .snapshots import read_manifest, cached_payload, publish_if_dirty
+from .analytics import cached_agreement_payload
+from .recommendations import recommend_for_couple
+from .stats import stats_overview_payload, group_stats_payload
+from .exports import review_rows, csv_chunks, write_xlsx
+from .imports import import_reviews, ImportFileError
+from .changelog import changes_since, parse_token
+from .live import publish_review_event, SOURCE_MOVIES
 from rest_framework_simplejwt.views import TokenObtainPairView
+from movieclub_backend.async_api import streaming_content
+from movieclub_backend.fieldsets import FieldSelectionViewMixin
+from movieclub_backend.throttling import AnonHeavyReadRateThrottle, ImportRateThrottle, ReviewWriteRateThrottle
 
 
 # ===================================================
@@ -24,7 +41,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 # ====================================================
 
 # Creates REST API for movies (POST, DELETE, UPDATE, etc.)
-class MovieViewSet(viewsets.ModelViewSet):
+class MovieViewSet(FieldSelectionViewMixin, viewsets.ModelViewSet):
     queryset = Movie.objects.all()          # Get all movies from database
     serializer_class = MovieSerializer      # Use movie serializer to convert the data
     lookup_field = 'slug'                  # Use url/<slugified title> rather than url/<id>
@@ -45,105 +62,15 @@ class MovieViewSet(viewsets.ModelViewSet):
 
         return response
 
-    # POST /api/movies/import_from_tmdb/
-    @action(detail=False, methods=["post"], url_path="import_from_tmdb", permission_classes=[IsAuthenticated])
-    def import_from_tmdb(self, request):
-        tmdb_id = request.data.get("tmdb_id")
-        if not tmdb_id:
-            return Response({"detail": "tmdb_id required"}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            tmdb_id = int(tmdb_id)
-        except (TypeError, ValueError):
-            return Response({"detail": "tmdb_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # If already imported, return it
-        existing = Movie.objects.filter(TMDB_Api_ID=tmdb_id).first()
-        if existing:
-            return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
-
-        TMDB_KEY = os.environ.get("TMDB_API_KEY")
-        if not TMDB_KEY:
-            return Response({"detail": "TMDB_API_KEY not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # ---- Fetch TMDB movie details ----
-        try:
-            details_res = requests.get(
-                f"https://api.themoviedb.org/3/movie/{tmdb_id}",
-                params={"api_key": TMDB_KEY, "language": "en-US"},
-                timeout=15,
-            )
-            details_res.raise_for_status()
-            details = details_res.json()
-        except Exception as e:
-            return Response({"detail": f"TMDB details failed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
-
-        # ---- Fetch TMDB credits ----
-        credits = {}
-        try:
-            credits_res = requests.get(
-                f"https://api.themoviedb.org/3/movie/{tmdb_id}/credits",
-                params={"api_key": TMDB_KEY, "language": "en-US"},
-                timeout=15,
-            )
-            credits_res.raise_for_status()
-            credits = credits_res.json()
-        except Exception:
-            credits = {}  # not fatal
-
-        title = details.get("title") or details.get("original_title") or f"Movie {tmdb_id}"
-
-        # Director(s)
-        directors = []
-        for p in (credits.get("crew") or []):
-            if p.get("job") == "Director" and p.get("name"):
-                directors.append(p["name"])
-        # keep unique + stable ordering
-        directors = list(dict.fromkeys(directors))
-
-        # Top cast (first 10)
-        actors = [c.get("name") for c in (credits.get("cast") or [])[:10] if c.get("name")]
-
-        # Genres
-        genres = [g.get("name") for g in (details.get("genres") or []) if g.get("name")]
-
-        summary = details.get("overview") or ""
-
-
-        # Release year (TMDB uses release_date: "YYYY-MM-DD")
-        release_date = details.get("release_date") or ""
-        release_yr = None
-        if len(release_date) >= 4 and release_date[:4].isdigit():
-            release_yr = int(release_date[:4])
-
-        runtime = details.get("runtime")
-
-        # Poster
-        poster_path = details.get("poster_path") or ""
-        poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else ""
-
-        movie = Movie.objects.create(
-            TMDB_Api_ID=tmdb_id,
-            title=title,
-            director=directors,
-            actors=actors,
-            genres=genres,
-            summary = summary,
-            release_yr=release_yr,
-            runtime=runtime,
-            poster_url=poster_url,
-            # NOTE: you already have robust slug generation in Movie.save(),
-            # so don’t force slug here unless you want tmdb_id baked in.
-        )
+    # POST /api/movies/import_from_tmdb/ is served by async_views.import_from_tmdb (see urls.py)
 
-        return Response(self.get_serializer(movie).data, status=status.HTTP_201_CREATED)
 
-
-
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(FieldSelectionViewMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()          # Get all reviews, visible to everyone
     serializer_class = ReviewSerializer      # Use review serializer to covert data
     permission_classes = [IsAuthenticatedOrReadOnly, IsReviewOwnerOrReadOnly]
+    throttle_classes = [ReviewWriteRateThrottle]   # POST/PUT/PATCH/DELETE only
+    selection_select_related = {"movie": "movie"}   # join the movie only for ?expand=movie
 
     # when a user is submitting a review, automatically attach the logged in user to their review field
     def perform_create(self, serializer):
@@ -153,86 +80,90 @@ class ReviewViewSet(viewsets.ModelViewSet):
         if isinstance(user, SimpleLazyObject):
             user = user._wrapped
 
-        user_to_couple = {
-            "trevor" : "TrevorTaylor",
-            "taylor" : "TrevorTaylor",
-            "marissa": "MarissaNathan",
-            "nathan" : "MarissaNathan",
-            "sierra" : "SierraBenett",
-            "benett" : "SierraBenett",
-            "rob"    : "MomDad",
-            "terry"  : "MomDad",
-            "mia"    : "MiaLogan",
-            "logan"  : "MiaLogan",
-            "annie"  : "AnnieFelix",
-            "felix"  : "AnnieFelix"
-        }
+        couple_id = couple_id_for_username(username)
 
-        couple_id = user_to_couple.get(username, "uncategorized")
+        # One review per person per movie (the import upserts on the same pair). The check is
+        # only a friendly early answer: a concurrent POST of the same review can still get past
+        # it, then unique_review_per_movie_reviewer rejects the insert and gets the same answer
+        already_reviewed = Review.objects.filter(movie=serializer.validated_data["movie"], reviewer=username)
+        if already_reviewed.exists():
+            raise ValidationError({"movie": "You have already reviewed this movie."})
 
-        serializer.save(
-            user=user,
-            reviewer=username,
-            couple_id=couple_id
-        )
+        try:
+            with transaction.atomic():
+                serializer.save(
+                    user_id=user.id,   # request.user may be a TokenUser (see authentication.py), not a User row
+                    reviewer=username,
+                    couple_id=couple_id
+                )
+        except IntegrityError:
+            if already_reviewed.exists():
+                raise ValidationError({"movie": "You have already reviewed this movie."})
+            raise
+        publish_review_event("created", SOURCE_MOVIES, couple_id, serializer.data)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        publish_review_event("updated", SOURCE_MOVIES, serializer.instance.couple_id, serializer.data)
+
+    def perform_destroy(self, instance):
+        review_id, couple_id = instance.id, instance.couple_id
+        super().perform_destroy(instance)
+        publish_review_event("deleted", SOURCE_MOVIES, couple_id, {"id": review_id})
 
 
 # ========================================
 # Function based views (custom logic for the different couples pages)
 # ========================================
 
-# Map each slug to a couple ID that is used in the database
-COUPLE_SLUG_TO_ID_MAP = {
-    "tt"     : "TrevorTaylor",
-    "mn"     : "MarissaNathan",
-    "sb"     : "SierraBenett",
-    "mom_dad": "MomDad",
-    "ml"     : "MiaLogan",
-    "af"     : "AnnieFelix"
-}
+# Build the couple page payload (every movie with this couple's reviews)
+def couple_reviews_payload(couple_id):
+    # Every (couple, movie) pair is kept pre-built in CoupleMovieCard, so this is one indexed range scan
+    cards = (
+        CoupleMovieCard.objects
+        .filter(couple_id=couple_id)
+        .order_by("movie_id")
+        .values(
+            "movie_id", "title", "director", "actors", "genres", "reviews",
+            "summary", "release_yr", "runtime", "poster_url",
+        )
+    )
+
+    response_data = [
+        {
+            "title": card["title"],
+            "director": card["director"],
+            "actors": card["actors"],
+            "genres": card["genres"],
+            "reviews": card["reviews"],
+            "movie_id": card["movie_id"],
+            "summary" : card["summary"],
+            "release_yr" : card["release_yr"],
+            "runtime"    : card["runtime"],
+            "poster_url" : card["poster_url"]
+        }
+        for card in cards
+    ]
+
+    return {"results": response_data}
+
 
 @api_view(['GET'])
+@throttle_classes([AnonHeavyReadRateThrottle])
 def couple_specific_reviews(request, couple_slug):
     couple_id = COUPLE_SLUG_TO_ID_MAP.get(couple_slug.lower())
     if not couple_id:
         return Response({"error": "Invalid couple slug"}, status=400)
 
-    movies_in_database = Movie.objects.all()
-    response_data = []
-
-    for movie in movies_in_database:
-        reviews = Review.objects.filter(movie=movie, couple_id=couple_id)
-
-        reviewer_reviews = {}
-        for review in reviews:
-            normalized_reviewer_name = review.reviewer.strip().capitalize()
-            reviewer_reviews[normalized_reviewer_name] = {
-                "rating": review.rating,
-                "review": review.rating_justification
-            }
-
-        response_data.append({
-            "title": movie.title,
-            "director": movie.director,
-            "actors": movie.actors,
-            "genres": movie.genres,
-            "reviews": reviewer_reviews,
-            "movie_id": movie.id,
-            "summary" : movie.summary,
-            "release_yr" : movie.release_yr,
-            "runtime"    : movie.runtime,
-            "poster_url" : movie.poster_url
-        })
-
-    return Response({"results": response_data})
+    return Response(cached_payload(f"couple_reviews/{couple_id}", lambda: couple_reviews_payload(couple_id)))
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-@api_view(["GET"])
-def club_average_ratings(_request):
+# Build the club average payload (every reviewed movie with its average rating)
+def club_average_payload():
     movie_query_set = (
         Review.objects.values(
             "movie__id",
@@ -263,4 +194,204 @@ def club_average_ratings(_request):
             "poster_url" : movie.get("movie__poster_url")
         })
 
-    return Response({"results": results})
+    return {"results": results}
+
+
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def club_average_ratings(_request):
+    return Response(cached_payload("club_average", club_average_payload))
+
+
+# Points clients at the current pre-rendered JSON snapshots (see snapshots.py)
+@api_view(["GET"])
+def snapshot_manifest(_request):
+    publish_if_dirty()   # picks up a publish lost with the worker that scheduled it
+    manifest = read_manifest()
+    if manifest is None:
+        return Response({"detail": "No snapshots published yet"}, status=status.HTTP_404_NOT_FOUND)
+
+    response = Response(manifest)
+    response["Cache-Control"] = "public, max-age=10"
+    return response
+
+
+# Pairwise agreement (correlation, mean absolute difference, overlap) between every reviewer and
+# every couple, see analytics.py. ?include=tv adds the TV show/season/episode ratings
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def agreement_analytics(request):
+    include_tv = request.query_params.get("include") == "tv"
+    return Response(cached_agreement_payload(include_tv))
+
+
+# Top-N movies the couple hasn't reviewed yet, with the rating the recommender predicts they'd give
+# (see recommendations.py). ?n= sets how many, up to 100
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def couple_recommendations(request, couple_slug):
+    couple_id = COUPLE_SLUG_TO_ID_MAP.get(couple_slug.lower())
+    if not couple_id:
+        return Response({"error": "Invalid couple slug"}, status=400)
+
+    try:
+        n = min(max(int(request.query_params.get("n", 20)), 1), 100)
+    except ValueError:
+        return Response({"error": "n must be a number"}, status=400)
+
+    recommender, predictions = recommend_for_couple(couple_id, n)
+    if recommender is None:
+        return Response(
+            {"detail": "No recommender has been trained yet (manage.py train_recommender)"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    movies = Movie.objects.in_bulk(
+        [movie_id for movie_id, _ in predictions]
+    )
+    results = [
+        {
+            "movie_id": movie_id,
+            "title": movies[movie_id].title,
+            "slug": movies[movie_id].slug,
+            "genres": movies[movie_id].genres,
+            "poster_url": movies[movie_id].poster_url,
+            "predicted_rating": round(score, 2),
+        }
+        for movie_id, score in predictions
+        if movie_id in movies  # deleted since the model was trained
+    ]
+
+    return Response({
+        "couple_id": couple_id,
+        "model": {"id": recommender.model_id, "trained_at": recommender.trained_at},
+        "results": results,
+    })
+
+
+# ========================================
+# Reviewer / couple statistics (see stats.py). ?source=tv for the TV reviews, movies by default
+# ========================================
+STATS_SOURCES = {ReviewStat.SOURCE_MOVIES, ReviewStat.SOURCE_TV}
+
+
+def _stats_source(request):
+    source = request.query_params.get("source", ReviewStat.SOURCE_MOVIES)
+    return source if source in STATS_SOURCES else None
+
+
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def stats_overview(request):
+    source = _stats_source(request)
+    if source is None:
+        return Response({"error": "source must be 'movies' or 'tv'"}, status=400)
+    return Response(stats_overview_payload(source))
+
+
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def reviewer_stats(request, reviewer):
+    source = _stats_source(request)
+    if source is None:
+        return Response({"error": "source must be 'movies' or 'tv'"}, status=400)
+
+    payload = group_stats_payload(source, ReviewStat.KIND_REVIEWER, reviewer)
+    if payload is None:
+        return Response({"detail": "No ratings from this reviewer"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(payload)
+
+
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def couple_stats(request, couple_slug):
+    couple_id = COUPLE_SLUG_TO_ID_MAP.get(couple_slug.lower())
+    if not couple_id:
+        return Response({"error": "Invalid couple slug"}, status=400)
+
+    source = _stats_source(request)
+    if source is None:
+        return Response({"error": "source must be 'movies' or 'tv'"}, status=400)
+
+    payload = group_stats_payload(source, ReviewStat.KIND_COUPLE, couple_id)
+    if payload is None:
+        return Response({"detail": "No ratings from this couple"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(payload)
+
+
+# ========================================
+# Full review history export (movies + TV), admin only. See exports.py
+# ========================================
+def _export_filename(extension):
+    return f"movieclub-reviews-{timezone.localdate():%Y%m%d}.{extension}"
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_reviews_csv(request):
+    response = StreamingHttpResponse(
+        streaming_content(request, csv_chunks(review_rows())),
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{_export_filename("csv")}"'
+    return response
+
+
+def _file_chunks(f, size=64 * 1024):
+    try:
+        while chunk := f.read(size):
+            yield chunk
+    finally:
+        f.close()
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_reviews_xlsx(request):
+    # An XLSX file is a zip, so it is built in a temporary file first and then streamed from disk
+    f = tempfile.TemporaryFile()
+    write_xlsx(review_rows(), f)
+    size = f.tell()
+    f.seek(0)
+
+    response = StreamingHttpResponse(
+        streaming_content(request, _file_chunks(f)),
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{_export_filename("xlsx")}"'
+    response["Content-Length"] = str(size)
+    return response
+
+
+# Bulk import of historical reviews from an uploaded XLSX/CSV file (admin only), see imports.py.
+# Send the file as multipart "file", add dry_run=1 to only validate it
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+@throttle_classes([ImportRateThrottle])
+def import_reviews_upload(request):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "Upload the spreadsheet as 'file'"}, status=400)
+
+    dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes")
+    try:
+        report = import_reviews(upload.file, upload.name, dry_run=dry_run)
+    except ImportFileError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response(report)
+
+
+# ========================================
+# Delta sync (see changelog.py). GET /api/sync/?since=<token> returns the rows changed since
+# the token plus tombstones for deleted rows; no token starts from the beginning
+# ========================================
+@api_view(["GET"])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def sync_changes(request):
+    try:
+        token = parse_token(request.query_params.get("since"))
+    except ValueError:
+        return Response({"error": "since must be a token returned by this endpoint"}, status=400)
+    return Response(changes_since(token))
@@ -1,6 +1,86 @@
-from django.contrib import admin
-from .models import TvShow, TvShowRatingsAndReviews
+import asyncio
 
-admin.site.register(TvShow)
-admin.site.register(TvShowRatingsAndReviews)
+from django.contrib import admin, messages
 
+from movieclub_backend.admin_filters import couple_list_filter
+from movieclub_backend.pagination import EstimatedCountPaginator
+from .models import TvShow, Season, Episode, TvShowRatingsAndReviews
+from .tvmaze import afetch_show_trees, sync_show_tree
+
+#=======================================================
+# Admin pages, built for big tables the same way as moviereviews_hub/admin.py
+#=======================================================
+
+# Shows refreshed from TVMaze per admin action, the request waits for all of them
+MAX_ADMIN_REFRESH = 50
+
+
+@admin.action(description="Refresh selected shows (seasons and episodes) from TVMaze")
+def refresh_from_tvmaze(modeladmin, request, queryset):
+    shows = list(queryset.order_by("id")[:MAX_ADMIN_REFRESH])
+    results = asyncio.run(afetch_show_trees([show.TvMazeAPIid for show in shows]))
+
+    failed = 0
+    totals = {}
+    for show in shows:
+        result = results[show.TvMazeAPIid]
+        if isinstance(result, Exception):
+            failed += 1
+            continue
+
+        _, stats = sync_show_tree(show.TvMazeAPIid, *result, show=show)
+        for name, value in stats.items():
+            totals[name] = totals.get(name, 0) + value
+
+    summary = ", ".join(f"{name.replace('_', ' ')}={value}" for name, value in totals.items())
+    modeladmin.message_user(
+        request,
+        f"Refreshed {len(shows) - failed} shows from TVMaze ({summary or 'no changes'}), {failed} failed."
+        + (f" Only the first {MAX_ADMIN_REFRESH} were refreshed." if queryset.count() > MAX_ADMIN_REFRESH else ""),
+        messages.WARNING if failed else messages.SUCCESS,
+    )
+
+
+@admin.register(TvShow)
+class TvShowAdmin(admin.ModelAdmin):
+    list_display = ("title", "TvMazeAPIid", "status", "premiered")
+    list_filter = ("status",)
+    search_fields = ("title",)
+    ordering = ("title",)
+    actions = [refresh_from_tvmaze]
+
+
+@admin.register(Season)
+class SeasonAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "season_release_year", "season_episode_cnt")
+    list_select_related = ("show",)          # __str__ shows the show title
+    search_fields = ("show__title",)
+    autocomplete_fields = ("show",)
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Episode)
+class EpisodeAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "episode_title", "air_date")
+    list_select_related = ("season_number__show",)   # __str__ shows the show title and season
+    search_fields = ("episode_title", "^season_number__show__title")
+    autocomplete_fields = ("season_number",)
+    ordering = ("-id",)                      # the model's episode_number ordering would sort the whole table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(TvShowRatingsAndReviews)
+class TvShowRatingsAndReviewsAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "target_type", "couple_slug", "rating")
+    list_select_related = (
+        "reviewer", "tv_show_type", "tv_season_type__show", "tv_episode_type__season_number__show",
+    )
+    list_filter = ("target_type", couple_list_filter("couple_slug"))
+    search_fields = ("=reviewer__username",)
+    autocomplete_fields = ("reviewer", "tv_show_type", "tv_season_type", "tv_episode_type")
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from movieclub_backend.async_api import ImportFailed, authenticated_request, json_response, upstream_client
+from movieclub_backend.singleflight import asingle_flight
+from movieclub_backend.throttling import ImportRateThrottle
+
+from .models import TvShow
+from .serializers import TvShowSerializer
+from .tvmaze import TvMazeError, afetch_show_tree, sync_show_tree
+
+#=======================================================
+# Async views. These wait on upstream APIs, so they are written as native async views:
+# under ASGI a worker can have many of them in flight without tying up a thread each
+#=======================================================
+
+
+def _serialize_show(show):
+    # Nested seasons/episodes are loaded lazily, so this has to run on the sync thread
+    return TvShowSerializer(show).data
+
+
+# POST /api/shows/import_from_tvmaze/
+@csrf_exempt  # CSRF is still enforced for session logins by DRF's SessionAuthentication
+@require_POST
+async def import_from_tvmaze(request):
+    drf_request, error = await authenticated_request(request, throttle_classes=[ImportRateThrottle])
+    if error:
+        return error
+
+    tvmaze_id = drf_request.data.get("tvmaze_id")
+    if not tvmaze_id:
+        return json_response({"detail": "tvmaze_id required"}, status=400)
+
+    try:
+        tvmaze_id = int(tvmaze_id)
+    except (TypeError, ValueError):
+        return json_response({"detail": "tvmaze_id must be an integer"}, status=400)
+
+    # Check if already exists
+    async def existing():
+        show = await TvShow.objects.filter(TvMazeAPIid=tvmaze_id).afirst()
+        return (show, False) if show else None
+
+    async def import_show():
+        # Fetch the show, its seasons and all episodes concurrently
+        try:
+            async with upstream_client(request) as client:
+                show_data, seasons_json, episodes_by_season = await afetch_show_tree(client, tvmaze_id)
+        except TvMazeError as e:
+            raise ImportFailed(str(e), status=502)
+
+        # Write the whole tree in one transaction
+        try:
+            show, _stats = await sync_to_async(sync_show_tree)(tvmaze_id, show_data, seasons_json, episodes_by_season)
+        except IntegrityError:
+            # Imported by a worker the single-flight lock couldn't see (no shared cache)
+            return await existing() or (None, False)
+        return show, True
+
+    # Members adding the same show at the same time share one import (see movieclub_backend/singleflight.py)
+    try:
+        show, created = await asingle_flight(f"import:tvmaze:{tvmaze_id}", import_show, existing)
+    except ImportFailed as e:
+        return json_response({"detail": e.detail}, status=e.status)
+    if show is None:
+        return json_response({"detail": "Import conflicted with another import, try again"}, status=409)
+
+    return json_response(await sync_to_async(_serialize_show)(show), status=201 if created else 200)
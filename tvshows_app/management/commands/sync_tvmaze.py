@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from moviereviews_hub.models import SyncState
+from moviereviews_hub.snapshots import publish_pending
+from tvshows_app.models import TvShow
+from tvshows_app.tvmaze import TvMazeError, fetch_show_tree, fetch_updated_show_ids, sync_show_tree
+
+# Name of the SyncState row that records the last successful sync
+TVMAZE_SYNC_NAME = "tvmaze_shows"
+
+# TVMaze only offers these windows on /updates/shows
+TVMAZE_UPDATE_WINDOWS = [
+    ("day", timedelta(days = 1)),
+    ("week", timedelta(days = 7)),
+    ("month", timedelta(days = 30)),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh local TV shows from TVMaze. Uses /updates/shows to find shows that changed since the "
+        "last successful run, then inserts new seasons/episodes and updates changed ones in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="How many shows to fetch from TVMaze at once.")
+        parser.add_argument("--all", action="store_true", help="Refresh every local show, including ended ones.")
+        parser.add_argument("--show", type=int, action="append", default=[], help="Only refresh this TVMaze id (repeatable).")
+
+    def handle(self, *args, **opts):
+        run_started = timezone.now()
+
+        shows = self._shows_to_sync(opts, run_started)
+        if shows is None:
+            return
+
+        self.stdout.write(f"Syncing {len(shows)} show(s) with {opts['workers']} worker(s).")
+
+        processed = 0
+        failed = 0
+
+        # Network fetches run in a bounded thread pool, the database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            futures = {pool.submit(fetch_show_tree, show.TvMazeAPIid): show for show in shows}
+
+            for future in as_completed(futures):
+                show = futures[future]
+                try:
+                    show_data, seasons_json, episodes_by_season = future.result()
+                except TvMazeError as e:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(f"FAILED TvShow(id={show.id}) TVMaze={show.TvMazeAPIid}: {e}"))
+                    continue
+
+                if any(eps is None for eps in episodes_by_season.values()):
+                    failed += 1  # partially synced, make sure the next run looks at it again
+
+                _show, stats = sync_show_tree(show.TvMazeAPIid, show_data, seasons_json, episodes_by_season, show=show)
+                processed += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f"Synced '{show.title}': "
+                    f"+{stats['seasons_created']} seasons, ~{stats['seasons_updated']} seasons, "
+                    f"+{stats['episodes_created']} episodes, ~{stats['episodes_updated']} episodes"
+                ))
+
+        # sync_show_tree scheduled a publish for any change, run it before this process exits
+        publish_pending()
+
+        # Only a complete, error free run moves the window forward
+        if failed == 0 and not opts["show"]:
+            SyncState.objects.update_or_create(
+                name=TVMAZE_SYNC_NAME,
+                defaults={"last_synced_at": run_started},
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Processed={processed}, Failed={failed}"))
+
+    def _shows_to_sync(self, opts, now):
+        if opts["show"]:
+            return list(TvShow.objects.filter(TvMazeAPIid__in=opts["show"]))
+
+        if opts["all"]:
+            return list(TvShow.objects.all())
+
+        state = SyncState.objects.filter(name=TVMAZE_SYNC_NAME).first()
+        last_synced_at = state.last_synced_at if state else None
+
+        # Pick the smallest updates window that still covers the time since the last run
+        window = None
+        if last_synced_at:
+            for name, span in TVMAZE_UPDATE_WINDOWS:
+                if now - last_synced_at <= span:
+                    window = name
+                    break
+
+        if window is None:
+            # No usable history: refresh every show that can still get new episodes
+            self.stdout.write(self.style.WARNING("No recent successful run recorded, syncing all shows that have not ended."))
+            return list(TvShow.objects.exclude(status="Ended"))
+
+        try:
+            updated = fetch_updated_show_ids(window)
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"TVMaze /updates/shows failed: {e}"))
+            return None
+
+        since_ts = last_synced_at.timestamp()
+        changed_ids = [show_id for show_id, ts in updated.items() if ts >= since_ts]
+
+        # Intersect the updates feed with our own shows in a single query
+        return list(TvShow.objects.filter(TvMazeAPIid__in=changed_ids))
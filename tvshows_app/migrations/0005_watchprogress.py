@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tvshows_app', '0004_rename_review_justification_tvshowratingsandreviews_rating_justification_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watched', models.BinaryField(default=bytes)),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_progress', to='tvshows_app.season')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'season'), name='unique_watch_progress_per_user_season')],
+            },
+        ),
+    ]
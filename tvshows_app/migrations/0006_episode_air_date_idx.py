@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tvshows_app', '0005_watchprogress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['air_date', 'id'], name='episode_air_date_idx'),
+        ),
+    ]
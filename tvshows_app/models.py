@@ -65,6 +65,10 @@ class Episode(models.Model):
     class Meta:
         unique_together = (("season_number", "episode_number"),)
         ordering = ["episode_number"]
+        indexes = [
+            # Range scans by air date for the calendar, already in its (air_date, id) page order
+            models.Index(fields = ["air_date", "id"], name = "episode_air_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.season_number.show.title} - S{self.season_number.season_number:02}:E{self.episode_number}"
@@ -194,11 +198,34 @@ class TvShowRatingsAndReviews(models.Model):
         
     # String representation of the object
     def __str__(self):
+        # Seasons and episodes reach their show through their own foreign keys
+        target = "?"
         if self.tv_show_type:
             target = f"Show: {self.tv_show_type.title}"
         elif self.tv_season_type:
-            target = f"Season {self.tv_season_type.season_number} of {self.tv_show_type.title}"
+            target = f"Season {self.tv_season_type.season_number} of {self.tv_season_type.show.title}"
         elif self.tv_episode_type:
-            target = f"S{self.tv_season_type.season_number} E{self.tv_episode_type.episode_number} of {self.tv_show_type.title}"
+            season = self.tv_episode_type.season_number
+            target = f"S{season.season_number} E{self.tv_episode_type.episode_number} of {season.show.title}"
+
+        return f"{self.reviewer} - {target} - {self.rating}"
+
+#---------------------------------------------------------------------------------------------
+# MODEL:
+#    WatchProgress
+# PURPOSE:
+#    Which episodes of a season a user has watched, as one bitset per (user, season) instead of a
+#    row per episode. Bit n (little-endian, byte n // 8) is episode_number n. See watch_progress.py
+#---------------------------------------------------------------------------------------------
+class WatchProgress(models.Model):
+    user    = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE, related_name = "watch_progress")
+    season  = models.ForeignKey(Season, on_delete = models.CASCADE, related_name = "watch_progress")
+    watched = models.BinaryField(default = bytes)   # bytea
 
-        return f"{self.reviewer} - {target} - {self.rating}"
\ No newline at end of file
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'season'], name = 'unique_watch_progress_per_user_season')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - season {self.season_id}"
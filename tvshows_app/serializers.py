@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from movieclub_backend.fieldsets import FieldSelectionMixin
 from .models import TvShow, Season, Episode, TvShowRatingsAndReviews
 
-class EpisodeSerializer(serializers.ModelSerializer):
+class EpisodeSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Episode
         fields = [
@@ -14,8 +15,9 @@ class EpisodeSerializer(serializers.ModelSerializer):
             "episode_runtime",
             "summary"
         ]
+        expandable_fields = {"season_number": "tvshows_app.serializers.SeasonSerializer"}
 
-class SeasonSerializer(serializers.ModelSerializer):
+class SeasonSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     episodes = EpisodeSerializer(many = True, read_only = True)
 
     class Meta:
@@ -30,8 +32,9 @@ class SeasonSerializer(serializers.ModelSerializer):
             "season_episode_cnt",
             "episodes"
         ]
+        expandable_fields = {"show": "tvshows_app.serializers.TvShowSerializer"}
 
-class TvShowSerializer(serializers.ModelSerializer):
+class TvShowSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     seasons = SeasonSerializer(many = True, read_only = True)
 
     class Meta:
@@ -53,7 +56,7 @@ class TvShowSerializer(serializers.ModelSerializer):
 
 
 # Tv show reviews serializer
-class TvShowReviewSerializer(serializers.ModelSerializer):
+class TvShowReviewSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     # Virtual field for incoming requests
     target_id = serializers.IntegerField(write_only = True, required = False)
 
@@ -77,6 +80,13 @@ class TvShowReviewSerializer(serializers.ModelSerializer):
         # Clients cannot set the reviewer field
         read_only_fields = ['reviewer']
 
+        # ?expand=tv_show_type etc. nests the reviewed item instead of its id
+        expandable_fields = {
+            'tv_show_type': TvShowSerializer,
+            'tv_season_type': SeasonSerializer,
+            'tv_episode_type': EpisodeSerializer,
+        }
+
     def validate(self, attrs):
         target_type = attrs.get('target_type')   # Get what the client sent
         target_id = attrs.pop('target_id', None) # Remove target_id from attrs so the ModelSerializer does not get confused later
@@ -116,7 +126,7 @@ class TvShowReviewSerializer(serializers.ModelSerializer):
 
         # Check if the user is logged in
         if request and request.user and request.user.is_authenticated:
-            validated_data['reviewer'] = request.user
+            validated_data['reviewer_id'] = request.user.id # by id, request.user may be a TokenUser built from the JWT
         return super().create(validated_data)
     
     # Called when someones sends a put or patch request
@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from moviereviews_hub import changelog, stats
+from moviereviews_hub.analytics import invalidate_agreement_cache
+from moviereviews_hub.snapshots import schedule_publish
+
+from .models import TvShow, Season, Episode, TvShowRatingsAndReviews
+
+#=======================================================
+# Signal handlers that keep derived data (snapshots, caches, ...) in step with TV writes.
+# Work is deferred with transaction.on_commit so a rolled back write never leaks into derived data,
+# except for the ReviewStat deltas which are applied right away (see moviereviews_hub/signals.py)
+#=======================================================
+
+
+@receiver(post_save, sender=TvShow)
+@receiver(post_save, sender=Season)
+@receiver(post_save, sender=Episode)
+@receiver(post_save, sender=TvShowRatingsAndReviews)
+def tv_data_saved(sender, instance, **kwargs):
+    transaction.on_commit(schedule_publish)
+    changelog.record_changes(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=TvShow)
+@receiver(post_delete, sender=Season)
+@receiver(post_delete, sender=Episode)
+@receiver(post_delete, sender=TvShowRatingsAndReviews)
+def tv_data_deleted(sender, instance, **kwargs):
+    transaction.on_commit(schedule_publish)
+    changelog.record_changes(sender, [instance.pk], deleted=True)
+
+
+@receiver([post_save, post_delete], sender=TvShowRatingsAndReviews)
+def tv_review_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_agreement_cache)
+
+
+#-------------------------------------------------------
+# Review stats
+#-------------------------------------------------------
+def _review_contribution(deltas, review, sign=1):
+    genres = stats.tv_review_genres(review.tv_show_type_id, review.tv_season_type_id, review.tv_episode_type_id)
+    return stats.add_contribution(
+        deltas, stats.ReviewStat.SOURCE_TV, review.reviewer.username, review.couple_slug, review.rating, genres, sign
+    )
+
+
+@receiver(pre_save, sender=TvShowRatingsAndReviews)
+def tv_review_about_to_save(sender, instance, **kwargs):
+    # What the review contributed before this save, removed again once it is saved
+    instance._previous_stats = {}
+    if instance.pk:
+        stats.tv_reviews_contribution(
+            instance._previous_stats, TvShowRatingsAndReviews.objects.filter(pk=instance.pk), sign=-1
+        )
+
+
+@receiver(post_save, sender=TvShowRatingsAndReviews)
+def tv_review_stats_saved(sender, instance, **kwargs):
+    deltas = getattr(instance, "_previous_stats", None) or {}
+    stats.apply_deltas(_review_contribution(deltas, instance))
+
+
+@receiver(pre_delete, sender=TvShowRatingsAndReviews)
+def tv_review_about_to_delete(sender, instance, **kwargs):
+    # A cascade sends every pre_delete before deleting anything, so the show/season/episode
+    # row is still there even when it is what is being deleted
+    stats.apply_deltas(_review_contribution({}, instance, sign=-1))
+
+
+@receiver(pre_save, sender=TvShow)
+def show_about_to_save(sender, instance, **kwargs):
+    # Remember the genres, the stats of the show's reviews move if they change
+    instance._previous_genres = None
+    if instance.pk:
+        instance._previous_genres = TvShow.objects.filter(pk=instance.pk).values_list("genres", flat=True).first()
+
+
+@receiver(post_save, sender=TvShow)
+def show_stats_saved(sender, instance, **kwargs):
+    previous_genres = getattr(instance, "_previous_genres", None)
+    if previous_genres is None or set(previous_genres) == set(instance.genres or []):
+        return
+
+    reviews = TvShowRatingsAndReviews.objects.filter(
+        Q(tv_show_type=instance) | Q(tv_season_type__show=instance) | Q(tv_episode_type__season_number__show=instance)
+    )
+    deltas = {}
+    for username, couple_id, rating in reviews.values_list("reviewer__username", "couple_slug", "rating"):
+        stats.add_contribution(deltas, stats.ReviewStat.SOURCE_TV, username, couple_id, rating, previous_genres, sign=-1)
+        stats.add_contribution(deltas, stats.ReviewStat.SOURCE_TV, username, couple_id, rating, instance.genres)
+    stats.apply_deltas(deltas)
+
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import base64
+import json
+from contextlib import nullcontext
+from datetime import date
+from unittest import mock
+from urllib.parse import quote, urlencode
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.test import TestCase, override_settings
+from django.urls import ResolverMatch
+from rest_framework.test import APIClient
+
+from movieclub_backend import batch
+from movieclub_backend.pagination import KeysetCursorPagination
+from moviereviews_hub.models import ReviewStat
+
+from . import watch_progress
+from .models import TvShow, Season, Episode, TvShowRatingsAndReviews, WatchProgress
+
+
+def make_show(tvmaze_id=1, title="Show", episodes=3, air_dates=None):
+    show = TvShow.objects.create(TvMazeAPIid = tvmaze_id, title = title)
+    season = Season.objects.create(
+        show = show, season_number = 1, TvMazeAPI_season_id = tvmaze_id * 100 + 1, season_episode_cnt = episodes,
+    )
+    for n in range(1, episodes + 1):
+        Episode.objects.create(
+            season_number = season, episode_number = n,
+            TvMazeAPI_episode_id = tvmaze_id * 10_000 + n,
+            air_date = air_dates[n - 1] if air_dates else None,
+        )
+    return show, season
+
+
+#=======================================================
+# Sparse fieldsets on the episode endpoints (season_number is output as an id unless expanded)
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class EpisodeFieldsTests(TestCase):
+    def setUp(self):
+        self.show, self.season = make_show(episodes = 2)
+        self.client = APIClient()
+
+    def test_list_without_fields(self):
+        response = self.client.get("/api/episodes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e["episode_number"] for e in response.data["results"]], [1, 2])
+        self.assertEqual(response.data["results"][0]["season_number"], self.season.id)
+
+    def test_list_with_fields(self):
+        response = self.client.get("/api/episodes/?fields=id,episode_number")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["results"][0]), {"id", "episode_number"})
+
+    def test_list_with_expanded_season(self):
+        response = self.client.get("/api/episodes/?expand=season_number&fields=id,season_number.season_number")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["season_number"], {"season_number": 1})
+
+
+#=======================================================
+# ReviewStat deltas applied by the TV review and show signals
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class TvReviewStatTests(TestCase):
+    def setUp(self):
+        self.show, self.season = make_show(episodes = 1)
+        self.show.genres = ["Comedy"]
+        self.show.save()
+        self.user = User.objects.create_user("mia")
+
+    def stat_rows(self):
+        return set(ReviewStat.objects.filter(source = "tv", count__gt = 0).values_list("kind", "name", "genre", "bucket", "count"))
+
+    def test_review_update_and_delete(self):
+        review = TvShowRatingsAndReviews.objects.create(reviewer = self.user, couple_slug = "ml", rating = 6.5, tv_season_type = self.season)
+        self.assertIn(("reviewer", "mia", "Comedy", 6, 1), self.stat_rows())
+
+        review.rating = 8
+        review.save()
+        self.assertEqual(self.stat_rows(), {
+            ("reviewer", "mia", "", 8, 1), ("reviewer", "mia", "Comedy", 8, 1),
+            ("couple", "ml", "", 8, 1), ("couple", "ml", "Comedy", 8, 1),
+        })
+
+        review.delete()
+        self.assertEqual(self.stat_rows(), set())
+
+    def test_show_genre_change(self):
+        TvShowRatingsAndReviews.objects.create(reviewer = self.user, couple_slug = "ml", rating = 6.5, tv_show_type = self.show)
+        self.show.genres = ["Drama"]
+        self.show.save()
+
+        genres = {genre for _, _, genre, _, _ in self.stat_rows()}
+        self.assertEqual(genres, {"", "Drama"})
+
+
+#=======================================================
+# Default id-cursor pagination of the list endpoints
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        make_show(episodes = 5)
+        self.client = APIClient()
+
+    def episode_numbers(self, url):
+        numbers = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            numbers += [e["episode_number"] for e in response.data["results"]]
+            url = response.data["next"]
+        return numbers
+
+    def test_pages_follow_the_cursor(self):
+        self.assertEqual(self.episode_numbers("/api/episodes/?page_size=2"), [1, 2, 3, 4, 5])
+
+    def test_previous_link(self):
+        first = self.client.get("/api/episodes/?page_size=2")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual([e["episode_number"] for e in back.data["results"]], [1, 2])
+
+    def test_count_only_on_request_and_not_in_links(self):
+        self.assertNotIn("count", self.client.get("/api/episodes/?page_size=2").data)
+        response = self.client.get("/api/episodes/?page_size=2&count=exact")
+        self.assertEqual(response.data["count"], 5)
+        self.assertNotIn("count=", response.data["next"])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetCursorPagination, "max_page_size", 3):
+            response = self.client.get("/api/episodes/?page_size=100")
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get("/api/episodes/?cursor=nonsense").status_code, 404)
+
+
+#=======================================================
+# Calendar pages keyed on (air_date, id), including long runs of one air date
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class CalendarPaginationTests(TestCase):
+    def setUp(self):
+        # Five episodes on Jan 6 and one on each of Jan 5 and Jan 7, created out of date order
+        air_dates = [date(2025, 1, 5)] + [date(2025, 1, 6)] * 3 + [date(2025, 1, 7)] + [date(2025, 1, 6)] * 2
+        make_show(episodes = len(air_dates), air_dates = air_dates)
+        self.client = APIClient()
+        self.url = "/api/tv/calendar/?from=2025-01-01&to=2025-01-31&page_size=2"
+        self.expected = list(Episode.objects.order_by("air_date", "id").values_list("id", flat=True))
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [e["id"] for e in response.data["results"]]
+
+    def test_forward_and_back(self):
+        pages, response = [], self.client.get(self.url)
+        while True:
+            pages.append(self.ids(response))
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertTrue(all(len(page) == 2 for page in pages[:-1]))
+
+        # Back from the last page, through the run of Jan 6 episodes
+        back = []
+        while response.data["previous"]:
+            response = self.client.get(response.data["previous"])
+            back.insert(0, self.ids(response))
+        self.assertEqual(back, pages[:-1])
+
+    def test_cursor_holds_both_columns(self):
+        first = self.client.get(self.url)
+        second = self.client.get(first.data["next"])
+        self.assertEqual(self.ids(second), self.expected[2:4])   # both on Jan 6, after Jan 6 / id of row 2
+
+        # A row moving to Jan 6 ahead of the cursor's row doesn't shift the next page
+        # (an offset into the Jan 6 rows would now return the cursor's row again)
+        Episode.objects.filter(pk = self.expected[0]).update(air_date = date(2025, 1, 6))
+        self.assertEqual(self.ids(self.client.get(first.data["next"])), self.expected[2:4])
+
+    def test_bad_cursor(self):
+        def cursor(position):
+            return quote(base64.b64encode(urlencode({"p": json.dumps(position)}).encode()).decode())
+
+        for bad in ("nonsense", cursor(["not-a-date", "1"]), cursor(["2025-01-06"])):
+            with self.subTest(cursor=bad):
+                self.assertEqual(self.client.get(f"{self.url}&cursor={bad}").status_code, 404)
+
+
+#=======================================================
+# Watch progress bitsets: marking, clearing, masking by the episodes that exist, couple aggregates
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class WatchProgressTests(TestCase):
+    def setUp(self):
+        self.show, self.season = make_show(episodes = 10)
+        self.trevor = User.objects.create_user("trevor")
+        self.taylor = User.objects.create_user("taylor")
+        self.client = APIClient()
+        self.client.force_authenticate(self.trevor)
+
+    def mark(self, **data):
+        response = self.client.post(f"/api/tv/progress/seasons/{self.season.id}/", data, format = "json")
+        self.assertEqual(response.status_code, 200)
+        return response.data["watched"]
+
+    def test_bit_helpers(self):
+        bits = watch_progress.episode_mask([1, 3, 300])
+        self.assertEqual(watch_progress.to_bits(watch_progress.to_bytes(bits)), bits)
+        self.assertEqual(watch_progress.to_bytes(1 << 9), b"\x00\x02")   # little-endian, byte n // 8
+        self.assertEqual(watch_progress.episode_numbers(watch_progress.range_mask(3, 6)), [3, 4, 5, 6])
+        self.assertEqual(watch_progress.range_mask(5, 4), 0)
+        self.assertEqual(watch_progress.to_bits(b""), 0)
+
+    def test_mark_and_clear(self):
+        self.assertEqual(self.mark(mark = "upto", episode = 3), [1, 2, 3])
+        self.assertEqual(self.mark(mark = "episodes", episodes = [5, 7]), [1, 2, 3, 5, 7])
+        self.assertEqual(self.mark(mark = "episodes", episodes = [2, 7], watched = False), [1, 3, 5])
+        self.assertEqual(self.mark(mark = "season"), list(range(1, 11)))
+        self.assertEqual(self.mark(mark = "season", watched = False), [])
+        self.assertEqual(WatchProgress.objects.get().watched, b"")
+
+    def test_episodes_that_dont_exist_are_left_out(self):
+        self.assertEqual(self.mark(mark = "upto", episode = 12), list(range(1, 11)))
+        response = self.client.get(f"/api/tv/progress/shows/{self.show.slug}/")
+        self.assertEqual((response.data["episodes"], response.data["watched_count"], response.data["percent"]), (10, 10, 100.0))
+
+    def test_invalid_marks(self):
+        url = f"/api/tv/progress/seasons/{self.season.id}/"
+        for data in ({"mark": "upto", "episode": 0}, {"mark": "episodes", "episodes": [True]}, {"mark": "all"}, {"mark": "season", "watched": "yes"}):
+            with self.subTest(data = data):
+                self.assertEqual(self.client.post(url, data, format = "json").status_code, 400)
+        self.assertFalse(WatchProgress.objects.exists())
+
+    def test_couple_together_and_either(self):
+        watch_progress.update_progress(self.trevor.id, self.season, watch_progress.range_mask(1, 6))
+        watch_progress.update_progress(self.taylor.id, self.season, watch_progress.range_mask(4, 9))
+
+        response = self.client.get(f"/api/tv/progress/shows/{self.show.slug}/couples/")
+        couple = next(c for c in response.data["couples"] if c["couple_id"] == "TrevorTaylor")
+        self.assertEqual((couple["together"], couple["either"]), (3, 9))
+        self.assertEqual((couple["together_percent"], couple["either_percent"]), (30.0, 90.0))
+        self.assertEqual(next(c for c in response.data["couples"] if c["couple_id"] == "MomDad")["either"], 0)
+
+
+#=======================================================
+# POST /api/batch/: the request cap, which URLs can be batched, the forwarded user, error statuses
+#=======================================================
+@override_settings(SNAPSHOTS_ENABLED = False)
+class BatchRequestTests(TestCase):
+    def setUp(self):
+        self.show, _ = make_show()
+        self.client = APIClient()
+
+    def batch(self, *urls):
+        response = self.client.post("/api/batch/", {"requests": list(urls)}, format = "json")
+        self.assertEqual(response.status_code, 200)
+        return response.data["responses"]
+
+    def test_request_cap(self):
+        urls = [f"/api/episodes/?n={n}" for n in range(batch.MAX_BATCH_REQUESTS + 1)]
+        response = self.client.post("/api/batch/", {"requests": urls}, format = "json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.batch(*urls[:-1])), batch.MAX_BATCH_REQUESTS)
+
+    def test_only_relative_api_urls(self):
+        responses = self.batch("/admin/", "https://example.com/api/episodes/", "//example.com/api/episodes/", "/api/batch/", "/api/nope/")
+        self.assertEqual(
+            {url: response["status"] for url, response in responses.items()},
+            {"/admin/": 400, "https://example.com/api/episodes/": 400, "//example.com/api/episodes/": 400, "/api/batch/": 400, "/api/nope/": 404},
+        )
+
+    def test_user_is_forwarded(self):
+        url = f"/api/tv/progress/shows/{self.show.slug}/"
+        self.assertEqual(self.batch(url)[url]["status"], 403)
+
+        self.client.force_authenticate(User.objects.create_user("trevor"))
+        self.assertEqual(self.batch(url)[url]["status"], 200)
+
+    def test_forbidden_sub_request(self):
+        self.client.force_authenticate(User.objects.create_user("trevor"))
+        url = "/api/export/reviews.csv"   # admin only
+        self.assertEqual(self.batch(url)[url]["status"], 403)
+
+        for exception, status in ((PermissionDenied, 403), (SuspiciousOperation, 400)):
+            def view(request, exception=exception):
+                raise exception()
+
+            with self.subTest(exception=exception.__name__), mock.patch.object(batch, "resolve", return_value = ResolverMatch(view, (), {})):
+                self.assertEqual(self.batch("/api/x/")["/api/x/"]["status"], status)
+
+    def test_use_read_replica_views_read_the_replica_while_pinned(self):
+        seen = []
+
+        def use_replica(enabled):
+            seen.append(enabled)
+            return nullcontext()
+
+        with mock.patch.object(batch, "replica_allowed", return_value = False), mock.patch.object(batch, "use_replica", side_effect = use_replica):
+            self.batch("/api/episodes/", "/api/shows/")
+        self.assertEqual(seen, [True, False])
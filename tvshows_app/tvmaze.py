@@ -0,0 +1,284 @@
+import asyncio
+import httpx
+import requests
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from moviereviews_hub import changelog
+from moviereviews_hub.snapshots import schedule_publish
+from .models import TvShow, Season, Episode
+
+#=======================================================
+# Helpers for talking to TVMaze. Shared by the import endpoint and the
+# sync_tvmaze management command so shows, seasons and episodes are always
+# parsed and written the same way
+#=======================================================
+
+TVMAZE_BASE = settings.TVMAZE_API_BASE
+
+
+class TvMazeError(Exception):
+    """Raised when a required TVMaze request fails."""
+
+
+def _get_json(path, params=None, timeout=10):
+    res = requests.get(f"{TVMAZE_BASE}{path}", params=params, timeout=timeout)
+    res.raise_for_status()
+    return res.json()
+
+
+#-------------------------------------------------------
+# Parsing: TVMaze payload -> our model field values
+#-------------------------------------------------------
+def show_fields_from_tvmaze(show_data, tvmaze_id):
+    title = show_data.get("name") or f"Show {tvmaze_id}"
+
+    creators_list = []
+    for crew in show_data.get("_embedded", {}).get("crew", []):
+        if crew.get("type") == "Creator":
+            person = crew.get("person", {})
+            name = person.get("name")
+            if name:
+                creators_list.append(name)
+
+    image = show_data.get("image") or {}
+
+    return {
+        "title": title,
+        "summary": show_data.get("summary") or "",
+        "genres": show_data.get("genres") or [],
+        "image_url": image.get("original") or image.get("medium") or "",
+        "premiered": parse_date(show_data.get("premiered") or "") or None,
+        "creators": creators_list,
+        "status": show_data.get("status") or "",
+    }
+
+
+def season_fields_from_tvmaze(sn):
+    release_year = (sn.get("premiereDate") or "")[:4]
+
+    return {
+        "season_number": sn.get("number") or 0,
+        "summary": sn.get("summary") or "",
+        "season_release_year": int(release_year) if release_year.isdigit() else None,
+        "season_episode_cnt": sn.get("episodeOrder") or 0,
+    }
+
+
+def episode_fields_from_tvmaze(ep):
+    return {
+        "episode_number": ep.get("number"),
+        "episode_title": ep.get("name") or "",
+        "air_date": parse_date(ep.get("airdate") or "") or None,
+        "episode_runtime": ep.get("runtime"),
+        "summary": ep.get("summary") or "",
+    }
+
+
+#-------------------------------------------------------
+# Fetching
+#-------------------------------------------------------
+def fetch_show_tree(tvmaze_id):
+    """
+    Fetch a show, its seasons and every season's episodes from TVMaze.
+
+    RETURNS (show_data, seasons_json, episodes_by_season) where episodes_by_season maps a
+    TVMaze season id to its episode list, or to None if that season's episodes could not be fetched.
+    """
+    try:
+        show_data = _get_json(f"/shows/{tvmaze_id}", params={"embed": "crew"})
+    except Exception:
+        raise TvMazeError("TVMaze /shows/{id} failed")
+
+    try:
+        seasons_json = _get_json(f"/shows/{tvmaze_id}/seasons")
+    except Exception:
+        raise TvMazeError("TVMaze /shows/{id}/seasons failed")
+
+    episodes_by_season = {}
+    for sn in seasons_json:
+        if not sn.get("id"):
+            continue
+        try:
+            episodes_by_season[sn["id"]] = _get_json(f"/seasons/{sn['id']}/episodes")
+        except Exception:
+            episodes_by_season[sn["id"]] = None  # not fatal, the next sync will try again
+
+    return show_data, seasons_json, episodes_by_season
+
+
+async def afetch_show_tree(client, tvmaze_id):
+    """
+    Async version of fetch_show_tree using an httpx.AsyncClient. The show and its season list
+    are fetched together, then every season's episodes are fetched concurrently.
+    """
+    async def get_json(path, params=None):
+        res = await client.get(f"{TVMAZE_BASE}{path}", params=params)
+        res.raise_for_status()
+        return res.json()
+
+    show_res, seasons_res = await asyncio.gather(
+        get_json(f"/shows/{tvmaze_id}", params={"embed": "crew"}),
+        get_json(f"/shows/{tvmaze_id}/seasons"),
+        return_exceptions=True,
+    )
+    if isinstance(show_res, Exception):
+        raise TvMazeError("TVMaze /shows/{id} failed")
+    if isinstance(seasons_res, Exception):
+        raise TvMazeError("TVMaze /shows/{id}/seasons failed")
+
+    season_ids = [sn["id"] for sn in seasons_res if sn.get("id")]
+    episodes = await asyncio.gather(
+        *(get_json(f"/seasons/{season_id}/episodes") for season_id in season_ids),
+        return_exceptions=True,
+    )
+    episodes_by_season = {
+        season_id: (None if isinstance(eps, Exception) else eps)  # not fatal, the next sync will try again
+        for season_id, eps in zip(season_ids, episodes)
+    }
+
+    return show_res, seasons_res, episodes_by_season
+
+
+async def afetch_show_trees(tvmaze_ids, concurrency=4):
+    """
+    Fetch many show trees concurrently, at most `concurrency` shows at a time.
+    RETURNS {tvmaze_id: (show_data, seasons_json, episodes_by_season)}, with the exception instead for shows that failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0)) as client:
+        async def fetch(tvmaze_id):
+            async with semaphore:
+                return await afetch_show_tree(client, tvmaze_id)
+
+        results = await asyncio.gather(*(fetch(tvmaze_id) for tvmaze_id in tvmaze_ids), return_exceptions=True)
+
+    return dict(zip(tvmaze_ids, results))
+
+
+def fetch_updated_show_ids(since):
+    """
+    Return {tvmaze_id: last_updated_unix_ts} from /updates/shows.
+    `since` must be one of TVMaze's windows: "day", "week" or "month".
+    """
+    data = _get_json("/updates/shows", params={"since": since}, timeout=30)
+    return {int(show_id): ts for show_id, ts in data.items()}
+
+
+#-------------------------------------------------------
+# Writing
+#-------------------------------------------------------
+def _changed_fields(obj, fields):
+    # Set the new values on the object and report which ones actually changed
+    changed = []
+    for name, value in fields.items():
+        if getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed.append(name)
+    return changed
+
+
+def sync_show_tree(tvmaze_id, show_data, seasons_json, episodes_by_season, show=None):
+    """
+    Bring the local TvShow/Season/Episode rows in line with a fetched TVMaze tree.
+
+    Existing seasons and episodes are loaded with one query each and diffed in memory,
+    then new rows are inserted with bulk_create and changed rows saved with bulk_update,
+    all in one transaction. Pass `show=None` to create the show.
+
+    RETURNS (show, stats) where stats counts the rows created/updated.
+    """
+    stats = {"seasons_created": 0, "seasons_updated": 0, "episodes_created": 0, "episodes_updated": 0}
+    show_fields = show_fields_from_tvmaze(show_data, tvmaze_id)
+
+    with transaction.atomic():
+        if show is None:
+            show = TvShow.objects.create(TvMazeAPIid=tvmaze_id, **show_fields)
+        else:
+            changed = _changed_fields(show, show_fields)
+            if changed:
+                show.save(update_fields=changed)
+
+        # ---- Seasons ----
+        existing_seasons = {s.TvMazeAPI_season_id: s for s in Season.objects.filter(show=show)}
+        new_seasons = []
+        updated_seasons = []
+        season_update_fields = set()
+
+        for sn in seasons_json:
+            if not sn.get("id"):
+                continue
+            fields = season_fields_from_tvmaze(sn)
+            season = existing_seasons.get(sn["id"])
+
+            if season is None:
+                new_seasons.append(Season(show=show, TvMazeAPI_season_id=sn["id"], **fields))
+            else:
+                changed = _changed_fields(season, fields)
+                if changed:
+                    updated_seasons.append(season)
+                    season_update_fields.update(changed)
+
+        if new_seasons:
+            Season.objects.bulk_create(new_seasons)
+            for season in new_seasons:
+                existing_seasons[season.TvMazeAPI_season_id] = season
+        if updated_seasons:
+            Season.objects.bulk_update(updated_seasons, sorted(season_update_fields))
+        # bulk_create/bulk_update send no signals, log the changes for /api/sync/ here
+        changelog.record_changes(Season, [season.pk for season in new_seasons + updated_seasons])
+
+        stats["seasons_created"] = len(new_seasons)
+        stats["seasons_updated"] = len(updated_seasons)
+
+        # ---- Episodes ----
+        existing_episodes = {
+            e.TvMazeAPI_episode_id: e for e in Episode.objects.filter(season_number__show=show)
+        }
+        new_episodes = []
+        updated_episodes = []
+        episode_update_fields = set()
+
+        for tvmaze_season_id, eps in episodes_by_season.items():
+            season = existing_seasons.get(tvmaze_season_id)
+            if eps is None or season is None:
+                continue
+
+            for ep in eps:
+                # Specials have no episode number and would collide on (season, episode_number)
+                if not ep.get("id") or not ep.get("number"):
+                    continue
+
+                fields = episode_fields_from_tvmaze(ep)
+                episode = existing_episodes.get(ep["id"])
+
+                if episode is None:
+                    new_episodes.append(
+                        Episode(season_number=season, TvMazeAPI_episode_id=ep["id"], **fields)
+                    )
+                else:
+                    fields["season_number_id"] = season.id
+                    changed = _changed_fields(episode, fields)
+                    if changed:
+                        updated_episodes.append(episode)
+                        episode_update_fields.update(
+                            "season_number" if name == "season_number_id" else name for name in changed
+                        )
+
+        if new_episodes:
+            Episode.objects.bulk_create(new_episodes)
+        if updated_episodes:
+            Episode.objects.bulk_update(updated_episodes, sorted(episode_update_fields))
+        changelog.record_changes(Episode, [episode.pk for episode in new_episodes + updated_episodes])
+
+        # Neither bulk write sends signals, so refresh the couple pages here
+        if new_seasons or updated_seasons or new_episodes or updated_episodes:
+            transaction.on_commit(schedule_publish)
+
+        stats["episodes_created"] = len(new_episodes)
+        stats["episodes_updated"] = len(updated_episodes)
+
+    return show, stats
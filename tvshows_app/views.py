@@ -5,130 +5,65 @@ from rest_framework import viewsets, status
 
 from .serializers import TvShowSerializer, SeasonSerializer, EpisodeSerializer
 from .models import TvShow, Season, Episode
+from movieclub_backend.fieldsets import FieldSelectionViewMixin
+from movieclub_backend.throttling import AnonHeavyReadRateThrottle, ReviewWriteRateThrottle
 
-import requests
 
-from django.utils.text import slugify
 
-
-
-class TvShowViewSet(viewsets.ModelViewSet):
-    queryset = TvShow.objects.all().prefetch_related("seasons__episodes")
+class TvShowViewSet(FieldSelectionViewMixin, viewsets.ModelViewSet):
+    queryset = TvShow.objects.all()
     serializer_class = TvShowSerializer
     lookup_field = "slug"
 
-    # POST /api/shows/import_from_tvmaze/
-    @action(detail=False, methods=["post"], url_path="import_from_tvmaze")
-    def import_from_tvmaze(self, request):
-        tvmaze_id = request.data.get("tvmaze_id")
-        if not tvmaze_id:
-            return Response({"detail": "tvmaze_id required"}, status=400)
-
-        # Check if already exists
-        existing = TvShow.objects.filter(TvMazeAPIid=tvmaze_id).first()
-        if existing:
-            return Response(self.get_serializer(existing).data, status=200)
-
-        # 1️⃣ Fetch show details
-        try:
-            r = requests.get(f"https://api.tvmaze.com/shows/{tvmaze_id}", timeout=10)
-            r.raise_for_status()
-        except Exception:
-            return Response({"detail": "TVMaze /shows/{id} failed"}, status=502)
-        show_data = r.json()
-
-        title = show_data.get("name") or f"Show {tvmaze_id}"
-
-        creators_list = []
-        for crew in show_data.get("_embedded", {}).get("crew", []):
-            if crew.get("type") == "Creator":
-                person = crew.get("person", {})
-                name = person.get("name")
-                if name:
-                    creators_list.append(name)
-
-        show = TvShow.objects.create(
-            TvMazeAPIid=tvmaze_id,
-            title=title,
-            slug=slugify(f"{title}-{tvmaze_id}"),
-            summary=show_data.get("summary") or "",
-            genres=show_data.get("genres") or [],
-            image_url=(show_data.get("image") or {}).get("original")
-                      or (show_data.get("image") or {}).get("medium") or "",
-            premiered=show_data.get("premiered"),
-            creators = creators_list,
-            status = show_data.get("status") or ""
-        )
-
-        # 2️⃣ Fetch seasons
-        try:
-            s = requests.get(f"https://api.tvmaze.com/shows/{tvmaze_id}/seasons", timeout=10)
-            s.raise_for_status()
-        except Exception:
-            return Response({"detail": "TVMaze /shows/{id}/seasons failed"}, status=502)
-        seasons_json = s.json()
-
-        season_map = {}
-        for sn in seasons_json:
-            season = Season.objects.create(
-                show=show,
-                season_number=sn.get("number") or 0,
-                TvMazeAPI_season_id=sn.get("id"),
-                summary=sn.get("summary") or "",
-                season_release_year=(sn.get("premiereDate") or "")[:4] or None,
-                season_episode_cnt=sn.get("episodeOrder") or 0,
-            )
-            season_map[sn.get("id")] = season
-
-        # 3️⃣ Fetch episodes for each season
-        for tvmaze_season_id, season in season_map.items():
-            try:
-                e = requests.get(f"https://api.tvmaze.com/seasons/{tvmaze_season_id}/episodes", timeout=10)
-                e.raise_for_status()
-            except Exception:
-                continue
-            eps = e.json()
-            Episode.objects.bulk_create([
-                Episode(
-                    season_number=season,  # your current FK name
-                    episode_number=ep.get("number") or 0,
-                    TvMazeAPI_episode_id=ep.get("id"),
-                    episode_title=ep.get("name") or "",
-                    air_date=ep.get("airdate"),
-                    episode_runtime=ep.get("runtime"),
-                    summary=ep.get("summary") or "",
-                )
-                for ep in eps
-                if ep.get("id") and not Episode.objects.filter(TvMazeAPI_episode_id=ep["id"]).exists()
-            ])
-
-        return Response(self.get_serializer(show).data, status=201)
-
-
-class SeasonViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Season.objects.select_related("show")
+    # Seasons and episodes are only prefetched when the response includes them (see fieldsets.py)
+    selection_prefetch_related = {
+        "seasons": "seasons",
+        "seasons.episodes": "seasons__episodes",
+    }
+
+    # POST /api/shows/import_from_tvmaze/ is served by async_views.import_from_tvmaze (see urls.py)
+
+
+class SeasonViewSet(FieldSelectionViewMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Season.objects.all()
     serializer_class = SeasonSerializer
+    use_read_replica = True  # only written by imports/syncs, so reads never need the primary
+    selection_select_related = {"show": "show"}
+    selection_prefetch_related = {"episodes": "episodes"}
 
-class EpisodeViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Episode.objects.select_related("season_number", "season_number__show")
+class EpisodeViewSet(FieldSelectionViewMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Episode.objects.all()
     serializer_class = EpisodeSerializer
+    use_read_replica = True
+    selection_select_related = {"season_number": "season_number"}
+    selection_prefetch_related = {"season_number.episodes": "season_number__episodes"}
 
 
 from rest_framework import viewsets, permissions
 from .models import TvShowRatingsAndReviews
 from .serializers import TvShowReviewSerializer
 from django.utils.functional import SimpleLazyObject
+from moviereviews_hub.couples import couple_id_for_username
+from moviereviews_hub.live import publish_review_event, SOURCE_TV
 
 # Create a viewset that inherits the Model View set
-class TvShowReviewsViewSet(viewsets.ModelViewSet):
+class TvShowReviewsViewSet(FieldSelectionViewMixin, viewsets.ModelViewSet):
+    queryset = TvShowRatingsAndReviews.objects.select_related( # select_related tells Django to prefetch related objects in the same database query
+        'tv_show_type', 'tv_season_type', 'tv_episode_type', 'reviewer'
+    )
     serializer_class = TvShowReviewSerializer # Serializer to use for input/output validation
     permission_classes = [permissions.IsAuthenticatedOrReadOnly] # controls access, only logged in users can edit
+    throttle_classes = [ReviewWriteRateThrottle] # limits how fast reviews can be written, reads are not counted
+
+    # Nested trees for ?expand=tv_show_type / tv_season_type
+    selection_prefetch_related = {
+        "tv_show_type.seasons.episodes": "tv_show_type__seasons__episodes",
+        "tv_season_type.episodes": "tv_season_type__episodes",
+    }
 
     # What reviews to return when someone performs a GET request
     def get_queryset(self):
-        qs = TvShowRatingsAndReviews.objects.select_related( # select_related tells Django to prefetch related objects in the same database query
-            'tv_show_type', 'tv_season_type', 'tv_episode_type', 'reviewer'
-        )
+        qs = super().get_queryset() # applies ?fields= / ?expand= (see FieldSelectionViewMixin)
 
         # Pull query parameters from the request URL
         target_type = self.request.query_params.get('target_type')
@@ -160,34 +95,31 @@ class TvShowReviewsViewSet(viewsets.ModelViewSet):
         if isinstance(user, SimpleLazyObject):
             user = user._wrapped
 
-        user_to_couple = {
-                 "trevor"  : "TrevorTaylor",
-                 "taylor"  : "TrevorTaylor",
-                 "marissa" : "MarissaNathan",
-                 "nathan"  : "MarissaNathan",
-                 "sierra"  : "SierraBenett",
-                 "benett"  : "SierraBenett",
-                 "rob"     : "MomDad",
-                 "terry"   : "MomDad",
-                 "mia"     : "MiaLogan",
-                 "logan"   : "MiaLogan",
-                 "annie"   : "AnnieFelix",
-                 "felix"   : "AnnieFelix"
-            }
-        
-        couple_id = user_to_couple.get(username, "uncategorized")
+        couple_id = couple_id_for_username(username)
 
         serializer.save(couple_slug = couple_id)
+        publish_review_event("created", SOURCE_TV, couple_id, serializer.data)
+
+    # Updates and deletes are pushed to the couple's live feed too (see moviereviews_hub/live.py)
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        publish_review_event("updated", SOURCE_TV, serializer.instance.couple_slug, serializer.data)
+
+    def perform_destroy(self, instance):
+        review_id, couple_id = instance.id, instance.couple_slug
+        super().perform_destroy(instance)
+        publish_review_event("deleted", SOURCE_TV, couple_id, {"id": review_id})
 
 
 #=======================================================
 # Function based views (custom logic for the different couples pages)
 #=======================================================
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 
 # Use the same slug to ID map for couples
 from moviereviews_hub.views import COUPLE_SLUG_TO_ID_MAP
+from moviereviews_hub.snapshots import cached_payload
 
 from .models import TvShow, Season, Episode, TvShowRatingsAndReviews
 
@@ -214,17 +146,7 @@ from collections import defaultdict
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-@api_view(['GET'])
-def tvShow_reviews_by_couple(request, couple_slug):
-    # First, convert the slug to the couple ID used in the database
-    slug = couple_slug.lower()
-
-    if slug not in COUPLE_SLUG_TO_ID_MAP:
-        return Response({"error": "Invalid couple slug"}, status=400)
-
-    # Map the slug to the correct couple ID
-    couple_id = COUPLE_SLUG_TO_ID_MAP[slug]
-
+def tv_couple_shows_payload(couple_id):
     # Get all of the Tv Shows in the database (prefetch seasons + episodes for nested serializer)
     all_TvShows = TvShow.objects.all().prefetch_related("seasons__episodes")
     serialized_TvShows = TvShowSerializer(all_TvShows, many=True).data
@@ -283,7 +205,23 @@ def tvShow_reviews_by_couple(request, couple_slug):
 
         response_data.append(show_data)
 
-    return Response({"results": response_data})
+    return {"results": response_data}
+
+
+@api_view(['GET'])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def tvShow_reviews_by_couple(request, couple_slug):
+    # First, convert the slug to the couple ID used in the database
+    slug = couple_slug.lower()
+
+    if slug not in COUPLE_SLUG_TO_ID_MAP:
+        return Response({"error": "Invalid couple slug"}, status=400)
+
+    # Map the slug to the correct couple ID
+    couple_id = COUPLE_SLUG_TO_ID_MAP[slug]
+
+    # Cached until the next TV write, a cold miss is built by one request while the rest wait
+    return Response(cached_payload(f"tv_couple_shows/{couple_id}", lambda: tv_couple_shows_payload(couple_id)))
 
 
 
@@ -387,4 +325,164 @@ def tvShow_reviews_by_couple(request, couple_slug):
 #            }
 #        )
 #
-#    return Response({"results" : response_data})
\ No newline at end of file
+#    return Response({"results" : response_data})
+
+
+#=======================================================
+# Watch progress (see watch_progress.py)
+#=======================================================
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from . import watch_progress
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def show_watch_progress(request, show_slug):
+    show = get_object_or_404(TvShow, slug=show_slug)
+    return Response(watch_progress.show_progress_payload(request.user.id, show))
+
+
+@api_view(['GET'])
+@throttle_classes([AnonHeavyReadRateThrottle])
+def couple_watch_progress(request, show_slug):
+    show = get_object_or_404(TvShow, slug=show_slug)
+    return Response(watch_progress.couple_progress_payload(show))
+
+
+def _episode_number(value):
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= watch_progress.MAX_EPISODE_NUMBER:
+        raise ValueError(f"Episode numbers must be whole numbers from 1 to {watch_progress.MAX_EPISODE_NUMBER}")
+    return value
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ReviewWriteRateThrottle])
+def update_season_progress(request, season_id):
+    """
+    Mark episodes of a season watched (or unwatched with "watched": false):
+        {"mark": "season"}                  every episode of the season
+        {"mark": "upto", "episode": 8}      episodes 1..8
+        {"mark": "episodes", "episodes": [2, 5]}
+    """
+    season = get_object_or_404(Season, pk=season_id)
+    mark = request.data.get("mark")
+    watched = request.data.get("watched", True)
+    if not isinstance(watched, bool):
+        return Response({"error": '"watched" must be true or false'}, status=400)
+
+    try:
+        if mark == "season":
+            mask = watch_progress.available_mask(season)
+        elif mark == "upto":
+            mask = watch_progress.range_mask(1, _episode_number(request.data.get("episode")))
+        elif mark == "episodes":
+            episodes = request.data.get("episodes")
+            if not isinstance(episodes, list):
+                raise ValueError('"episodes" must be a list of episode numbers')
+            mask = watch_progress.episode_mask(_episode_number(n) for n in episodes)
+        else:
+            raise ValueError('"mark" must be "season", "upto" or "episodes"')
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    bits = watch_progress.update_progress(request.user.id, season, mask, watched)
+    return Response(watch_progress.season_progress(
+        season.id, season.season_number, watch_progress.available_mask(season), bits,
+    ))
+
+
+
+#=======================================================
+# Calendar: episodes airing in a date range, optionally only for the shows a couple follows
+# (has reviewed, or has watch progress on). One range scan over episode_air_date_idx joined
+# to Season/TvShow, paged in (air_date, id) order. New episodes show up once sync_tvmaze
+# has picked up the show's update.
+#=======================================================
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from moviereviews_hub.couples import USERNAME_TO_COUPLE_ID
+from movieclub_backend.pagination import CompositeKeysetCursorPagination
+
+from .models import WatchProgress
+
+CALENDAR_DEFAULT_DAYS = 7
+CALENDAR_MAX_DAYS = 366
+
+
+class CalendarPagination(CompositeKeysetCursorPagination):
+    ordering = ("air_date", "id")   # the order of episode_air_date_idx
+
+
+def followed_shows_filter(couple_id):
+    """Episode filter for the shows a couple has reviewed (at any level) or is watching."""
+    usernames = [username for username, member_of in USERNAME_TO_COUPLE_ID.items() if member_of == couple_id]
+    reviews = TvShowRatingsAndReviews.objects.filter(couple_slug=couple_id)
+    watching = WatchProgress.objects.filter(user__username__in=usernames)
+    return (
+        Q(season_number__show_id__in=reviews.values("tv_show_type_id"))
+        | Q(season_number__show_id__in=reviews.values("tv_season_type__show_id"))
+        | Q(season_number__show_id__in=reviews.values("tv_episode_type__season_number__show_id"))
+        | Q(season_number__show_id__in=watching.values("season__show_id"))
+    )
+
+
+def _calendar_range(params):
+    start = params.get("from")
+    end = params.get("to")
+    start = parse_date(start) if start else timezone.localdate()
+    if start is None:
+        raise ValueError('"from" must be a date (YYYY-MM-DD)')
+    end = parse_date(end) if end else start + timedelta(days=CALENDAR_DEFAULT_DAYS - 1)
+    if end is None:
+        raise ValueError('"to" must be a date (YYYY-MM-DD)')
+    if end < start:
+        raise ValueError('"to" is before "from"')
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValueError(f"At most {CALENDAR_MAX_DAYS} days at a time")
+    return start, end
+
+
+@api_view(['GET'])
+def tv_calendar(request):
+    """
+    GET /api/tv/calendar/?from=2025-01-06&to=2025-01-12&couple=tt
+    from defaults to today, to to a week after from (inclusive).
+    """
+    try:
+        start, end = _calendar_range(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    episodes = Episode.objects.filter(air_date__range=(start, end))
+
+    couple_slug = request.query_params.get("couple")
+    if couple_slug:
+        couple_id = COUPLE_SLUG_TO_ID_MAP.get(couple_slug.lower())
+        if couple_id is None:
+            return Response({"error": "Invalid couple slug"}, status=400)
+        episodes = episodes.filter(followed_shows_filter(couple_id))
+
+    rows = episodes.values(
+        "id", "air_date", "episode_number", "episode_title", "episode_runtime",
+        season_id=F("season_number_id"),
+        season=F("season_number__season_number"),
+        show_id=F("season_number__show_id"),
+        show_title=F("season_number__show__title"),
+        show_slug=F("season_number__show__slug"),
+        show_image_url=F("season_number__show__image_url"),
+    )
+
+    paginator = CalendarPagination()
+    page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response(page)
+
+
+tv_calendar.use_read_replica = True   # only reads episodes, which are only written by imports/syncs
@@ -0,0 +1,162 @@
+from django.db import transaction
+
+from moviereviews_hub.couples import USERNAME_TO_COUPLE_ID
+from moviereviews_hub.stats import COUPLE_ID_TO_SLUG
+
+from .models import Episode, WatchProgress
+
+#=======================================================
+# Watch progress. Each (user, season) is one WatchProgress row holding a bitset of the
+# watched episode numbers, so marking a whole season or "everything up to episode 8" is one
+# locked read and one write, and a show's progress is one row per season.
+#
+# Bitsets are handled as Python ints (bit n = episode n) and stored little-endian in bytea.
+# Aggregates are bit operations: AND of a couple's bitsets = watched together,
+# OR = watched by either of them, popcount = how many.
+#=======================================================
+
+# Upper bound on episode numbers, which is also the bitset size (in bits) a request can cause
+MAX_EPISODE_NUMBER = 5000
+
+
+def to_bits(data):
+    return int.from_bytes(bytes(data or b""), "little")
+
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def episode_mask(numbers):
+    mask = 0
+    for number in numbers:
+        mask |= 1 << number
+    return mask
+
+
+def range_mask(first, last):
+    """Episodes first..last (inclusive)."""
+    if last < first:
+        return 0
+    return ((1 << (last + 1)) - 1) ^ ((1 << first) - 1)
+
+
+def episode_numbers(bits):
+    return [n for n in range(bits.bit_length()) if bits >> n & 1]
+
+
+def season_masks(season_ids):
+    """{season_id: bitset of the episodes that exist}, from one query."""
+    masks = {season_id: 0 for season_id in season_ids}
+    for season_id, number in Episode.objects.filter(season_number_id__in=season_ids).values_list("season_number_id", "episode_number"):
+        if number <= MAX_EPISODE_NUMBER:
+            masks[season_id] |= 1 << number
+    return masks
+
+
+def available_mask(season):
+    # Seasons imported without their episodes fall back to the episode count TVMaze gave
+    return season_masks([season.id])[season.id] or range_mask(1, min(season.season_episode_cnt, MAX_EPISODE_NUMBER))
+
+
+#-------------------------------------------------------
+# Updating
+#-------------------------------------------------------
+def update_progress(user_id, season, mask, watched=True):
+    """Set (or with watched=False clear) the episodes in `mask`. RETURNS the new bitset."""
+    with transaction.atomic():
+        progress, _ = WatchProgress.objects.select_for_update().get_or_create(user_id=user_id, season=season)
+        bits = to_bits(progress.watched)
+        bits = bits | mask if watched else bits & ~mask
+        progress.watched = to_bytes(bits)
+        progress.save(update_fields=["watched"])
+    return bits
+
+
+#-------------------------------------------------------
+# Reading
+#-------------------------------------------------------
+def _percent(count, total):
+    return round(100 * count / total, 1) if total else 0.0
+
+
+def season_progress(season_id, season_number, available, bits):
+    watched = bits & available
+    return {
+        "season_id": season_id,
+        "season_number": season_number,
+        "episodes": available.bit_count(),
+        "watched": episode_numbers(watched),
+        "watched_count": watched.bit_count(),
+        "percent": _percent(watched.bit_count(), available.bit_count()),
+    }
+
+
+def _show_seasons(show):
+    seasons = list(show.seasons.order_by("season_number").values_list("id", "season_number", "season_episode_cnt"))
+    masks = season_masks([season_id for season_id, _, _ in seasons])
+    for season_id, _, episode_cnt in seasons:
+        masks[season_id] = masks[season_id] or range_mask(1, min(episode_cnt, MAX_EPISODE_NUMBER))
+    return seasons, masks
+
+
+def show_progress_payload(user_id, show):
+    """One user's progress through every season of a show."""
+    seasons, masks = _show_seasons(show)
+    rows = dict(WatchProgress.objects.filter(user_id=user_id, season__show=show).values_list("season_id", "watched"))
+
+    payload_seasons = [
+        season_progress(season_id, number, masks[season_id], to_bits(rows.get(season_id)))
+        for season_id, number, _ in seasons
+    ]
+    episodes = sum(s["episodes"] for s in payload_seasons)
+    watched = sum(s["watched_count"] for s in payload_seasons)
+    return {
+        "show": show.slug,
+        "episodes": episodes,
+        "watched_count": watched,
+        "percent": _percent(watched, episodes),
+        "seasons": payload_seasons,
+    }
+
+
+def couple_progress_payload(show):
+    """
+    How much of the show each couple has watched: together (episodes both of them watched,
+    AND of their bitsets) and either (episodes at least one of them watched, OR).
+    """
+    seasons, masks = _show_seasons(show)
+    episodes = sum(mask.bit_count() for mask in masks.values())
+
+    members = {}
+    for username, couple_id in USERNAME_TO_COUPLE_ID.items():
+        members.setdefault(couple_id, []).append(username)
+
+    # {username: {season_id: bits}}
+    progress = {}
+    rows = WatchProgress.objects.filter(season__show=show).values_list("user__username", "season_id", "watched")
+    for username, season_id, watched in rows:
+        progress.setdefault(username.lower(), {})[season_id] = to_bits(watched)
+
+    couples = []
+    for couple_id, usernames in members.items():
+        together = either = 0
+        for season_id, available in masks.items():
+            bitsets = [progress.get(username, {}).get(season_id, 0) & available for username in usernames]
+            both, any_of = available, 0
+            for bits in bitsets:
+                both &= bits
+                any_of |= bits
+            together += both.bit_count()
+            either += any_of.bit_count()
+
+        couples.append({
+            "couple_id": couple_id,
+            "couple_slug": COUPLE_ID_TO_SLUG.get(couple_id),
+            "together": together,
+            "together_percent": _percent(together, episodes),
+            "either": either,
+            "either_percent": _percent(either, episodes),
+        })
+
+    return {"show": show.slug, "episodes": episodes, "couples": couples}